@@ -5,9 +5,12 @@ import datetime
 import logging
 import pathlib
 import re
+import time
 from tqdm import tqdm
 
+from ckan.content_hash import HashStore, resource_hash
 from ckan.package_search import DatasetLoader
+from ckan.stream import iter_page_files
 from asset.collector.manager import Manager
 
 """
@@ -22,8 +25,31 @@ DEFAULT_OUTPUT_DIR = _DATA_DIR / "output"
 _MAX_RETRIES = 3
 _TIMEOUT = datetime.timedelta(seconds=300.0)
 
+_DATASET_SCOPE = "asset_retrieval.datasets"
+_RESOURCE_SCOPE = "asset_retrieval.resources"
+
 _file_datetime = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
+
+def resources(dataset_obj: dict) -> list:
+    # Run by the page decoding workers: only (id, url, content hash) of the resources
+    # come back.
+    return [
+        (resource_obj["id"], resource_obj["url"], resource_hash(resource_obj))
+        for resource_obj in dataset_obj.get("resources", [])
+    ]
+
+
+def written_resources(storage_dir: pathlib.Path, resource_ids, since: float) -> set:
+    # Resource ids with items written since `since`: JsonWriterPipeline writes the
+    # items of a resource in <storage_dir>/<collection_name = resource id>/.
+    return {
+        resource_id
+        for resource_id in resource_ids
+        if any(path.stat().st_mtime >= since for path in (storage_dir / resource_id).glob("*.json"))
+    }
+
+
 argparser = argparse.ArgumentParser()
 argparser.add_argument("input", type=pathlib.Path, help="Input directory")
 argparser.add_argument("path_regex")
@@ -39,6 +65,18 @@ argparser.add_argument(
     action="store_true",
     help="Retrieve assets even if resource directory exists.",
 )
+argparser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Processes decoding the pages, while indexing them and listing their resources.",
+)
+argparser.add_argument(
+    "--hash-store",
+    type=pathlib.Path,
+    help="SQLite file of the datasets and resources already collected: unchanged ones"
+    " are skipped, unless --force.",
+)
 
 args = argparser.parse_args()
 print(vars(args))
@@ -48,10 +86,21 @@ path_regex = re.compile(args.path_regex)
 print(path_regex)
 loader = DatasetLoader()
 
-# First pass for progress bar total count.
-json_total_count = len(
-    [item for item in args.input.rglob("*.json") if path_regex.match(str(item))]
-)
+hash_store = None
+if args.hash_store:
+    hash_store = HashStore(args.hash_store)
+    if not args.force:
+        loader.skip_unchanged(hash_store, _DATASET_SCOPE)
+
+# Page files listed once, for the progress bar total count too.
+items = [item for item in iter_page_files(args.input) if path_regex.match(str(item))]
+json_total_count = len(items)
+
+# Indexing the latest version of each dataset: duplicates are not loaded.
+progress = tqdm(total=len(items), desc="Indexing files", unit="file")
+for item in loader.index_pages(items, workers=args.workers):
+    progress.update(1)
+progress.close()
 
 manager = Manager({
         "RETRY_TIMES": _MAX_RETRIES,
@@ -65,28 +114,54 @@ manager = Manager({
         "PIPELINE_JSON_OUTPUT_DIR": args.scrapy_storage_dir,
 })
 
+# (resource id, content_hash) of the resources queued.
+resource_hashes = []
+# dg_id => resource ids queued, for the datasets with some.
+dataset_resource_ids = {}
+unchanged_resource_count = 0
+
 json_progress = tqdm(total=json_total_count, desc="Parsing JSON files")
-for item in args.input.rglob("*.json"):
-    match_res = path_regex.match(str(item))
-    if not match_res:
-        continue
-
-    query_result = loader.load(item, resources=True)
-    for dataset in query_result.datasets.values():
-        for resource in dataset.resources.values():
+for item, datasets in loader.iter_latest(items, workers=args.workers, transform=resources):
+    for dg_id, _, dataset_resources in datasets:
+        for resource_id, url, content_hash in dataset_resources:
             if (
-                args.force
-                or True
-                # @todo Check if resource has already been collected
+                hash_store
+                and not args.force
+                and hash_store.unchanged(_RESOURCE_SCOPE, resource_id, content_hash)
             ):
-                manager.collect_later(
-                    resource.url,
-                    collection_name=resource.id,
-                    collection_key="resource_id",
-                )
+                unchanged_resource_count += 1
+                continue
+
+            manager.collect_later(url, collection_name=resource_id, collection_key="resource_id")
+            resource_hashes.append((resource_id, content_hash))
+            dataset_resource_ids.setdefault(dg_id, []).append(resource_id)
 
     json_progress.update(1)
 
 json_progress.close()
 
+# Whole seconds: file systems with a coarse mtime.
+collect_start = int(time.time())
 manager.collect(progress=True)
+
+# Only the resources this run wrote are recorded: failed downloads (after the manager
+# RETRY_TIMES) and URLs skipped by its cache are not taken as unchanged by the next run.
+if hash_store:
+    written = written_resources(
+        args.scrapy_storage_dir, (resource_id for resource_id, _ in resource_hashes), since=collect_start
+    )
+    hash_store.record(_RESOURCE_SCOPE, [
+        (resource_id, content_hash) for resource_id, content_hash in resource_hashes
+        if resource_id in written
+    ])
+    # A dataset is done once all of its resources are.
+    hash_store.record(_DATASET_SCOPE, [
+        (dg_id, content_hash) for dg_id, content_hash in loader.pop_loaded_hashes()
+        if all(resource_id in written for resource_id in dataset_resource_ids.get(dg_id, []))
+    ])
+    hash_store.close()
+    print(f"Collected {len(written)} of {len(resource_hashes)} resources.")
+    print(
+        f"Skipped {loader.unchanged_count} unchanged datasets"
+        f" and {unchanged_resource_count} unchanged resources."
+    )
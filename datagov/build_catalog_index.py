@@ -0,0 +1,51 @@
+# coding: utf-8
+
+import argparse
+import pathlib
+
+from tqdm import tqdm
+
+from ckan.catalog_index import CatalogIndex
+
+"""
+Builds or refreshes the catalog index of harvest directories (retriever.py output), see
+ckan/catalog_index.py. Only new or modified pages are read, unless --rebuild.
+With --compare, reports the datasets changed since a previous harvest.
+"""
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument(
+    "directories",
+    type=pathlib.Path,
+    nargs="+",
+    help="Harvest directories (data_gov_<organization>_<date>).",
+)
+argparser.add_argument(
+    "--rebuild", action="store_true", help="Read every page again."
+)
+argparser.add_argument(
+    "--compare",
+    type=pathlib.Path,
+    help="Previous harvest directory (indexed) to compare the content hashes with.",
+)
+
+args = argparser.parse_args()
+
+previous_index = None
+if args.compare:
+    try:
+        previous_index = CatalogIndex(args.compare.resolve(strict=True), read_only=True)
+    except FileNotFoundError as error:
+        argparser.error(f"--compare: {error}, build it first")
+
+for directory in tqdm(args.directories, desc="Indexing", unit="directory"):
+    catalog_index = CatalogIndex(directory.resolve(strict=True))
+    pages = catalog_index.build(rebuild=args.rebuild)
+    tqdm.write(f"{directory}: {pages} pages indexed, {catalog_index.dataset_count()} datasets")
+    if previous_index:
+        counts = catalog_index.compare(previous_index)
+        tqdm.write(f"{directory}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+    catalog_index.close()
+
+if previous_index:
+    previous_index.close()
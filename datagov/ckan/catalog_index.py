@@ -0,0 +1,323 @@
+# coding: utf-8
+
+import json
+import logging
+import pathlib
+import sqlite3
+
+from .content_hash import dataset_hash
+from .stream import PageReader, page_format, walk_page_files
+
+CATALOG_INDEX_NAME = ".catalog_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    dg_id TEXT NOT NULL,
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    position INTEGER NOT NULL,
+    offset INTEGER,
+    organization TEXT,
+    metadata_modified TEXT,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS datasets_dg_id ON datasets (dg_id, metadata_modified);
+CREATE INDEX IF NOT EXISTS datasets_file_id ON datasets (file_id);
+"""
+
+
+class CatalogIndex:
+    """
+    Index of the pages of a harvest directory, in <directory>/.catalog_index.sqlite.
+
+    Maps each dg_id to its page, its position in it and, for plain jsonl pages, its
+    byte offset: finding a dataset is a seek instead of loading pages. Compressed and
+    .json pages are read up to the dataset position. The page list comes from the
+    index too, see stream.iter_page_files().
+
+    The content hash of each dataset (content_hash.dataset_hash()) is stored along,
+    compare() tells what changed since a previous harvest.
+
+    A `read_only` index is never created nor modified: FileNotFoundError when the
+    directory has none.
+    """
+
+    def __init__(self, directory: pathlib.Path, read_only=False):
+        self.directory = pathlib.Path(directory)
+        self.path = self.directory / CATALOG_INDEX_NAME
+        self.read_only = read_only
+
+        if read_only and not self.path.exists():
+            raise FileNotFoundError(f"{self.directory} has no catalog index")
+
+        self.connection = sqlite3.connect(self._uri(read_only), uri=True)
+        if not read_only:
+            self.connection.executescript(_SCHEMA)
+            self._migrate()
+
+    def _uri(self, read_only: bool) -> str:
+        return self.path.resolve().as_uri() + ("?mode=ro" if read_only else "")
+
+    @classmethod
+    def exists(cls, directory: pathlib.Path) -> bool:
+        return (pathlib.Path(directory) / CATALOG_INDEX_NAME).exists()
+
+    def close(self):
+        self.connection.close()
+
+    def _migrate(self):
+        # Indexes built before content hashes: their pages are hashed by the next
+        # build(rebuild=True), unhashed datasets count as changed meanwhile.
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(datasets)")]
+        if "content_hash" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE datasets ADD COLUMN content_hash TEXT")
+
+    def build(self, rebuild=False) -> int:
+        """Indexes new or modified pages, forgets deleted ones. Returns the pages indexed."""
+        indexed = {
+            path: (file_id, size, mtime)
+            for file_id, path, size, mtime in self.connection.execute(
+                "SELECT id, path, size, mtime FROM files"
+            )
+        }
+
+        count = 0
+        with self.connection:
+            for page_path in walk_page_files(self.directory):
+                relative_path = str(page_path.relative_to(self.directory))
+                stat = page_path.stat()
+                file_id, size, mtime = indexed.pop(relative_path, (None, None, None))
+
+                if not rebuild and (size, mtime) == (stat.st_size, stat.st_mtime):
+                    continue
+
+                if file_id is not None:
+                    self._forget(file_id)
+                self._index_page(page_path, relative_path, stat)
+                count += 1
+
+            for file_id, _, _ in indexed.values():
+                self._forget(file_id)
+
+        logging.info(f"{self.path}: {count} pages indexed, {len(indexed)} removed")
+        return count
+
+    def _forget(self, file_id: int):
+        self.connection.execute("DELETE FROM datasets WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_page(self, page_path: pathlib.Path, relative_path: str, stat):
+        cursor = self.connection.execute(
+            "INSERT INTO files (path, size, mtime, count) VALUES (?, ?, ?, 0)",
+            (relative_path, stat.st_size, stat.st_mtime),
+        )
+        file_id = cursor.lastrowid
+
+        rows = [
+            (
+                obj["id"],
+                file_id,
+                position,
+                offset,
+                (obj.get("organization") or {}).get("name"),
+                obj.get("metadata_modified"),
+                dataset_hash(obj),
+            )
+            for position, (offset, obj) in enumerate(_read_with_offsets(page_path))
+        ]
+        self.connection.executemany("INSERT INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.execute("UPDATE files SET count = ? WHERE id = ?", (len(rows), file_id))
+
+    def page_files(self) -> list:
+        return [
+            self.directory / path
+            for (path,) in self.connection.execute("SELECT path FROM files ORDER BY path")
+        ]
+
+    def is_stale(self) -> bool:
+        """True when an indexed page was deleted or modified since the last build()."""
+        for path, size, mtime in self.connection.execute("SELECT path, size, mtime FROM files"):
+            try:
+                stat = (self.directory / path).stat()
+            except FileNotFoundError:
+                return True
+
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                return True
+
+        return False
+
+    def _current_file_id(self, page_path: pathlib.Path):
+        # Id of the page if indexed as it is on disk, with the hashes of its datasets.
+        try:
+            relative_path = str(pathlib.Path(page_path).relative_to(self.directory))
+            stat = pathlib.Path(page_path).stat()
+        except (ValueError, FileNotFoundError):
+            return None
+
+        row = self.connection.execute(
+            "SELECT id FROM files WHERE path = ? AND size = ? AND mtime = ?"
+            " AND NOT EXISTS (SELECT 1 FROM datasets WHERE file_id = files.id AND content_hash IS NULL)",
+            (relative_path, stat.st_size, stat.st_mtime),
+        ).fetchone()
+        return row[0] if row else None
+
+    def covers(self, page_path: pathlib.Path) -> bool:
+        """True when page_records() can answer for this page without reading it."""
+        return self._current_file_id(page_path) is not None
+
+    def page_records(self, page_path: pathlib.Path):
+        """
+        [(dg_id, metadata_modified, content_hash)...] of a page in page order, as
+        parallel.iter_page_records() decodes them. None when the page is not indexed as
+        it is on disk.
+        """
+        file_id = self._current_file_id(page_path)
+        if file_id is None:
+            return None
+
+        return self.connection.execute(
+            "SELECT dg_id, metadata_modified, content_hash FROM datasets"
+            " WHERE file_id = ? ORDER BY position",
+            (file_id,),
+        ).fetchall()
+
+    def dataset_count(self) -> int:
+        return self.connection.execute("SELECT COUNT(DISTINCT dg_id) FROM datasets").fetchone()[0]
+
+    def content_hash(self, dg_id: str):
+        """Content hash of the latest version of dg_id, or None."""
+        row = self.connection.execute(
+            "SELECT content_hash FROM datasets WHERE dg_id = ?"
+            " ORDER BY metadata_modified DESC LIMIT 1",
+            (dg_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def compare(self, previous: "CatalogIndex") -> dict:
+        """
+        Counts of the datasets "new", "changed" and "unchanged" since the `previous`
+        harvest (latest versions on both sides), and "removed" from it.
+        """
+        # Only read: the previous harvest is left as is.
+        self.connection.execute("ATTACH DATABASE ? AS previous", (previous._uri(read_only=True),))
+        try:
+            row = self.connection.execute(
+                "WITH current_hashes AS ("
+                + _LATEST_HASHES.format(schema="main")
+                + "), previous_hashes AS ("
+                + _LATEST_HASHES.format(schema="previous")
+                + ") SELECT"
+                " SUM(previous_hashes.dg_id IS NULL),"
+                " SUM(previous_hashes.dg_id IS NOT NULL"
+                "     AND current_hashes.content_hash IS NOT previous_hashes.content_hash),"
+                " SUM(current_hashes.content_hash = previous_hashes.content_hash),"
+                " (SELECT COUNT(*) FROM previous_hashes"
+                "  WHERE dg_id NOT IN (SELECT dg_id FROM current_hashes))"
+                " FROM current_hashes"
+                " LEFT JOIN previous_hashes ON previous_hashes.dg_id = current_hashes.dg_id"
+            ).fetchone()
+        finally:
+            self.connection.execute("DETACH DATABASE previous")
+
+        return dict(zip(("new", "changed", "unchanged", "removed"), (count or 0 for count in row)))
+
+    def locate(self, dg_id: str):
+        """(page path, position, byte offset) of the latest version of dg_id, or None."""
+        row = self.connection.execute(
+            "SELECT files.path, position, offset FROM datasets"
+            " JOIN files ON files.id = datasets.file_id"
+            " WHERE dg_id = ? ORDER BY metadata_modified DESC LIMIT 1",
+            (dg_id,),
+        ).fetchone()
+        if not row:
+            return None
+
+        return self.directory / row[0], row[1], row[2]
+
+    def get(self, dg_id: str):
+        """
+        CKAN object of the latest version of dg_id, or None. A page modified since the
+        last build() is searched for dg_id, its indexed offset or position being outdated.
+        """
+        location = self.locate(dg_id)
+        if not location:
+            return None
+
+        page_path, position, offset = location
+        if not self._unchanged(page_path):
+            return _find_in_page(page_path, dg_id)
+
+        if offset is not None:
+            with page_path.open("rb") as page_file:
+                page_file.seek(offset)
+                return json.loads(page_file.readline())
+
+        for current, obj in enumerate(PageReader(page_path)):
+            if current == position:
+                return obj
+
+        return None
+
+    def _unchanged(self, page_path: pathlib.Path) -> bool:
+        # Page on disk as indexed, size and mtime wise.
+        try:
+            stat = page_path.stat()
+        except FileNotFoundError:
+            return False
+
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM files WHERE path = ? AND size = ? AND mtime = ?",
+                (str(page_path.relative_to(self.directory)), stat.st_size, stat.st_mtime),
+            ).fetchone()
+            is not None
+        )
+
+
+# Latest version of each dataset of an index schema, ties on metadata_modified going to
+# the first row.
+_LATEST_HASHES = """
+SELECT dg_id, content_hash FROM (
+    SELECT dg_id, content_hash, ROW_NUMBER() OVER (
+        PARTITION BY dg_id ORDER BY metadata_modified DESC, rowid
+    ) AS version
+    FROM {schema}.datasets
+) WHERE version = 1
+"""
+
+
+def _find_in_page(page_path: pathlib.Path, dg_id: str):
+    # Latest version of dg_id in the page, None when the page or dg_id is gone.
+    if not page_path.exists():
+        return None
+
+    found = None
+    for obj in PageReader(page_path):
+        if obj["id"] == dg_id and (found is None or obj["metadata_modified"] > found["metadata_modified"]):
+            found = obj
+
+    return found
+
+
+def _read_with_offsets(page_path: pathlib.Path):
+    # Byte offsets are only meaningful in plain jsonl pages.
+    if page_format(page_path) != "jsonl":
+        for obj in PageReader(page_path):
+            yield None, obj
+        return
+
+    with page_path.open("rb") as page_file:
+        page_file.readline()
+        offset = page_file.tell()
+        for line in iter(page_file.readline, b""):
+            if line.strip():
+                yield offset, json.loads(line)
+            offset += len(line)
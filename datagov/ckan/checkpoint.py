@@ -0,0 +1,85 @@
+# coding: utf-8
+
+import json
+import os
+import pathlib
+import threading
+
+CHECKPOINT_NAME = ".checkpoint.json"
+
+
+class SearchCheckpoint:
+    """
+    Pages of a search already written to its output directory, saved after each
+    page so an interrupted harvest can go on where it stopped.
+    """
+
+    def __init__(self, output_dir: pathlib.Path, query: dict):
+        self.path = output_dir / CHECKPOINT_NAME
+        self.query = query
+
+        self.total_count = None
+        self.page_size = None
+        # Page 'start' => number of results written.
+        self.pages = {}
+        self.finished = False
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, output_dir: pathlib.Path, query: dict) -> "SearchCheckpoint":
+        checkpoint = cls(output_dir, query)
+        if not checkpoint.path.exists():
+            return checkpoint
+
+        state = json.loads(checkpoint.path.read_text())
+        if state["query"] != query:
+            raise ValueError(
+                f"{checkpoint.path} was written for query {state['query']}, not {query}"
+            )
+
+        checkpoint.total_count = state["total_count"]
+        checkpoint.page_size = state["page_size"]
+        checkpoint.pages = {int(start): count for start, count in state["pages"].items()}
+        checkpoint.finished = state["finished"]
+
+        return checkpoint
+
+    def mark(self, start: int, count: int, total_count: int = None):
+        with self._lock:
+            self.pages[start] = count
+            if total_count is not None and self.total_count is None:
+                self.total_count = total_count
+            if self.page_size is None or count > self.page_size:
+                self.page_size = count
+            self._save()
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "query": self.query,
+            "total_count": self.total_count,
+            "page_size": self.page_size,
+            "pages": {str(start): self.pages[start] for start in sorted(self.pages)},
+            "finished": self.finished,
+        }
+
+        # Written aside then renamed: a crash never leaves half a checkpoint.
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state, indent=4))
+        os.replace(tmp_path, self.path)
+
+
+def find_resumable(output_dir: pathlib.Path, pattern: str):
+    """Latest directory matching pattern with an unfinished checkpoint, if any."""
+    for directory in sorted(output_dir.glob(pattern), reverse=True):
+        path = directory / CHECKPOINT_NAME
+        if path.exists() and not json.loads(path.read_text())["finished"]:
+            return directory
+
+    return None
@@ -0,0 +1,91 @@
+# coding: utf-8
+
+import hashlib
+import json
+import pathlib
+import sqlite3
+
+# Changed by CKAN or the harvester without the dataset itself changing.
+VOLATILE_DATASET_FIELDS = frozenset(("metadata_modified", "revision_id", "tracking_summary"))
+VOLATILE_RESOURCE_FIELDS = frozenset(
+    ("metadata_modified", "revision_id", "tracking_summary", "cache_last_updated")
+)
+# New on each harvest of the source.
+VOLATILE_EXTRAS = frozenset(("harvest_object_id",))
+
+
+def _canonical_resource(obj: dict) -> dict:
+    return {key: value for key, value in obj.items() if key not in VOLATILE_RESOURCE_FIELDS}
+
+
+def _canonical_dataset(obj: dict) -> dict:
+    canonical = {key: value for key, value in obj.items() if key not in VOLATILE_DATASET_FIELDS}
+
+    if "extras" in obj:
+        canonical["extras"] = sorted(
+            (extra for extra in obj["extras"] if extra.get("key") not in VOLATILE_EXTRAS),
+            key=lambda extra: str(extra.get("key")),
+        )
+    if "resources" in obj:
+        canonical["resources"] = [_canonical_resource(resource) for resource in obj["resources"]]
+
+    return canonical
+
+
+def _hash(obj) -> str:
+    content = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def dataset_hash(obj: dict) -> str:
+    """Hash of a CKAN dataset, resources included, ignoring the volatile fields."""
+    return _hash(_canonical_dataset(obj))
+
+
+def resource_hash(obj: dict) -> str:
+    return _hash(_canonical_resource(obj))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    scope TEXT NOT NULL,
+    dg_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (scope, dg_id)
+) WITHOUT ROWID;
+"""
+
+
+class HashStore:
+    """
+    Content hash of the datasets or resources already processed, per scope (one per
+    consumer, e.g. "json_to_db.datasets"), in a SQLite file: a new harvest only needs
+    its changed records processed.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, scope: str, dg_id: str):
+        row = self.connection.execute(
+            "SELECT content_hash FROM hashes WHERE scope = ? AND dg_id = ?", (scope, dg_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def unchanged(self, scope: str, dg_id: str, content_hash: str) -> bool:
+        return content_hash is not None and self.get(scope, dg_id) == content_hash
+
+    def record(self, scope: str, hashes) -> int:
+        """Records (dg_id, content_hash) pairs once processed. Returns their count."""
+        rows = [(scope, dg_id, content_hash) for dg_id, content_hash in hashes]
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?)", rows)
+
+        return len(rows)
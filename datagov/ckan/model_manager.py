@@ -3,21 +3,32 @@
 import json
 import logging
 
+from sqlalchemy.orm.attributes import set_committed_value
+
 from rescue_db.rescue_api.models.organization import Organization
 from rescue_db.rescue_api.models.dataset import Dataset
 from rescue_db.rescue_api.models.resource import Resource
 from rescue_db.rescue_api.models.dataset_json import DatasetJson
 
+from .record_index import RecordIndex
+
 
 class ModelManager:
-    # @todo : cache optimization. Only keep id and modification date.
-    def __init__(self, exists_ok=False):
+    def __init__(self, exists_ok=False, session=None):
         self.organizations = {}
+        # ORM objects not written yet.
         self.datasets = {}
-        self.dataset_jsons = {}
         self.resources = {}
         self.exists_ok = exists_ok
 
+        # Every dataset and resource seen, written or not: id and modification date only.
+        self.dataset_index = RecordIndex()
+        self.resource_index = RecordIndex()
+
+        # Session the datasets are written to: released ones are looked up in it by dg_id
+        # when met again.
+        self.session = session
+
     def get_organizations(self) -> list[Organization]:
         """
         Returns a list of organizations.
@@ -30,6 +41,24 @@ class ModelManager:
         """
         return list(self.datasets.values())
 
+    def dataset_count(self) -> int:
+        return len(self.dataset_index)
+
+    def resource_count(self) -> int:
+        return len(self.resource_index)
+
+    def release(self):
+        """
+        Drops the datasets and resources once written (committed), keeping the
+        organizations and the exists/newer indexes.
+        """
+        for organization in self.organizations.values():
+            # Emptying the loaded collection without recording a change.
+            set_committed_value(organization, "datasets", [])
+
+        self.datasets = {}
+        self.resources = {}
+
     def create_organization(self, obj) -> Organization:
         organization = None
         dg_id = obj["id"]
@@ -48,30 +77,43 @@ class ModelManager:
 
         return organization
 
-    def create_dataset(self, obj, resources=False) -> Dataset:
+    def create_dataset(self, obj, resources=False, written=False) -> Dataset:
+        """
+        `written`: a previous run may have written a version of the dataset, updated
+        in place if so (looked up by dg_id in the session).
+        """
         dataset = None
         dg_id = obj["id"]
         dg_metadata_modified = obj["metadata_modified"]
 
-        if dg_id in self.datasets:
+        record = self.dataset_index.get(dg_id)
+        if record:
             if not self.exists_ok:
                 raise Exception(f"Dataset {dg_id} already exists.")
 
-            if dg_metadata_modified > self.datasets[dg_id].dg_metadata_modified:
+            if dg_metadata_modified > record.metadata_modified:
                 logging.warning(
                     f"Dataset {dg_id} encountered with a newer metadata_modified, updating."
                 )
-                dataset = self.datasets[dg_id]
+                record.metadata_modified = dg_metadata_modified
+                dataset = self._seen_dataset(dg_id)
                 dataset.dg_metadata_modified = dg_metadata_modified
-                dataset.json_data.content = json.dumps(
-                    obj, ensure_ascii=False, indent=2
-                )
+                dataset.json_data.content = _json_content(obj)
+                # Released datasets are written again with the next batch.
+                self.datasets[dg_id] = dataset
 
             else:
                 logging.warning(
                     f"Dataset {dg_id} already exists with a newer metadata_modified, skipping."
                 )
-                return self.datasets[dg_id]
+                return self._seen_dataset(dg_id)
+        else:
+            self.dataset_index.add(dg_id, dg_metadata_modified)
+            dataset = self._written(Dataset, dg_id) if written else None
+            if dataset:
+                dataset.dg_metadata_modified = dg_metadata_modified
+                dataset.json_data.content = _json_content(obj)
+                self.datasets[dg_id] = dataset
 
         if not dataset:
             dataset = Dataset()
@@ -84,7 +126,7 @@ class ModelManager:
             dataset.organization = organization
             dataset_json = DatasetJson()
             dataset_json.dataset = dataset
-            dataset_json.content = json.dumps(obj, ensure_ascii=False, indent=2)
+            dataset_json.content = _json_content(obj)
 
             dataset.json_data = dataset_json
 
@@ -102,7 +144,9 @@ class ModelManager:
 
         if resources and "resources" in obj:
             for resource_obj in obj["resources"]:
-                resource = self.create_resource(resource_obj)
+                resource = self.create_resource(resource_obj, written=written)
+                if resource is None:
+                    continue
 
                 if resource.resource_type:
                     dataset.access_total_count += 1
@@ -110,29 +154,57 @@ class ModelManager:
                     if resource.resource_type not in ["web", "dir"]:
                         dataset.access_direct_dl_count += 1
 
-                resource.dataset = dataset
-                dataset.resources.append(resource)
+                # Resources updated in place already belong to the dataset.
+                if resource.dataset is not dataset:
+                    resource.dataset = dataset
+                    dataset.resources.append(resource)
 
         return dataset
 
-    def create_resource(self, obj) -> Resource:
+    def _seen_dataset(self, dg_id: str) -> Dataset:
+        # In memory, or written and released: then updated in the database.
+        dataset = self.datasets.get(dg_id) or self._written(Dataset, dg_id)
+        if dataset is None:
+            raise Exception(f"Dataset {dg_id} already written, a session is needed to update it.")
+
+        return dataset
+
+    def _written(self, model, dg_id: str):
+        if self.session is None:
+            return None
+
+        return self.session.query(model).filter(model.dg_id == dg_id).first()
+
+    def create_resource(self, obj, written=False) -> Resource:
         resource = None
         dg_id = obj["id"]
         dg_metadata_modified = obj["metadata_modified"]
 
-        if dg_id in self.resources:
+        record = self.resource_index.get(dg_id)
+        if record:
             if not self.exists_ok:
                 raise Exception(f"Resource {dg_id} already exists.")
 
-            if dg_metadata_modified > self.resources[dg_id].dg_metadata_modified:
+            if dg_metadata_modified > record.metadata_modified:
                 logging.warning(f"Resource {dg_id} already exists, updating.")
-                resource = self.resources[dg_id]
-                resource.dg_metadata_modified = dg_metadata_modified
+                record.metadata_modified = dg_metadata_modified
+                # Released resources are updated in the database, created again without
+                # a session.
+                resource = self.resources.get(dg_id) or self._written(Resource, dg_id)
+                if resource:
+                    resource.dg_metadata_modified = dg_metadata_modified
+                    self.resources[dg_id] = resource
             else:
                 logging.warning(
                     f"Resource {dg_id} already exists with a newer metadata_modified, skipping."
                 )
-                return self.resources[dg_id]
+                return self.resources.get(dg_id) or self._written(Resource, dg_id)
+        else:
+            self.resource_index.add(dg_id, dg_metadata_modified)
+            resource = self._written(Resource, dg_id) if written else None
+            if resource:
+                resource.dg_metadata_modified = dg_metadata_modified
+                self.resources[dg_id] = resource
 
         if not resource:
             resource = Resource()
@@ -162,3 +234,7 @@ class ModelManager:
         resource.dg_created = obj["created"]
 
         return resource
+
+
+def _json_content(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, indent=2)
@@ -1,16 +1,31 @@
 # coding: utf-8
 
 import json
+import logging
 import pathlib
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 from ckanapi import RemoteCKAN
 
+from .checkpoint import SearchCheckpoint
+from .content_hash import HashStore
 from .model_manager import ModelManager
+from .parallel import index_pages, iter_latest_objects
+from .record_index import RecordIndex
+from .response_cache import ResponseCache
+from .retry import RetryPolicy
+from .stream import PageReader, open_page, page_format, write_jsonl
+from .throttle import host_rate_limiter
+from .watermark import solr_date
 
 from rescue_db.rescue_api.models.organization import Organization
 
+# Seconds to wait for a package_search response, ckanapi waits forever by default.
+DEFAULT_TIMEOUT = 60.0
+
 
 class QueryResult:
     def __init__(self, packages, model_manager: ModelManager = None):
@@ -26,6 +41,12 @@ class QueryResult:
         if self.total_count:
             self.total_count_digits = len(str(self.total_count))
 
+    def max_metadata_modified(self):
+        if not self.count:
+            return None
+
+        return max(obj["metadata_modified"] for obj in self.packages["results"])
+
     def parse_results(self, resources=False):
         for dataset_obj in self.packages["results"]:
             self.model_manager.create_dataset(dataset_obj, resources=resources)
@@ -33,25 +54,53 @@ class QueryResult:
     def is_empty(self) -> bool:
         return not self.count
 
-    def write(self, output_path):
+    def write(self, output_path, query: dict = None):
         # Writes the output
-        with output_path.open("w") as output_file:
-            json.dump(self.packages, output_file, indent=4)
+        with open_page(output_path, "w") as output_file:
+            if page_format(output_path) == "json":
+                json.dump(self.packages, output_file, indent=4)
+            else:
+                write_jsonl(self.packages, output_file, query=query)
 
 
 # -----
 
 
 class Searcher:
-    def __init__(self, url, output_dir: pathlib.Path = None, output_prefix: str = None):
+    def __init__(
+        self,
+        url,
+        output_dir: pathlib.Path = None,
+        output_prefix: str = None,
+        rate: float = None,
+        retry_policy: RetryPolicy = None,
+        output_format: str = "json",
+        response_cache: ResponseCache = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
         self.url = url
         self.output_dir = output_dir
         self.output_prefix = output_prefix
+        # One of stream.PAGE_FORMATS.
+        self.output_format = output_format
+        # Max requests per second to the CKAN host, shared by all workers.
+        self.rate_limiter = host_rate_limiter(url, rate) if rate else None
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        # Recorded responses, replayed without requesting the CKAN host.
+        self.response_cache = response_cache
+        # A stalled request times out (requests.Timeout), and is retried by the retry policy.
+        self.timeout = timeout
+
+        # Set by a HarvestScheduler: its progress bar, and its requests in flight limit.
+        self.progress = None
+        self.request_slots = None
 
         self.reset()
 
     def reset(self):
         self.remote_ckan = RemoteCKAN(self.url)
+        # One RemoteCKAN (and HTTP session) per worker thread.
+        self._local = threading.local()
 
         self.last_result = None
         self.last_query = None
@@ -60,125 +109,427 @@ class Searcher:
         self.filter_query = None
 
         self.organization = None
+        self.modified_since = None
+        self.sort = None
+
+        # Latest metadata_modified retrieved, the next incremental watermark.
+        self.max_metadata_modified = None
 
     def set_organization(self, organization):
         self.organization = organization
 
+    # Incremental search: only datasets modified since the given metadata_modified.
+    def set_modified_since(self, metadata_modified):
+        self.modified_since = metadata_modified
+        # Stable pages: datasets modified during the search move to the end.
+        self.sort = "metadata_modified asc"
+
     def build_query_params(self):
+        filters = []
         if self.organization:
-            self.filter_query = f"+organization:{self.organization}"
+            filters.append(f"+organization:{self.organization}")
 
-    # action.package_search request.
-    def request(self, start=None, rows=None) -> QueryResult:
-        self.last_query = {}
+        if self.modified_since:
+            filters.append(f"+metadata_modified:[{solr_date(self.modified_since)} TO *]")
+
+        self.filter_query = " ".join(filters) if filters else None
+
+    def build_query(self, start=None, rows=None) -> dict:
+        query = {}
         if self.query:
-            self.last_query["q"] = self.query
+            query["q"] = self.query
 
         if self.filter_query:
-            self.last_query["fq"] = self.filter_query
+            query["fq"] = self.filter_query
+
+        if self.sort:
+            query["sort"] = self.sort
 
         if start is not None:
-            self.last_query["start"] = start
+            query["start"] = start
         if rows is not None:
-            self.last_query["rows"] = rows
+            query["rows"] = rows
 
-        self.last_result = QueryResult(
-            self.remote_ckan.action.package_search(**self.last_query)
-        )
+        return query
+
+    def _thread_remote_ckan(self) -> RemoteCKAN:
+        if threading.current_thread() is threading.main_thread():
+            return self.remote_ckan
+
+        if not hasattr(self._local, "remote_ckan"):
+            self._local.remote_ckan = RemoteCKAN(self.url)
+        return self._local.remote_ckan
+
+    def _package_search(self, query: dict) -> dict:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        requests_kwargs = {"timeout": self.timeout}
+        if not self.request_slots:
+            return self._thread_remote_ckan().call_action("package_search", query, requests_kwargs=requests_kwargs)
+
+        with self.request_slots:
+            return self._thread_remote_ckan().call_action("package_search", query, requests_kwargs=requests_kwargs)
+
+    # action.package_search request, retried on transient errors, without
+    # touching the searcher state.
+    def _fetch(self, query: dict) -> QueryResult:
+        if self.response_cache:
+            packages = self.response_cache.get(self.url, query)
+            if packages is not None:
+                return QueryResult(packages)
+
+        packages = self.retry_policy.call(self._package_search, query)
+        if self.response_cache:
+            self.response_cache.put(self.url, query, packages)
+
+        return QueryResult(packages)
+
+    def _track(self, result: QueryResult):
+        metadata_modified = result.max_metadata_modified()
+        if metadata_modified and (
+            not self.max_metadata_modified or metadata_modified > self.max_metadata_modified
+        ):
+            self.max_metadata_modified = metadata_modified
+
+    # Number of datasets the search would return.
+    def count(self) -> int:
+        return self._fetch(self.build_query(rows=0)).total_count or 0
+
+    # Own progress bar, or the scheduler's one shared by all the searchers.
+    def _start_progress(self, total, initial=0):
+        if self.progress is None:
+            return tqdm(total=total, initial=initial)
+
+        self.progress.update(initial)
+        return self.progress
+
+    def _close_progress(self, progress):
+        if progress is not self.progress:
+            progress.close()
+
+    def _report(self, message):
+        # Printed above the progress bars.
+        tqdm.write(f"[{self.organization}] {message}" if self.organization else message)
+
+    # action.package_search request.
+    def request(self, start=None, rows=None) -> QueryResult:
+        self.last_query = self.build_query(start=start, rows=rows)
+        self.last_result = self._fetch(self.last_query)
 
         return self.last_result
 
-    def search(self, start=None, rows=None, limit=None, sleep=None, retries=None):
-        total_expected = 0
-        total_retrieved = 0
+    # Pages already written to the output dir, to resume an interrupted search.
+    def open_checkpoint(self, rows=None):
+        if not self.output_dir:
+            return None
 
+        return SearchCheckpoint.open(self.output_dir, self.build_query(rows=rows))
+
+    def search(self, start=None, rows=None, limit=None):
         if start is None:
             start = 0
+        end = start + limit if limit else None
 
-        progress = None
+        checkpoint = self.open_checkpoint(rows=rows)
 
-        while not self.last_result or not self.last_result.is_empty():
-            try:
-                self.request(start=start, rows=rows)
-            except ckanapi.errors.CKANAPIError as api_error:
-                if not retries:
-                    raise api_error
+        # Skipping the pages written by a previous run.
+        total_resumed = 0
+        while checkpoint and checkpoint.pages.get(start) and (end is None or start < end):
+            total_resumed += checkpoint.pages[start]
+            start += checkpoint.pages[start]
 
-                if api_error.status == 502:
-                    retries -= 1
-                    if sleep:
-                        time.sleep(sleep)
+        total_expected = checkpoint.total_count if checkpoint else None
+        total_retrieved = 0
+        progress = None
 
-                    continue
+        while end is None or start < end:
+            result = self.request(start=start, rows=rows)
 
-            if not total_expected:
-                total_expected = self.last_result.total_count
-                progress = tqdm(total=total_expected)
+            if progress is None:
+                total_expected = result.total_count or 0
+                progress = self._start_progress(total_expected, initial=total_resumed)
 
-            progress.update(self.last_result.count)
-            total_retrieved += self.last_result.count
+            if result.is_empty():
+                break
 
-            if limit:
-                limit -= self.last_result.count
+            progress.update(result.count)
+            total_retrieved += result.count
+            self._track(result)
 
-                if limit <= 0:
-                    break
+            if self.output_dir and self.output_prefix:
+                self.write_last_result(self.output_dir, self.output_prefix)
+            if checkpoint:
+                checkpoint.mark(start, result.count, result.total_count)
 
             # Updating start for next request.
-            start += self.last_result.count
+            start += result.count
+
+        if progress:
+            self._close_progress(progress)
+        if checkpoint:
+            checkpoint.finish()
+
+        self._report(
+            f"Expected: {total_expected}, Retrieved: {total_retrieved}"
+            + (f" (+{total_resumed} from a previous run)" if total_resumed else "")
+        )
+
+        return True
+
+    def search_parallel(self, start=None, rows=None, limit=None, workers=4):
+        """
+        Fetches every page concurrently: the first response count gives all the
+        'start' offsets up front. Each page is written as soon as it arrives, pages
+        are checked for completeness once all workers are done.
+        """
+        if start is None:
+            start = 0
+
+        checkpoint = self.open_checkpoint(rows=rows)
+        pages = {}
+        dataset_ids = set()
+
+        if checkpoint and checkpoint.pages.get(start):
+            # Resuming: offsets are the ones of the interrupted run.
+            page_size = checkpoint.page_size
+            end = checkpoint.total_count
+            for offset, count in checkpoint.pages.items():
+                pages[offset] = count
+                dataset_ids.update(self.read_page_ids(offset, rows, end))
+        else:
+            first = self.request(start=start, rows=rows)
+            if first.is_empty():
+                self._report(f"Expected: {first.total_count or 0}, Retrieved: 0")
+                return True
+
+            page_size = first.count
+            end = first.total_count
 
             if self.output_dir and self.output_prefix:
                 self.write_last_result(self.output_dir, self.output_prefix)
+            if checkpoint:
+                checkpoint.mark(start, first.count, first.total_count)
+
+            pages[start] = first.count
+            dataset_ids.update(obj["id"] for obj in first.packages["results"])
+            self._track(first)
+
+        if limit:
+            end = min(end, start + limit)
+
+        offsets = list(range(start + page_size, end, page_size))
+        pending = [offset for offset in offsets if not pages.get(offset)]
+
+        progress = self._start_progress(end - start, initial=sum(pages.values()))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._fetch, self.build_query(start=offset, rows=rows)): offset
+                for offset in pending
+            }
+            for future in as_completed(futures):
+                offset = futures[future]
+                try:
+                    result = future.result()
+                except Exception as error:
+                    logging.warning(f"Page start={offset} failed: {error}")
+                    continue
 
-        progress.close()
-        print(f"Expected: {total_expected}, Retrieved: {total_retrieved}")
+                pages[offset] = result.count
+                dataset_ids.update(obj["id"] for obj in result.packages["results"])
+                self._track(result)
+                progress.update(result.count)
+                self.write_result(result, self.build_query(start=offset, rows=rows))
+                if checkpoint:
+                    checkpoint.mark(offset, result.count, result.total_count)
+
+        self._close_progress(progress)
+        complete = self.check_completeness(pages, offsets, start, end, page_size, dataset_ids)
+        # Failed pages stay out of the checkpoint, to be fetched on resume.
+        if checkpoint and complete:
+            checkpoint.finish()
+
+        return complete
+
+    # Dataset ids of a page written by a previous run.
+    def read_page_ids(self, start, rows, total_count) -> list:
+        path = self.result_path(self.build_query(start=start, rows=rows), total_count)
+        if not path or not path.exists():
+            return []
+
+        return [obj["id"] for obj in PageReader(path)]
+
+    def check_completeness(self, pages: dict, offsets: list, start, end, page_size, dataset_ids: set):
+        missing = [offset for offset in [start] + offsets if offset not in pages]
+        # Pages come back in any order, but each one is written to its own
+        # zero padded 'start' file, so listing them gives the search order.
+        short = [
+            offset
+            for offset in sorted(pages)
+            if pages[offset] < min(page_size, end - offset)
+        ]
+        total_retrieved = sum(pages.values())
+
+        self._report(
+            f"Expected: {end - start}, Retrieved: {total_retrieved}, "
+            f"Unique datasets: {len(dataset_ids)}"
+        )
+        if missing:
+            logging.error(f"{self.organization} missing pages (start): {missing}")
+        if short:
+            logging.warning(
+                f"{self.organization} incomplete pages (start): {short}, results changed during the search?"
+            )
 
-    # Writes last request result to a file.
-    def write_last_result(self, output_dir: pathlib.Path, prefix: str = None):
-        if not prefix:
-            prefix = "searcher"
+        return not missing and not short
+
+    # Output file of a request, named after its query.
+    def result_path(self, query: dict, total_count, output_dir: pathlib.Path = None, prefix: str = None):
+        output_dir = output_dir or self.output_dir
+        if not output_dir:
+            return None
+
+        prefix = prefix or self.output_prefix or "searcher"
 
         # Building file path
         name = prefix
 
-        if "start" in self.last_query and self.last_result.total_count:
+        if "start" in query and total_count:
             # Zero padding "start" according to total count digits.
             name += (
-                "_S{start:0" + str(self.last_result.total_count_digits) + "}"
-            ).format(start=self.last_query["start"])
+                "_S{start:0" + str(len(str(total_count))) + "}"
+            ).format(start=query["start"])
 
-        if "rows" in self.last_query:
-            name += "_R{0}".format(self.last_query["rows"])
+        if "rows" in query:
+            name += "_R{0}".format(query["rows"])
 
-        output_dir.mkdir(exist_ok=True)
+        return output_dir / (name + "." + self.output_format)
 
-        output_path = output_dir / (name + ".json")
-        self.last_result.write(output_path)
+    # Writes a request result to a file named after its query.
+    def write_result(self, result: QueryResult, query: dict, output_dir: pathlib.Path = None, prefix: str = None):
+        output_path = self.result_path(query, result.total_count, output_dir, prefix)
+        if not output_path:
+            return
+
+        output_path.parent.mkdir(exist_ok=True)
+        result.write(output_path, query=query)
+
+    # Writes last request result to a file.
+    def write_last_result(self, output_dir: pathlib.Path, prefix: str = None):
+        self.write_result(self.last_result, self.last_query, output_dir, prefix=prefix)
 
 
 # -----
 
 
 class DatasetLoader:
-    def __init__(self, exists_ok=False):
+    def __init__(self, exists_ok=False, session=None):
         self.path = None
         self.query_result = None
         self.exists_ok = exists_ok
-        self.model_manager = ModelManager(exists_ok=exists_ok)
+        self.model_manager = ModelManager(exists_ok=exists_ok, session=session)
 
         self.datasets = {}
         self.duplicates = []
 
         self.total_count = 0
 
+        # Latest version of each dataset and the page holding it, see index().
+        self.page_index = None
+
+        # Datasets already processed, see skip_unchanged().
+        self.hash_store = None
+        self.hash_scope = None
+        self.unchanged_count = 0
+        # (dg_id, content_hash) of the datasets loaded, see pop_loaded_hashes().
+        self.loaded_hashes = []
+
+    # First pass over the pages, without building any object: load() then only
+    # creates the latest version of each dataset.
+    def index(self, path: pathlib.Path):
+        for _ in self.index_pages([path]):
+            pass
+
+    # Same as index() for many pages, decoded by `workers` processes. Yields each
+    # page once indexed.
+    def index_pages(self, paths: list, workers: int = 1):
+        if self.page_index is None:
+            self.page_index = RecordIndex()
+
+        yield from index_pages(self.page_index, paths, workers=workers)
+
+    # Datasets whose content hash is in hash_store for scope are not loaded again. The
+    # hashes come from the index, see index_pages().
+    def skip_unchanged(self, hash_store: HashStore, scope: str):
+        self.hash_store = hash_store
+        self.hash_scope = scope
+
+    # True when a previous run loaded a version of the dataset: it is in the database
+    # already, see skip_unchanged().
+    def was_loaded(self, dg_id: str) -> bool:
+        return self.hash_store is not None and self.hash_store.get(self.hash_scope, dg_id) is not None
+
+    # Hashes to record once the datasets loaded are written.
+    def pop_loaded_hashes(self) -> list:
+        loaded_hashes = self.loaded_hashes
+        self.loaded_hashes = []
+        return loaded_hashes
+
+    # Second pass after index_pages(), without load(): (path, [(dg_id, metadata_modified,
+    # transform(dataset_obj))...]) of the datasets to load in each page. The pages are
+    # decoded, and transformed, by `workers` processes.
+    def iter_latest(self, paths: list, workers: int = 1, transform=None):
+        for path, objects in iter_latest_objects(self.page_index, paths, workers=workers, transform=transform):
+            yield path, [
+                (dg_id, metadata_modified, obj)
+                for dg_id, metadata_modified, obj in objects
+                if self.should_load_version(dg_id, metadata_modified, path)
+            ]
+
+    def should_load(self, dataset_obj, path: pathlib.Path) -> bool:
+        """Latest version of the dataset, changed since the last run if skipping unchanged ones."""
+        return self.should_load_version(dataset_obj["id"], dataset_obj["metadata_modified"], path)
+
+    def should_load_version(self, dg_id: str, metadata_modified: str, path: pathlib.Path) -> bool:
+        if self.page_index is None:
+            return True
+
+        if not self.page_index.is_latest(dg_id, metadata_modified, source=path):
+            return False
+
+        content_hash = self.page_index.get(dg_id).content_hash
+        if self.hash_store is not None and content_hash is not None:
+            if self.hash_store.unchanged(self.hash_scope, dg_id, content_hash):
+                self.unchanged_count += 1
+                return False
+
+            self.loaded_hashes.append((dg_id, content_hash))
+
+        return True
+
     def load(self, path: pathlib.Path, resources=False) -> QueryResult:
         self.path = path
 
+        # Datasets are parsed one at a time, the page is never fully in memory.
+        reader = PageReader(path)
+        count = 0
+        for dataset_obj in reader:
+            count += 1
+            if not self.should_load(dataset_obj, path):
+                continue
+
+            # Changed datasets are updated, not inserted again.
+            self.model_manager.create_dataset(
+                dataset_obj, resources=resources, written=self.was_loaded(dataset_obj["id"])
+            )
+
+        # Page summary only, its datasets are in the model manager.
         self.query_result = QueryResult(
-            json.load(path.open("r")),
+            {"count": reader.total_count},
             model_manager=self.model_manager,
         )
-        self.query_result.parse_results(resources=resources)
+        self.query_result.count = count
 
         # Adding datasets one by one to filter duplicates.
         # for dataset_id, dataset in self.query_result.datasets.items():
@@ -189,7 +540,7 @@ class DatasetLoader:
 
         #    self.datasets[dataset_id] = dataset
 
-        if self.query_result.total_count > self.total_count:
+        if (self.query_result.total_count or 0) > self.total_count:
             self.total_count = self.query_result.total_count
 
         return self.query_result
@@ -0,0 +1,144 @@
+# coding: utf-8
+
+import collections
+import functools
+import multiprocessing
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+from .catalog_index import CatalogIndex
+from .content_hash import dataset_hash
+from .record_index import RecordIndex
+from .stream import PageReader
+
+# Pages decoded ahead of the main process, per worker.
+_PAGES_AHEAD = 2
+
+
+def _page_records(path: pathlib.Path) -> list:
+    # Worker side: JSON decoding and hashing, only compact records go back to the main
+    # process.
+    return [(obj["id"], obj["metadata_modified"], dataset_hash(obj)) for obj in PageReader(path)]
+
+
+def _latest_objects(path: pathlib.Path, versions: dict, transform=None) -> list:
+    # Worker side: only the latest versions go back to the main process, transformed
+    # (to table rows...) there already.
+    return [
+        (obj["id"], obj["metadata_modified"], transform(obj) if transform else obj)
+        for obj in PageReader(path)
+        if versions.get(obj["id"]) == obj["metadata_modified"]
+    ]
+
+
+def _mp_context():
+    # The scripts have no __main__ guard: "spawn" would run them again in each worker.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+
+    return None
+
+
+def _ordered_map(fn, items: list, workers: int = 1):
+    """fn(*item) of each item in items order, computed by `workers` processes a few items ahead."""
+    if workers <= 1:
+        for item in items:
+            yield fn(*item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) as executor:
+        # Bounded: results are not piling up when the main process is the slowest.
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(fn, *item))
+            if len(pending) >= workers * _PAGES_AHEAD:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+class _CatalogIndexes:
+    # Read-only catalog index of each page directory, None when it has none.
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, path: pathlib.Path):
+        directory = pathlib.Path(path).parent
+        if directory not in self.indexes:
+            self.indexes[directory] = (
+                CatalogIndex(directory, read_only=True) if CatalogIndex.exists(directory) else None
+            )
+
+        return self.indexes[directory]
+
+    def covers(self, path: pathlib.Path) -> bool:
+        index = self.get(path)
+        return index is not None and index.covers(path)
+
+    def page_records(self, path: pathlib.Path):
+        index = self.get(path)
+        return index.page_records(path) if index else None
+
+    def close(self):
+        for index in self.indexes.values():
+            if index:
+                index.close()
+
+
+def iter_page_records(paths: list, workers: int = 1):
+    """
+    (path, [(dg_id, metadata_modified, content_hash)...]) of each page, in paths order
+    whatever the workers. Pages of an up to date catalog index (retriever.py builds one)
+    are not decoded, their records are read from it.
+    """
+    catalog_indexes = _CatalogIndexes()
+    indexed = {path for path in paths if catalog_indexes.covers(path)}
+    decoded = _ordered_map(_page_records, [(path,) for path in paths if path not in indexed], workers)
+    try:
+        for path in paths:
+            if path not in indexed:
+                yield path, next(decoded)
+                continue
+
+            records = catalog_indexes.page_records(path)
+            # None when rewritten since covers().
+            yield path, records if records is not None else _page_records(path)
+    finally:
+        decoded.close()
+        catalog_indexes.close()
+
+
+def index_pages(index: RecordIndex, paths: list, workers: int = 1):
+    """
+    Records the latest version of each dataset of the pages in index, the pages being
+    decoded by `workers` processes. Yields each page once recorded.
+
+    Page results are merged in paths order with the serial rule (newest
+    metadata_modified wins, first page seen on ties): the index does not depend on
+    the number of workers.
+    """
+    for path, records in iter_page_records(paths, workers=workers):
+        for dg_id, metadata_modified, content_hash in records:
+            index.offer(dg_id, metadata_modified, source=path, content_hash=content_hash)
+
+        yield path
+
+
+def iter_latest_objects(index: RecordIndex, paths: list, workers: int = 1, transform=None):
+    """
+    Second pass of index_pages(): (path, [(dg_id, metadata_modified, object)...]) of the
+    latest versions held by each page, in paths order. The pages are decoded by
+    `workers` processes, which also apply `transform` (a module level function) to the
+    objects: only what the main process needs is sent back.
+    """
+    # path => {dg_id: metadata_modified} of the versions to send back.
+    versions = {str(path): {} for path in paths}
+    for dg_id, record in index.records.items():
+        page_versions = versions.get(record.source)
+        if page_versions is not None:
+            page_versions[dg_id] = record.metadata_modified
+
+    fn = functools.partial(_latest_objects, transform=transform)
+    results = _ordered_map(fn, [(path, versions[str(path)]) for path in paths], workers)
+    yield from zip(paths, results)
@@ -0,0 +1,65 @@
+# coding: utf-8
+
+import sys
+
+
+class Record:
+    # A few dozen bytes per record, against kilobytes for the ORM objects.
+    __slots__ = ("metadata_modified", "source", "content_hash")
+
+    def __init__(self, metadata_modified: str, source: str = None, content_hash: str = None):
+        self.metadata_modified = metadata_modified
+        self.source = source
+        self.content_hash = content_hash
+
+
+class RecordIndex:
+    """
+    dg_id => metadata_modified (and source page) of every CKAN record seen, for the
+    exists/newer checks without keeping the records themselves.
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, dg_id) -> bool:
+        return dg_id in self.records
+
+    def get(self, dg_id) -> Record:
+        return self.records.get(dg_id)
+
+    def add(self, dg_id: str, metadata_modified: str, source=None, content_hash: str = None) -> Record:
+        # Thousands of records share a source page: storing it once.
+        if source is not None:
+            source = sys.intern(str(source))
+
+        record = self.records.get(dg_id)
+        if record is None:
+            record = self.records[sys.intern(dg_id)] = Record(metadata_modified, source, content_hash)
+        else:
+            record.metadata_modified = metadata_modified
+            record.source = source
+            record.content_hash = content_hash
+
+        return record
+
+    def offer(self, dg_id: str, metadata_modified: str, source=None, content_hash: str = None) -> bool:
+        """Records dg_id if it is new or newer than the recorded version."""
+        record = self.records.get(dg_id)
+        if record is not None and metadata_modified <= record.metadata_modified:
+            return False
+
+        self.add(dg_id, metadata_modified, source, content_hash)
+        return True
+
+    def is_latest(self, dg_id: str, metadata_modified: str, source=None) -> bool:
+        """True when this version, from this source, is the recorded one."""
+        record = self.records.get(dg_id)
+        return (
+            record is not None
+            and record.metadata_modified == metadata_modified
+            and record.source == (str(source) if source is not None else None)
+        )
@@ -0,0 +1,53 @@
+# coding: utf-8
+
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import time
+
+
+class ResponseCache:
+    """
+    package_search responses on disk, keyed by CKAN URL and query: replaying a harvest
+    needs no network. Entries older than `ttl` seconds are fetched again (None: never).
+    """
+
+    def __init__(self, directory: pathlib.Path, ttl: float = None):
+        self.directory = pathlib.Path(directory)
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, url: str, query: dict) -> pathlib.Path:
+        key = json.dumps([url.rstrip("/"), query], sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / (digest + ".json.gz")
+
+    def get(self, url: str, query: dict):
+        path = self._path(url, query)
+        try:
+            if self.ttl is not None and time.time() - path.stat().st_mtime > self.ttl:
+                self.misses += 1
+                return None
+
+            with gzip.open(path, "rt", encoding="utf-8") as cache_file:
+                packages = json.load(cache_file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return packages
+
+    def put(self, url: str, query: dict, packages: dict):
+        path = self._path(url, query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written aside then renamed: concurrent workers never read half an entry.
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as cache_file:
+            json.dump(packages, cache_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
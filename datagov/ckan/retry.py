@@ -0,0 +1,63 @@
+# coding: utf-8
+
+import ast
+import logging
+import random
+import time
+
+import requests
+
+from ckanapi.errors import CKANAPIError
+
+# Statuses worth another try: rate limited or server side failures.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def error_status(error: CKANAPIError):
+    """HTTP status of a ckanapi error, whose message is repr([url, status, response])."""
+    try:
+        details = ast.literal_eval(str(error))
+    except (ValueError, SyntaxError):
+        return None
+
+    if isinstance(details, list) and len(details) == 3 and isinstance(details[1], int):
+        return details[1]
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient CKAN errors."""
+
+    def __init__(self, retries: int = 5, base: float = 1.0, cap: float = 60.0):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return True
+
+        if isinstance(error, CKANAPIError):
+            return error_status(error) in RETRYABLE_STATUSES
+
+        return False
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter: workers failing together do not retry together.
+        return random.uniform(0, min(self.cap, self.base * 2**attempt))
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as error:
+                if attempt >= self.retries or not self.is_transient(error):
+                    raise
+
+                delay = self.delay(attempt)
+                attempt += 1
+                logging.warning(
+                    f"Transient error ({error}), retry {attempt}/{self.retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
@@ -0,0 +1,97 @@
+# coding: utf-8
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+
+class HarvestJob:
+    """
+    Harvest of one organization: harvest(searcher) runs the search (and whatever goes
+    with it) with the searcher set up for the organization.
+    """
+
+    def __init__(self, name: str, searcher, harvest, start: int = 0, limit: int = None):
+        self.name = name
+        self.searcher = searcher
+        self.harvest = harvest
+        self.start = start
+        self.limit = limit
+
+        # package_search count, from HarvestScheduler.probe().
+        self.count = None
+
+    def expected(self) -> int:
+        expected = max((self.count or 0) - self.start, 0)
+        return min(expected, self.limit) if self.limit else expected
+
+
+class HarvestScheduler:
+    """
+    Runs many organization harvests at once: at most `max_organizations` together and
+    `max_requests` package_search requests in flight across all of them (the per-host
+    rate is the searchers' RateLimiter). The largest organizations start first
+    (longest processing time first), so the smaller ones fill the end of the run.
+    """
+
+    def __init__(self, max_organizations: int = 4, max_requests: int = None):
+        self.max_organizations = max_organizations
+        self.request_slots = threading.BoundedSemaphore(max_requests) if max_requests else None
+
+    def probe(self, jobs: list) -> dict:
+        """
+        Sets the dataset count of each job, with a rows=0 package_search. Returns the
+        exception per job name of the failed ones.
+        """
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_organizations) as executor:
+            futures = {
+                executor.submit(job.searcher.count): job
+                for job in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    job.count = future.result()
+                except Exception as error:
+                    logging.error(f"Count of {job.name} failed: {error}")
+                    errors[job.name] = error
+
+        return errors
+
+    def order(self, jobs: list) -> list:
+        # Stable: organizations of the same size keep the command line order.
+        return sorted(jobs, key=lambda job: job.expected(), reverse=True)
+
+    def run(self, jobs: list) -> dict:
+        """
+        Harvests every job, returns the harvest() result (or exception) per job name. Jobs
+        whose count fails are not harvested, their result is the count exception.
+        """
+        for job in jobs:
+            job.searcher.request_slots = self.request_slots
+
+        organization_count = len(jobs)
+        results = self.probe(jobs)
+        jobs = self.order([job for job in jobs if job.name not in results])
+
+        progress = tqdm(total=sum(job.expected() for job in jobs), unit="dataset")
+        for job in jobs:
+            job.searcher.progress = progress
+
+        # Jobs are queued in order: the largest organizations are picked up first.
+        with ThreadPoolExecutor(max_workers=self.max_organizations) as executor:
+            futures = {executor.submit(job.harvest, job.searcher): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    results[job.name] = future.result()
+                except Exception as error:
+                    logging.error(f"Harvest of {job.name} failed: {error}")
+                    results[job.name] = error
+
+                progress.set_postfix(organizations=f"{len(results)}/{organization_count}")
+
+        progress.close()
+        return results
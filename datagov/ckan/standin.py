@@ -0,0 +1,200 @@
+# coding: utf-8
+
+import asyncio
+import datetime
+import json
+import pathlib
+import random
+import re
+import uuid
+from urllib.parse import parse_qsl
+
+from .stream import PageReader, iter_page_files
+
+_MAX_ROWS = 1000
+_DEFAULT_ROWS = 10
+
+_FQ_ORGANIZATION = re.compile(r"organization:\"?([\w-]+)\"?")
+_FQ_MODIFIED_SINCE = re.compile(r"metadata_modified:\[(\S+) TO \*\]")
+
+
+class CkanStandIn:
+    """
+    ASGI stand-in of a CKAN package_search endpoint (/api/action/package_search and
+    /api/3/action/package_search), serving recorded or synthetic datasets.
+
+    Supports what Searcher sends: start, rows, the organization and metadata_modified
+    range filters of fq, and sort by metadata_modified. Each request waits `latency`
+    seconds (+/- `jitter`), and fails with `error_status` with probability `error_rate`.
+    """
+
+    def __init__(
+        self,
+        datasets: list,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 502,
+        seed: int = None,
+    ):
+        self.datasets = datasets
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+        self.request_count = 0
+        self.error_count = 0
+
+    @classmethod
+    def from_pages(cls, directory: pathlib.Path, **kwargs) -> "CkanStandIn":
+        """Serves the datasets of recorded package_search pages (retriever.py output)."""
+        datasets = {}
+        for path in iter_page_files(directory):
+            for obj in PageReader(path):
+                if obj["id"] not in datasets or obj["metadata_modified"] > datasets[obj["id"]]["metadata_modified"]:
+                    datasets[obj["id"]] = obj
+
+        return cls(list(datasets.values()), **kwargs)
+
+    @classmethod
+    def synthetic(cls, count: int, organizations: int = 10, resources: int = 3, seed: int = 0, **kwargs) -> "CkanStandIn":
+        rng = random.Random(seed)
+        return cls(
+            [_synthetic_dataset(rng, index, organizations, resources) for index in range(count)],
+            seed=seed,
+            **kwargs,
+        )
+
+    def package_search(self, params: dict) -> dict:
+        datasets = self.datasets
+
+        fq = params.get("fq") or ""
+        organization = _FQ_ORGANIZATION.search(fq)
+        if organization:
+            datasets = [obj for obj in datasets if obj["organization"]["name"] == organization.group(1)]
+
+        modified_since = _FQ_MODIFIED_SINCE.search(fq)
+        if modified_since:
+            since = modified_since.group(1).rstrip("Z")
+            datasets = [obj for obj in datasets if obj["metadata_modified"] >= since]
+
+        sort = params.get("sort") or ""
+        if sort.startswith("metadata_modified"):
+            datasets = sorted(
+                datasets, key=lambda obj: obj["metadata_modified"], reverse=sort.endswith("desc")
+            )
+
+        start = int(params.get("start") or 0)
+        rows = min(int(params.get("rows") or _DEFAULT_ROWS), _MAX_ROWS)
+
+        return {
+            "count": len(datasets),
+            "facets": {},
+            "results": datasets[start:start + rows],
+            "sort": sort or "score desc, metadata_modified desc",
+            "search_facets": {},
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["type"] != "http":
+            return
+
+        self.request_count += 1
+
+        if not scope["path"].rstrip("/").endswith("/action/package_search"):
+            await _send_json(send, 404, {"success": False, "error": {"__type": "Not Found Error"}})
+            return
+
+        params = dict(parse_qsl(scope.get("query_string", b"").decode()))
+        body = await _read_body(receive)
+        if body:
+            try:
+                params.update(json.loads(body))
+            except ValueError:
+                params.update(parse_qsl(body.decode()))
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            # Proxy error pages are not JSON: ckanapi raises CKANAPIError with the status.
+            self.error_count += 1
+            await _send(send, self.error_status, b"Stand-in error", b"text/plain")
+            return
+
+        await _send_json(send, 200, {
+            "help": "package_search stand-in",
+            "success": True,
+            "result": self.package_search(params),
+        })
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send(send, status: int, body: bytes, content_type: bytes):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, obj: dict):
+    await _send(send, status, json.dumps(obj).encode(), b"application/json")
+
+
+def _synthetic_dataset(rng: random.Random, index: int, organizations: int, resources: int) -> dict:
+    organization = index % organizations
+    created = datetime.datetime(2020, 1, 1) + datetime.timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+    modified = created + datetime.timedelta(minutes=rng.randrange(365 * 24 * 60))
+    dataset_id = str(uuid.UUID(int=rng.getrandbits(128)))
+
+    return {
+        "id": dataset_id,
+        "name": f"dataset-{index}",
+        "title": f"Dataset {index}",
+        "notes": "Synthetic dataset",
+        "state": "active",
+        "metadata_created": created.isoformat(timespec="microseconds"),
+        "metadata_modified": modified.isoformat(timespec="microseconds"),
+        "organization": {
+            "id": str(uuid.UUID(int=organization + 1)),
+            "name": f"organization-{organization}",
+            "title": f"Organization {organization}",
+            "created": "2020-01-01T00:00:00.000000",
+        },
+        "extras": [{"key": "harvest_source_id", "value": f"source-{organization}"}],
+        "resources": [
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "name": f"resource-{index}-{number}",
+                "description": "",
+                "format": "CSV",
+                "mimetype": "text/csv",
+                "state": "active",
+                "url": f"https://data{organization}.example.gov/{index}/{number}.csv",
+                "created": created.isoformat(timespec="microseconds"),
+                "metadata_modified": modified.isoformat(timespec="microseconds"),
+            }
+            for number in range(resources)
+        ],
+    }
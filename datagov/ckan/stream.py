@@ -0,0 +1,139 @@
+# coding: utf-8
+
+import gzip
+import io
+import json
+import logging
+import pathlib
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# "json" is the CKAN response as is, "jsonl*" a header line then one dataset per line.
+PAGE_FORMATS = ("json", "jsonl", "jsonl.gz", "jsonl.zst")
+
+
+def page_format(path: pathlib.Path):
+    # Longest first: "jsonl.gz" before "json".
+    for candidate in sorted(PAGE_FORMATS, key=len, reverse=True):
+        if path.name.endswith("." + candidate):
+            return candidate
+
+    return None
+
+
+def open_page(path: pathlib.Path, mode: str = "r"):
+    """Text file of a page, (de)compressed according to its extension."""
+    kind = page_format(path)
+
+    if kind == "jsonl.gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+
+    if kind == "jsonl.zst":
+        if not zstandard:
+            raise ImportError(f"zstandard is needed to read or write {path}")
+
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+
+    return path.open(mode, encoding="utf-8")
+
+
+class PageReader:
+    """
+    Datasets of a package_search page file, read one at a time.
+
+    jsonl pages (compressed or not) hold the result header (count, start...) on their
+    first line. .json pages are streamed with ijson, or fully loaded without it.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.format = page_format(path)
+        self.header = {}
+
+        if self.format != "json":
+            with open_page(path) as page_file:
+                self.header = json.loads(page_file.readline() or "{}")
+        elif ijson:
+            # "count" comes first in CKAN responses, this stops right after it.
+            with path.open("rb") as page_file:
+                self.header = {"count": next(ijson.items(page_file, "count"), None)}
+
+        self.total_count = self.header.get("count")
+
+    def __iter__(self):
+        if self.format != "json":
+            with open_page(self.path) as page_file:
+                page_file.readline()
+                for line in page_file:
+                    if line.strip():
+                        yield json.loads(line)
+
+        elif ijson:
+            with self.path.open("rb") as page_file:
+                yield from ijson.items(page_file, "results.item", use_float=True)
+
+        else:
+            logging.warning(f"ijson is not installed, loading {self.path} at once.")
+            with self.path.open("r") as page_file:
+                packages = json.load(page_file)
+
+            self.total_count = packages.get("count")
+            yield from packages.get("results", [])
+
+
+def write_jsonl(packages: dict, output_file: io.TextIOBase, query: dict = None):
+    header = {key: value for key, value in packages.items() if key != "results"}
+    # Where the page stands in the search.
+    for key in ("start", "rows"):
+        if query and key in query:
+            header[key] = query[key]
+
+    output_file.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+    for obj in packages.get("results", []):
+        output_file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+
+def walk_page_files(directory: pathlib.Path):
+    """package_search page files under directory, skipping hidden ones (checkpoints)."""
+    for path in sorted(directory.rglob("*")):
+        if page_format(path) and not path.name.startswith(".") and path.is_file():
+            yield path
+
+
+def iter_page_files(directory: pathlib.Path):
+    """
+    Same as walk_page_files(), but directories with a catalog index list their pages
+    from it instead of being walked.
+    """
+    from .catalog_index import CatalogIndex
+
+    if CatalogIndex.exists(directory):
+        index = CatalogIndex(directory, read_only=True)
+        page_files = index.page_files()
+        stale = page_files and index.is_stale()
+        index.close()
+
+        # An empty index (never built) or an outdated one falls back to walking.
+        if stale:
+            logging.warning(f"{directory}: catalog index out of date, build_catalog_index.py refreshes it")
+        elif page_files:
+            yield from page_files
+            return
+
+    for path in sorted(directory.iterdir()):
+        if path.name.startswith("."):
+            continue
+
+        if path.is_dir():
+            yield from iter_page_files(path)
+        elif page_format(path):
+            yield path
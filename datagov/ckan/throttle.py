@@ -0,0 +1,46 @@
+# coding: utf-8
+
+import threading
+import time
+
+from urllib.parse import urlparse
+
+
+class RateLimiter:
+    """Token bucket shared by every thread requesting the same host."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def host_rate_limiter(url: str, rate: float, burst: int = 1) -> RateLimiter:
+    """Returns the rate limiter of the host of url, creating it on first use."""
+    host = urlparse(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(rate, burst=burst)
+        return _limiters[host]
@@ -0,0 +1,49 @@
+# coding: utf-8
+
+import json
+import os
+import pathlib
+import threading
+
+
+def solr_date(metadata_modified: str) -> str:
+    """
+    Solr date of a CKAN metadata_modified (UTC, microseconds, no timezone). Truncated
+    to the second, the range filter on it still includes the watermark itself.
+    """
+    return metadata_modified[:19] + "Z"
+
+
+class WatermarkStore:
+    """Latest metadata_modified harvested per organization, kept in a JSON file."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.watermarks = {}
+        # Organizations harvested concurrently update the same file.
+        self._lock = threading.Lock()
+
+        if path.exists():
+            self.watermarks = json.loads(path.read_text())
+
+    def get(self, organization: str):
+        return self.watermarks.get(organization)
+
+    def update(self, organization: str, metadata_modified: str):
+        # Never moving backwards, e.g. after an empty delta.
+        if not metadata_modified:
+            return
+
+        with self._lock:
+            current = self.watermarks.get(organization)
+            if current and current >= metadata_modified:
+                return
+
+            self.watermarks[organization] = metadata_modified
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.watermarks, indent=4, sort_keys=True))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,51 @@
+# coding: utf-8
+
+import argparse
+import pathlib
+
+import uvicorn
+
+from ckan.standin import CkanStandIn
+
+"""
+Serves a local CKAN package_search stand-in, to develop and benchmark the harvest
+offline:
+
+    python ckan_standin.py --synthetic 100000 --latency 0.2 --error-rate 0.05
+    python retriever.py organization-1 --url http://127.0.0.1:8800 --full --workers 8
+"""
+
+argparser = argparse.ArgumentParser(description="Local CKAN package_search stand-in.")
+source = argparser.add_mutually_exclusive_group(required=True)
+source.add_argument(
+    "--recorded",
+    type=pathlib.Path,
+    help="Directory of package_search pages (retriever.py output) to serve.",
+)
+source.add_argument("--synthetic", type=int, help="Number of synthetic datasets to serve.")
+argparser.add_argument("--organizations", type=int, default=10, help="Synthetic organizations.")
+argparser.add_argument("--latency", type=float, default=0.0, help="Response delay, in seconds.")
+argparser.add_argument("--jitter", type=float, default=0.0, help="Random +/- delay, in seconds.")
+argparser.add_argument("--error-rate", type=float, default=0.0, help="Share of failed requests.")
+argparser.add_argument("--error-status", type=int, default=502)
+argparser.add_argument("--seed", type=int, default=0)
+argparser.add_argument("--host", default="127.0.0.1")
+argparser.add_argument("--port", type=int, default=8800)
+
+args = argparser.parse_args()
+
+options = {
+    "latency": args.latency,
+    "jitter": args.jitter,
+    "error_rate": args.error_rate,
+    "error_status": args.error_status,
+}
+if args.recorded:
+    app = CkanStandIn.from_pages(args.recorded.resolve(strict=True), seed=args.seed, **options)
+else:
+    app = CkanStandIn.synthetic(
+        args.synthetic, organizations=args.organizations, seed=args.seed, **options
+    )
+
+print(f"Serving {len(app.datasets)} datasets on http://{args.host}:{args.port}")
+uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -8,6 +8,7 @@ import pathlib
 import re
 from tqdm import tqdm
 
+from ckan.catalog_index import CatalogIndex
 from ckan.package_search import DatasetLoader
 
 from sqlalchemy.orm import load_only
@@ -62,6 +63,16 @@ class RankedRequestManager:
         self.dataset_cache = {}
 
         self.dataset_loader = DatasetLoader(exists_ok=True)
+        # Harvest directory => its catalog index, None when not indexed.
+        self.catalog_indexes = {}
+
+    def get_catalog_index(self, directory: pathlib.Path):
+        if directory not in self.catalog_indexes:
+            self.catalog_indexes[directory] = (
+                CatalogIndex(directory, read_only=True) if CatalogIndex.exists(directory) else None
+            )
+
+        return self.catalog_indexes[directory]
 
     def get_dataset_info(self, ds_id: str, relative_path: str):
         if ds_id in self.dataset_cache:
@@ -69,6 +80,21 @@ class RankedRequestManager:
 
         absolute_path = pathlib.Path(self.root_path) / relative_path
 
+        # Reading the dataset alone rather than loading its whole page.
+        catalog_index = self.get_catalog_index(absolute_path.parent)
+        obj = catalog_index.get(ds_id) if catalog_index else None
+        if obj:
+            result = {
+                "org": obj["organization"]["name"],
+                "id": ds_id,
+                "name": obj["name"],
+                "title": obj["title"],
+                "path": relative_path,
+            }
+            self.dataset_cache[ds_id] = result
+
+            return result
+
         if ds_id not in self.dataset_loader.model_manager.datasets:
             self.dataset_loader.load(absolute_path, resources=False)
 
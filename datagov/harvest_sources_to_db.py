@@ -11,6 +11,8 @@ from sqlalchemy.orm import load_only
 
 from tqdm import tqdm
 
+from ckan.stream import PageReader, iter_page_files
+
 from rescue_db.rescue_api import database
 
 from rescue_db.rescue_api.models.organization import Organization
@@ -214,82 +216,79 @@ for org_name, organization in organizations.items():
     metadata_index = 0
 
     # Load harvest source datasets for the organization
-    for metadata_item in metadata_directory.rglob(f"*{org_name}*/*.json"):
+    for metadata_item in iter_page_files(metadata_directory):
+        if org_name not in metadata_item.parent.name:
+            continue
+
         logger.debug(f"Processing metadata file: {metadata_item}")
 
         datasets = {}
+        dataset_count = 0
 
-        with metadata_item.open("r", encoding="utf-8") as f:
-            metadata = json.load(f)
+        # Datasets are read one at a time, whatever the page format.
+        for json_ds in PageReader(metadata_item):
+            dataset_count += 1
+            ds_dg_id = json_ds.get("id")
 
-            if "results" not in metadata:
-                logger.warning(f"No results found in metadata file: {metadata_item}")
+            if not ds_dg_id in db_datasets_dg_id:
+                logger.error(
+                    f"Dataset {ds_dg_id} not found in database for organization {org_name}"
+                )
+                exit(1)
+
+            harvest_source_dg_id = None
+            for extra in json_ds.get("extras", []):
+                if extra.get("key") == "harvest_source_id":
+                    harvest_source_dg_id = extra.get("value")
+                    break
+
+            # Check if dataset has a harvest source ID
+            if (
+                not harvest_source_dg_id
+                or harvest_source_dg_id not in db_harvest_sources
+            ):
+                logger.warning(
+                    f"Harvest source ID {harvest_source_dg_id} not found for dataset {json_ds.get('id')}"
+                )
                 continue
 
-            json_datasets = metadata["results"]
-
-            for json_ds in json_datasets:
-                ds_dg_id = json_ds.get("id")
-
-                if not ds_dg_id in db_datasets_dg_id:
-                    logger.error(
-                        f"Dataset {ds_dg_id} not found in database for organization {org_name}"
-                    )
-                    exit(1)
-
-                harvest_source_dg_id = None
-                for extra in json_ds.get("extras", []):
-                    if extra.get("key") == "harvest_source_id":
-                        harvest_source_dg_id = extra.get("value")
-                        break
-
-                # Check if dataset has a harvest source ID
-                if (
-                    not harvest_source_dg_id
-                    or harvest_source_dg_id not in db_harvest_sources
-                ):
-                    logger.warning(
-                        f"Harvest source ID {harvest_source_dg_id} not found for dataset {json_ds.get('id')}"
-                    )
-                    continue
-
-                # Check if harvest source is known
-                if harvest_source_dg_id not in db_harvest_sources:
-                    logger.error(f"Harvest source {harvest_source_dg_id} not known")
-                    exit(1)
-
-                dataset = db_datasets_dg_id[ds_dg_id]
-                if (
-                    dataset.harvest_source_id
-                    and dataset.harvest_source_id
-                    == db_harvest_sources[harvest_source_dg_id]
-                ):
-                    logger.debug(
-                        f"Dataset {ds_dg_id} is already associated with harvest source {harvest_source_dg_id}, skipping."
-                    )
-                    continue
-
-                hs_ds_association = HarvestSourceDataset(
-                    harvest_source_id=db_harvest_sources[harvest_source_dg_id],
-                    dataset_id=dataset.id,
+            # Check if harvest source is known
+            if harvest_source_dg_id not in db_harvest_sources:
+                logger.error(f"Harvest source {harvest_source_dg_id} not known")
+                exit(1)
+
+            dataset = db_datasets_dg_id[ds_dg_id]
+            if (
+                dataset.harvest_source_id
+                and dataset.harvest_source_id
+                == db_harvest_sources[harvest_source_dg_id]
+            ):
+                logger.debug(
+                    f"Dataset {ds_dg_id} is already associated with harvest source {harvest_source_dg_id}, skipping."
                 )
-                db.add(hs_ds_association)
+                continue
 
-                db_harvest_source_datasets[dataset.id] = db_harvest_sources[
-                    harvest_source_dg_id
-                ]
+            hs_ds_association = HarvestSourceDataset(
+                harvest_source_id=db_harvest_sources[harvest_source_dg_id],
+                dataset_id=dataset.id,
+            )
+            db.add(hs_ds_association)
 
-                logger.debug(
-                    f"Associated dataset {ds_dg_id} with harvest source {harvest_source_dg_id}"
-                )
-            logger.info(
-                f"Processed {len(json_datasets)} datasets from metadata file {metadata_item}"
+            db_harvest_source_datasets[dataset.id] = db_harvest_sources[
+                harvest_source_dg_id
+            ]
+
+            logger.debug(
+                f"Associated dataset {ds_dg_id} with harvest source {harvest_source_dg_id}"
             )
+        logger.info(
+            f"Processed {dataset_count} datasets from metadata file {metadata_item}"
+        )
 
-            metadata_index += 1
-            if metadata_index % 100 == 0:
-                logger.info(f"Processed {metadata_index} metadata files so far.")
-                db.commit()
+        metadata_index += 1
+        if metadata_index % 100 == 0:
+            logger.info(f"Processed {metadata_index} metadata files so far.")
+            db.commit()
 
         # Committing remaining associations
         if db.dirty:
@@ -5,7 +5,9 @@ import pathlib
 import re
 from tqdm import tqdm
 
+from ckan.content_hash import HashStore
 from ckan.package_search import DatasetLoader
+from ckan.stream import iter_page_files
 
 from rescue_db.rescue_api import database
 
@@ -23,8 +25,20 @@ argparser.add_argument(
 
 argparser.add_argument(
     "--dataset-batch-size",
+    type=int,
     default=500,
-    help="Number of datasets to insert in a single transaction for big organizations.",
+    help="Number of datasets to insert in a single transaction.",
+)
+argparser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Processes decoding the pages while indexing them.",
+)
+argparser.add_argument(
+    "--hash-store",
+    type=pathlib.Path,
+    help="SQLite file of the datasets already inserted: unchanged ones are skipped, changed ones updated.",
 )
 
 args = argparser.parse_args()
@@ -37,95 +51,74 @@ existing_organizations = {}
 
 path_regex = re.compile(args.path_regex)
 
-loader = DatasetLoader(exists_ok=True)
+db = next(database.get_db())
+# Organizations stay in memory across commits, see ModelManager.release()
+db.expire_on_commit = False
 
-file_index = 0
+# Datasets met again once released, or changed since the last run, are updated in db.
+loader = DatasetLoader(exists_ok=True, session=db)
 
-# First pass to count items.
-file_count = len(
-    [item for item in args.input.rglob("*.json") if path_regex.match(str(item))]
-)
+hash_store = None
+if args.hash_store:
+    hash_store = HashStore(args.hash_store)
+    loader.skip_unchanged(hash_store, "json_to_db.datasets")
 
-db = next(database.get_db())
-progress = tqdm(total=file_count, desc="Processing files", unit="file")
 
-for item in args.input.rglob("*.json"):
-    match_res = path_regex.match(str(item))
-    if not match_res:
-        continue
+# Hashes recorded once their datasets are committed.
+def commit():
+    db.commit()
+    if hash_store:
+        hash_store.record("json_to_db.datasets", loader.pop_loaded_hashes())
 
-    query_result = loader.load(item, resources=True)
 
-    # file_index += 1
+# First pass to count items.
+items = [item for item in iter_page_files(args.input) if path_regex.match(str(item))]
+file_count = len(items)
 
-    # if not query_result.is_empty():
-    #     organizations = query_result.model_manager.get_organizations()
-    #     for organization in organizations:
-    #         db.merge(organization)
-    #         db.commit()
+# Second pass indexing the latest version of each dataset, without building objects.
+progress = tqdm(total=file_count, desc="Indexing files", unit="file")
 
+for item in loader.index_pages(items, workers=args.workers):
     progress.update(1)
 
 progress.close()
 
-# Second pass to insert organizations.
-
-# Counting
-organization_count = len(loader.model_manager.organizations)
-print(f"Found {organization_count} organizations.")
-
-dataset_count = len(loader.model_manager.datasets)
+dataset_count = len(loader.page_index)
 print(f"Found {dataset_count} datasets.")
 
-resource_count = len(loader.model_manager.resources)
-print(f"Found {resource_count} resources.")
-
+# Third pass creating the latest datasets only, written and released in batches.
 progress = tqdm(total=dataset_count, desc="Inserting datasets", unit="dataset")
 
-organizations = loader.model_manager.get_organizations()
-for organization in organizations:
-    org_dataset_count = len(organization.datasets)
-    if org_dataset_count <= 30000:
-        progress.set_description(f"Inserting {organization.dg_name} datasets")
-        db.merge(organization)
-        db.commit()
-
-        progress.update(org_dataset_count)
-    else:
-        # Organization has too many datasets, handling separately
-        # progress.set_description(f"Organization {organization.dg_name} has too many datasets ({org_dataset_count}). Handling separately.")
-
-        # Detaching datasets from organization to insert them in batches
-        org_datasets = list(organization.datasets)  # Save the list
-        organization.datasets = []
+pending_count = 0
 
-        db.add(organization)
-        db.commit()
+for item in items:
+    loader.load(item, resources=True)
 
-        i = 0
-        pending_commit_datasets = []
+    datasets = loader.model_manager.get_datasets()
+    for dataset in datasets[pending_count:]:
+        db.add(dataset)
+    progress.update(len(datasets) - pending_count)
+    pending_count = len(datasets)
 
-        for dataset in org_datasets:
-            i += 1
+    if pending_count >= args.dataset_batch_size:
+        commit()
+        # Freeing memory
+        loader.model_manager.release()
+        pending_count = 0
 
-            dataset.organization = organization
-            db.add(dataset)
-            progress.update(1)
+commit()
+loader.model_manager.release()
 
-            if i % args.dataset_batch_size == 0:
-                db.commit()
-
-                for pending_dataset in pending_commit_datasets:
-                    # Freeing memory
-                    del pending_dataset
+progress.close()
 
-        db.commit()
+if hash_store:
+    hash_store.close()
+    print(f"Skipped {loader.unchanged_count} unchanged datasets.")
 
-    # Freeing memory
-    del organization
+# Counting
+organization_count = len(loader.model_manager.organizations)
+print(f"Inserted {organization_count} organizations.")
 
-progress.close()
+print(f"Inserted {loader.model_manager.dataset_count()} datasets.")
 
-# Inserting every "batch size" file parsed
-#    if (file_index % args.batch_size) == 0:
-#        print(file_index, "/", file_count)
+print(f"Inserted {loader.model_manager.resource_count()} resources.")
@@ -2,14 +2,16 @@
 
 import argparse
 import datetime
+import functools
 import pathlib
 import re
 
 from tqdm import tqdm
 
 from ckan.package_search import DatasetLoader
+from ckan.stream import iter_page_files
 
-from tabular.builder import Builder
+from tabular.builder import DATASET_FIELDS, FORMATS, RESOURCE_FIELDS, Builder, dataset_rows
 
 """
 Crawls through directories searching for package_search results, building tabular files.
@@ -25,17 +27,34 @@ argparser.add_argument(
     "output", type=pathlib.Path, default=DEFAULT_OUTPUT_DIR, help="Output directory"
 )
 argparser.add_argument("path_regex")
+argparser.add_argument("--dataset-fields", nargs="+", default=DATASET_FIELDS)
+argparser.add_argument("--resource-fields", nargs="+", default=RESOURCE_FIELDS)
+argparser.add_argument("--output-prefix")
+argparser.add_argument("--organization")
 argparser.add_argument(
-    "--dataset-fields",
-    type=list,
-    default=["id", "name", "access_directdl_count", "access_total_count"],
+    "--format",
+    choices=FORMATS,
+    default="csv",
+    help="parquet output is partitioned by organization.",
 )
 argparser.add_argument(
-    "--resource-fields", type=list, default=["id", "dataset_id", "url", "resource_type"]
+    "--row-group-size",
+    type=int,
+    default=10000,
+    help="Rows buffered per organization and table before being written.",
+)
+argparser.add_argument(
+    "--max-buffered-rows",
+    type=int,
+    default=1000000,
+    help="Rows buffered across organizations and tables, the largest buffers are written beyond.",
+)
+argparser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Processes decoding the pages, while indexing them and building the rows.",
 )
-argparser.add_argument("--output-prefix")
-argparser.add_argument("--organization")
-argparser.add_argument("--format", default="csv")
 
 args = argparser.parse_args()
 
@@ -49,29 +68,43 @@ path_regex = re.compile(args.path_regex)
 
 loader = DatasetLoader()
 
-# First pass for progress bar total count.
-total_count = len(
-    [item for item in args.input.rglob("*.json") if path_regex.match(str(item))]
-)
+# Page files listed once, for the progress bar total count too.
+items = [item for item in iter_page_files(args.input) if path_regex.match(str(item))]
+total_count = len(items)
+
+# Indexing the latest version of each dataset: duplicates are not loaded. Pages of a
+# catalog index (build_catalog_index.py, retriever.py) are not read for it.
+progress = tqdm(total=len(items), desc="Indexing files", unit="file")
+for item in loader.index_pages(items, workers=args.workers):
+    progress.update(1)
+progress.close()
 
 tabular_builder = Builder(
+    output_dir,
     output_format=args.format,
     dataset_fields=args.dataset_fields,
     resource_fields=args.resource_fields,
+    name="datagov",
+    prefix=args.output_prefix,
+    row_group_size=args.row_group_size,
+    max_buffered_rows=args.max_buffered_rows,
 )
 
+# Rows are built by the workers as the pages are read, nothing is kept but the buffers.
+to_rows = functools.partial(
+    dataset_rows, dataset_fields=args.dataset_fields, resource_fields=args.resource_fields
+)
 progress = tqdm(total=total_count)
-for item in args.input.rglob("*.json"):
-    match_res = path_regex.match(str(item))
-    if not match_res:
-        continue
-
-    query_result = loader.load(item, resources=True)
-    for dataset in query_result.datasets.values():
-        tabular_builder.add_dataset(dataset)
+for item, datasets in loader.iter_latest(items, workers=args.workers, transform=to_rows):
+    for _, _, rows in datasets:
+        tabular_builder.add_rows(*rows)
 
     progress.update(1)
 
 progress.close()
 
-tabular_builder.write(output_dir, name="datagov", prefix=args.output_prefix)
+tabular_builder.close()
+print(
+    f"Wrote {tabular_builder.dataset_count} datasets and {tabular_builder.resource_count}"
+    f" resources to {output_dir}."
+)
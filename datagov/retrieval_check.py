@@ -5,6 +5,7 @@ import pathlib
 import re
 
 from ckan.package_search import DatasetLoader
+from ckan.stream import iter_page_files
 
 """
 Crawls through directories searching for package_search results, verifying result count and uniqueness.
@@ -24,7 +25,7 @@ loader = DatasetLoader()
 
 total_count = 0
 
-for item in args.directory.rglob("*.json"):
+for item in iter_page_files(args.directory):
     match_res = path_regex.match(str(item))
     if not match_res:
         continue
@@ -6,7 +6,14 @@ import json
 import os
 import pathlib
 
-from ckan.package_search import Searcher
+from ckan.catalog_index import CatalogIndex
+from ckan.checkpoint import find_resumable
+from ckan.package_search import DEFAULT_TIMEOUT, Searcher
+from ckan.response_cache import ResponseCache
+from ckan.retry import RetryPolicy
+from ckan.scheduler import HarvestJob, HarvestScheduler
+from ckan.stream import PAGE_FORMATS
+from ckan.watermark import WatermarkStore
 
 # -----
 
@@ -27,33 +34,177 @@ argparser.add_argument("--start", type=int, default=0, help="CKAN 'start' parame
 argparser.add_argument("--rows", type=int, default=None, help="CKAN 'rows' parameter.")
 argparser.add_argument("--output-dir", type=pathlib.Path, default=DEFAULT_OUTPUT_DIR)
 argparser.add_argument("--limit", type=int)
+argparser.add_argument(
+    "--format",
+    choices=PAGE_FORMATS,
+    default="jsonl.gz",
+    help="Page files format. jsonl*: a header line then one dataset per line, optionally compressed (json: CKAN response as is).",
+)
 argparser.add_argument(
     "--full",
     action="store_true",
     help="Download all datasets starting from 'start' parameter.",
 )
+argparser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Pages fetched concurrently with --full or --limit (1: one page after another).",
+)
+argparser.add_argument(
+    "--rate",
+    type=float,
+    default=None,
+    help="Max requests per second to the CKAN host, across workers.",
+)
+argparser.add_argument(
+    "--retries",
+    type=int,
+    default=5,
+    help="Retries of a request failing with 429, 5xx or a timeout (exponential backoff).",
+)
+argparser.add_argument(
+    "--timeout",
+    type=float,
+    default=DEFAULT_TIMEOUT,
+    help="Seconds to wait for a response before the request is retried.",
+)
+argparser.add_argument(
+    "--resume",
+    action="store_true",
+    help="Continue the latest interrupted harvest of each organization, skipping completed pages.",
+)
+argparser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only retrieve datasets modified since the last harvest of each organization, as a delta.",
+)
+argparser.add_argument(
+    "--watermarks",
+    type=pathlib.Path,
+    default=None,
+    help="Last metadata_modified harvested per organization (default: <output-dir>/watermarks.json).",
+)
+argparser.add_argument(
+    "--cache-dir",
+    type=pathlib.Path,
+    default=None,
+    help="Records package_search responses there and replays them instead of requesting the host.",
+)
+argparser.add_argument(
+    "--cache-ttl",
+    type=float,
+    default=None,
+    help="Seconds before a cached response is requested again (default: never).",
+)
+argparser.add_argument(
+    "--concurrent-organizations",
+    type=int,
+    default=1,
+    help="Organizations harvested at once, the largest first, with a single progress bar.",
+)
+argparser.add_argument(
+    "--max-requests",
+    type=int,
+    default=None,
+    help="Max requests in flight across concurrent organizations (see also --rate).",
+)
 
 args = argparser.parse_args()
 
 # Checking output dir exists
 args.output_dir.resolve(strict=True).is_dir()
 
-for organization in args.organizations:
-    print(f"Retrieving {organization} metadata...")
-    output_dir = args.output_dir / (
-        f"data_gov_{organization}_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    )
-    output_prefix = "package_search"
+response_cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl) if args.cache_dir else None
+
+watermarks = None
+if args.incremental:
+    watermarks = WatermarkStore(args.watermarks or args.output_dir / "watermarks.json")
 
-    # Init
-    searcher = Searcher(args.url, output_dir=output_dir, output_prefix=output_prefix)
+def build_searcher(organization) -> Searcher:
+    # Deltas only hold the datasets modified since the previous harvest.
+    dir_prefix = f"data_gov_{organization}_" + ("delta_" if args.incremental else "")
+
+    output_dir = None
+    if args.resume:
+        output_dir = find_resumable(args.output_dir, dir_prefix + "[0-9]*")
+        if output_dir:
+            print(f"Resuming {output_dir}")
+    if not output_dir:
+        output_dir = args.output_dir / (
+            dir_prefix + datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        )
+
+    searcher = Searcher(
+        args.url,
+        output_dir=output_dir,
+        output_prefix="package_search",
+        rate=args.rate,
+        retry_policy=RetryPolicy(retries=args.retries),
+        output_format=args.format,
+        response_cache=response_cache,
+        timeout=args.timeout,
+    )
     searcher.set_organization(organization)
+    if watermarks:
+        watermark = watermarks.get(organization)
+        print(
+            f"{organization}: datasets modified since {watermark}"
+            if watermark
+            else f"{organization}: no watermark, full harvest"
+        )
+        searcher.set_modified_since(watermark)
     searcher.build_query_params()
 
-    if args.full or args.limit:
-        searcher.search(
-            start=args.start, rows=args.rows, limit=args.limit, sleep=15, retries=3
+    return searcher
+
+
+def harvest(searcher: Searcher) -> bool:
+    organization = searcher.organization
+    output_dir = searcher.output_dir
+
+    complete = False
+    if (args.full or args.limit or args.incremental) and args.workers > 1:
+        complete = searcher.search_parallel(
+            start=args.start, rows=args.rows, limit=args.limit, workers=args.workers
         )
+    elif args.full or args.limit or args.incremental:
+        complete = searcher.search(start=args.start, rows=args.rows, limit=args.limit)
     else:
         package_search_res = searcher.request(start=args.start, rows=args.rows)
-        searcher.write_last_result(output_dir, prefix=output_prefix)
+        searcher.write_last_result(output_dir, prefix=searcher.output_prefix)
+
+    # Pages are sorted by metadata_modified: everything up to the latest retrieved
+    # one is harvested, even with --limit.
+    if watermarks and complete:
+        watermarks.update(organization, searcher.max_metadata_modified)
+
+    # Dataset => page lookups and page listing for the scripts reading the harvest.
+    if output_dir.exists():
+        catalog_index = CatalogIndex(output_dir)
+        catalog_index.build()
+        catalog_index.close()
+
+    return complete
+
+
+if args.concurrent_organizations > 1:
+    scheduler = HarvestScheduler(
+        max_organizations=args.concurrent_organizations, max_requests=args.max_requests
+    )
+    jobs = [
+        HarvestJob(organization, build_searcher(organization), harvest, start=args.start, limit=args.limit)
+        for organization in args.organizations
+    ]
+    results = scheduler.run(jobs)
+
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+    if failed:
+        print(f"Failed organizations: {' '.join(failed)}")
+else:
+    for organization in args.organizations:
+        print(f"Retrieving {organization} metadata...")
+        harvest(build_searcher(organization))
+
+if response_cache:
+    print(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
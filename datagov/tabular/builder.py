@@ -1,116 +1,235 @@
 # coding: utf-8
 
-import pandas as pd
+import csv
+import json
+import pathlib
+from collections import OrderedDict
 
-_ENGINE_MAPPING = {"xlsx": "xlswriter"}
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
-from ckan.dataset import Dataset
+FORMATS = ("csv", "parquet")
+
+DATASET_FIELDS = ["id", "name", "title", "metadata_created", "metadata_modified", "num_resources"]
+RESOURCE_FIELDS = ["id", "package_id", "name", "format", "url"]
+ORGANIZATION_FIELDS = ["id", "name", "title", "created"]
+
+# CKAN integer fields, the others are written as strings (lists and dicts as JSON).
+_INTEGER_FIELDS = {"num_resources", "num_tags"}
 
 
 class UnknownFormatError(Exception):
     pass
 
 
-class Builder:
-    def __init__(self, output_format="csv", dataset_fields=None, resource_fields=None):
-        self.format = self.ext = output_format.lower()
-        self.dataset_fields = dataset_fields
-        self.resource_fields = resource_fields
+def _value(obj: dict, field: str):
+    value = obj.get(field)
+    if value is None or field in _INTEGER_FIELDS:
+        return value
 
-        if output_format != "csv":
-            self.engine = self.get_engine()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
 
-        self.organizations = {}
-        self.datasets = {}
-        self.resources = {}
-        self.assets = {}
+    return str(value)
 
-    def get_engine(self) -> str:
-        if self.format not in _ENGINE_MAPPING:
-            raise UnknownFormatError(self.format)
 
-    def add_dataset(self, dataset: Dataset):
-        organization_id = dataset.organization.id
-        if not organization_id in self.organizations:
-            self.organizations[organization_id] = dataset.organization
-            self.datasets[organization_id] = {}
-            self.resources[organization_id] = {}
-            self.assets[organization_id] = {}
+def dataset_rows(obj: dict, dataset_fields=None, resource_fields=None) -> tuple:
+    """(organization, dataset row, resource rows) of a CKAN dataset, see Builder.add_rows()."""
+    return (
+        obj.get("organization") or {},
+        {field: _value(obj, field) for field in dataset_fields or DATASET_FIELDS},
+        [
+            {field: _value(resource_obj, field) for field in resource_fields or RESOURCE_FIELDS}
+            for resource_obj in obj.get("resources", [])
+        ],
+    )
 
-        self.datasets[organization_id][dataset.id] = dataset
 
-        for resource in dataset.resources.values():
-            self.resources[organization_id][resource.id] = resource
+class _CsvWriter:
+    def __init__(self, path: pathlib.Path, fields: list):
+        # Reopened writers append, without a second header.
+        header = not path.exists()
+        self.file = path.open("a", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        if header:
+            self.writer.writeheader()
 
-    def write(self, output_dir, name="datagov", prefix=None):
-        for organization_id, organization in self.organizations.items():
-            filename = f"{name}_{organization.name}"
+    def write(self, rows: list):
+        self.writer.writerows(rows)
 
-            if prefix:
-                filename = prefix + "_" + filename
+    def close(self):
+        self.file.close()
 
-            organization_df = self.create_data_frame(
-                organization_id, self.organizations
-            )
-            dataset_df = self.create_data_frame(
-                organization_id, self.datasets, fields=self.dataset_fields
-            )
-            resource_df = self.create_data_frame(
-                organization_id, self.resources, fields=self.resource_fields
-            )
-            assets_df = self.create_data_frame(
-                organization_id, self.assets, fields=["id", "name", "url"]
-            )
 
-            if self.datasets[organization_id]:
-                output_dir.mkdir(exist_ok=True)
-
-                if self.format == "csv":
-                    organization_df.to_csv(
-                        output_dir / f"{filename}_organization.{self.ext}",
-                        encoding="utf-8",
-                        index=False,
-                    )
-                    dataset_df.to_csv(
-                        output_dir / f"{filename}_dataset.{self.ext}",
-                        encoding="utf-8",
-                        index=False,
-                    )
-                    resource_df.to_csv(
-                        output_dir / f"{filename}_resource.{self.ext}",
-                        encoding="utf-8",
-                        index=False,
-                    )
-                    assets_df.to_csv(
-                        output_dir / f"{filename}_asset.{self.ext}",
-                        encoding="utf-8",
-                        index=False,
-                    )
-                else:
-                    with pd.ExcelWriter(
-                        output_dir / f"{filename}.{self.ext}", engine=self.engine
-                    ) as writer:
-                        organization_df.to_excel(
-                            writer, sheet_name="Organizations", index=False
-                        )
-                        dataset_df.to_excel(writer, sheet_name="Datasets", index=False)
-                        resource_df.to_excel(
-                            writer, sheet_name="Resources", index=False
-                        )
-
-    def create_data_frame(self, organization_id, objects, fields=None):
-        result = None
-
-        if fields:
-            result = pd.DataFrame(
-                [
-                    {field: item.__dict__[field] for field in fields}
-                    for item in objects[organization_id].values()
-                ]
+class _ParquetWriter:
+    def __init__(self, directory: pathlib.Path, fields: list):
+        directory.mkdir(parents=True, exist_ok=True)
+        # A closed Parquet file cannot be appended to: reopening starts a new part.
+        part = len(list(directory.glob("part-*.parquet")))
+
+        self.schema = pyarrow.schema([
+            (field, pyarrow.int64() if field in _INTEGER_FIELDS else pyarrow.string())
+            for field in fields
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(directory / f"part-{part:05}.parquet", self.schema)
+
+    def write(self, rows: list):
+        # One row group per call.
+        self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class Builder:
+    """
+    Writes the datasets, resources and organizations of CKAN objects as rows, while the
+    pages are parsed. Rows are buffered per table and organization, and appended every
+    `row_group_size` rows (a Parquet row group). Beyond `max_buffered_rows` rows buffered
+    in all (thousands of small organizations), the largest buffers are written down to
+    half of it: memory does not grow with the harvest.
+
+    csv: <prefix>_<name>_<organization>_<table>.csv files.
+    parquet: <prefix>_<name>_<table>/organization=<organization>/part-*.parquet, datasets
+    partitioned by organization (hive style, as read by pyarrow.dataset, pandas or
+    DuckDB), and a single <prefix>_<name>_organization.parquet.
+
+    At most `max_open_files` files are open at once, the least recently used one being
+    closed (a new part for Parquet).
+    """
+
+    def __init__(
+        self,
+        output_dir: pathlib.Path,
+        output_format="csv",
+        dataset_fields=None,
+        resource_fields=None,
+        name="datagov",
+        prefix=None,
+        row_group_size=10000,
+        max_open_files=64,
+        max_buffered_rows=1000000,
+    ):
+        self.format = self.ext = output_format.lower()
+        if self.format not in FORMATS:
+            raise UnknownFormatError(self.format)
+        if self.format == "parquet" and not pyarrow:
+            raise ImportError("pyarrow is needed to write parquet files")
+
+        self.output_dir = pathlib.Path(output_dir)
+        self.base_name = f"{prefix}_{name}" if prefix else name
+        self.fields = {
+            "dataset": dataset_fields or DATASET_FIELDS,
+            "resource": resource_fields or RESOURCE_FIELDS,
+        }
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        self.max_buffered_rows = max_buffered_rows
+
+        # Organization objects by name, small enough to be kept until close().
+        self.organizations = {}
+        # (table, organization name) => rows not written yet.
+        self.buffers = {}
+        self.buffered_rows = 0
+        self.writers = OrderedDict()
+
+        self.dataset_count = 0
+        self.resource_count = 0
+
+    def add_dataset(self, obj: dict):
+        self.add_rows(*dataset_rows(obj, self.fields["dataset"], self.fields["resource"]))
+
+    def add_rows(self, organization: dict, dataset_row: dict, resource_rows: list):
+        """Rows of a dataset built by dataset_rows() with this builder fields, in a worker process for instance."""
+        organization_name = organization.get("name") or "unknown"
+        self.organizations.setdefault(organization_name, organization)
+
+        self._add_row("dataset", organization_name, dataset_row)
+        self.dataset_count += 1
+
+        for resource_row in resource_rows:
+            self._add_row("resource", organization_name, resource_row)
+            self.resource_count += 1
+
+    def _add_row(self, table: str, organization_name: str, row: dict):
+        key = (table, organization_name)
+        rows = self.buffers.setdefault(key, [])
+        rows.append(row)
+        self.buffered_rows += 1
+
+        if len(rows) >= self.row_group_size:
+            self._flush(key)
+        elif self.buffered_rows > self.max_buffered_rows:
+            self._flush_largest()
+
+    def _flush(self, key):
+        rows = self.buffers.pop(key, None)
+        if rows:
+            self.buffered_rows -= len(rows)
+            self._writer(*key).write(rows)
+
+    def _flush_largest(self):
+        # Down to half of the limit, not to flush again at the next row.
+        for key in sorted(self.buffers, key=lambda key: len(self.buffers[key]), reverse=True):
+            if self.buffered_rows <= self.max_buffered_rows // 2:
+                break
+            self._flush(key)
+
+    def _writer(self, table: str, organization_name: str):
+        key = (table, organization_name)
+        writer = self.writers.get(key)
+        if writer:
+            self.writers.move_to_end(key)
+            return writer
+
+        if len(self.writers) >= self.max_open_files:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.format == "csv":
+            writer = _CsvWriter(
+                self.output_dir / f"{self.base_name}_{organization_name}_{table}.{self.ext}",
+                self.fields[table],
             )
         else:
-            o = vars(objects[organization_id])
-            del o["obj"]  # Removing "obj" property
-            result = pd.DataFrame([o])
+            writer = _ParquetWriter(
+                self.output_dir / f"{self.base_name}_{table}" / f"organization={organization_name}",
+                self.fields[table],
+            )
 
-        return result
+        self.writers[key] = writer
+        return writer
+
+    def close(self):
+        """Writes the remaining rows and the organizations."""
+        for key in list(self.buffers):
+            self._flush(key)
+
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+        if not self.organizations:
+            return
+
+        rows = {
+            organization_name: {field: _value(organization, field) for field in ORGANIZATION_FIELDS}
+            for organization_name, organization in self.organizations.items()
+        }
+        if self.format == "csv":
+            for organization_name, row in rows.items():
+                writer = _CsvWriter(
+                    self.output_dir / f"{self.base_name}_{organization_name}_organization.{self.ext}",
+                    ORGANIZATION_FIELDS,
+                )
+                writer.write([row])
+                writer.close()
+        else:
+            pyarrow.parquet.write_table(
+                pyarrow.Table.from_pylist(list(rows.values())),
+                self.output_dir / f"{self.base_name}_organization.parquet",
+            )
@@ -6,6 +6,7 @@ import pathlib
 import json
 
 from ckan.package_search import DatasetLoader
+from ckan.stream import iter_page_files
 
 argparser = argparse.ArgumentParser()
 argparser.add_argument(
@@ -22,7 +23,10 @@ resource_url_mapping = {}
 
 args.input = args.input.resolve()
 
-for item in args.input.rglob("*/package_search*.json"):
+for item in iter_page_files(args.input):
+    if not item.name.startswith("package_search"):
+        continue
+
     ds_loader = DatasetLoader()
     ds_loader.load(item, resources=True)
     relative_path = str(item.resolve().relative_to(args.input))
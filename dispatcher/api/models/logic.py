@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from rescue_api.models import Asset, Rescue, Rescuer
 from .payload import AssetModel
 from .priorizer_client import PriorizerClient
+from .ranking_snapshot import RankingSnapshotReader
 
 # Configuration du logging
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,12 +19,14 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class Dispatcher:
-    def __init__(self, priorizer_client: Optional[PriorizerClient] = None):
+    def __init__(self, priorizer_client: Optional[PriorizerClient] = None,
+                 snapshot_reader: Optional[RankingSnapshotReader] = None):
         self.data_dir = Path(__file__).parent.parent / "data"
         self.ranker_cache_file = self.data_dir / "ranker_cache.json"
         self.alloc_file = self.data_dir / "allocations.json"
         self.rescues_file = self.data_dir / "rescues_mock.json"
         self._priorizer_client = priorizer_client
+        self._snapshot_reader = snapshot_reader
         self._init_files()
     
     def _init_files(self):
@@ -81,8 +84,16 @@ class Dispatcher:
     async def get_available_assets(self) -> List[Dict]:   
         """
         Retrieve all assets (without filtering by allocation).
-        Use priorizer if available, otherwise use the local file.
+        Use the priorizer ranking snapshot or the priorizer if available, otherwise use the local file.
         """
+        if self._snapshot_reader:
+            try:
+                result = self._snapshot_reader.get_ranking()
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.warning(f"Impossible de lire le snapshot du priorizer: {e}")
+
         if self._priorizer_client:
             try:
                 logger.info("Récupération des assets depuis le priorizer")
@@ -146,6 +157,15 @@ class Dispatcher:
         }
 
 
+    async def notify_rescues(self, rescues: List[Dict]):
+        """Best effort: the priorizer reconciliation catches missed notifications"""
+        if not self._priorizer_client or not rescues:
+            return
+        try:
+            await self._priorizer_client.notify_assets_downloaded(sorted({r["asset_id"] for r in rescues}))
+        except Exception as e:
+            logger.warning(f"Priorizer not notified of {len(rescues)} rescues: {e}")
+
     def upsert_rescues_to_db(self, rescuer_id: int, assets: List[AssetModel], db: Session) -> Dict:
         if not self._rescuer_exists(rescuer_id=rescuer_id, db=db):
             logger.error(f"Rescuer with id={rescuer_id} doesn't exist in the database.")
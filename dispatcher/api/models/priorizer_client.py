@@ -80,3 +80,34 @@ class PriorizerClient:
         except Exception as e:
             logger.error(f"Unexpected error when retrieving ranking: {e}")
             raise
+
+    async def notify_assets_downloaded(self, asset_ids: List[int]) -> int:
+        """
+        Notifies the priorizer that assets were rescued, so it refreshes the
+        completion status of their datasets.
+        
+        Args:
+            asset_ids: Ids of the rescued assets
+            
+        Returns:
+            Number of refreshed datasets
+            
+        Raises:
+            httpx.HTTPError: In case of HTTP error
+        """
+        client = await self._get_client()
+        
+        try:
+            response = await client.post(
+                f"{self.base_url}/completion/refresh",
+                json={"asset_ids": asset_ids}
+            )
+            response.raise_for_status()
+            return response.json().get("refreshed_datasets", 0)
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error from priorizer: {e.response.status_code} - {e.response.text}")
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Connection error to priorizer: {e}")
+            raise
@@ -0,0 +1,104 @@
+"""
+Reader of the ranking snapshots published by the priorizer (Arrow IPC files).
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # Optional: the "snapshot" extra, see pyproject.toml
+    pa = pc = None
+
+logger = logging.getLogger(__name__)
+
+# False without pyarrow: the priorizer is called instead
+SNAPSHOT_SUPPORTED = pa is not None
+
+# Pointer file written by the priorizer once a snapshot is complete
+_LATEST = "LATEST"
+
+
+class RankingSnapshotReader:
+    """
+    Reads the latest ranking snapshot of a directory shared with the priorizer.
+
+    The priorizer applies its diversity cap and aging when publishing, but a snapshot is
+    not updated in between: assets rescued since its publication are served again until
+    the next one. Snapshots older than max_age seconds are not served, the priorizer is
+    called instead.
+    """
+
+    def __init__(self, directory: str, limit: int = 100, max_age: Optional[float] = None):
+        """
+        Initializes the snapshot reader.
+
+        Args:
+            directory: Directory the priorizer publishes snapshots to (PRIORIZER_SNAPSHOT_DIR)
+            limit: Number of assets returned, as the priorizer /ranking endpoint
+            max_age: Seconds a snapshot is served after its publication (None: no limit)
+        """
+        self.directory = Path(directory)
+        self.limit = limit
+        self.max_age = max_age
+        # Path, inode and mtime of the mapped snapshot
+        self._key: Optional[tuple] = None
+        self._table = None
+
+    def _refresh(self) -> bool:
+        """Maps the latest snapshot if it changed. Returns False when there is no snapshot, or a stale one."""
+        pointer = self.directory / _LATEST
+        if not pointer.exists():
+            return False
+
+        path = self.directory / pointer.read_text().strip()
+        # A snapshot replaced under the same name is a new snapshot too
+        stat = path.stat()
+        key = (path, stat.st_ino, stat.st_mtime_ns)
+        if self.max_age is not None and time.time() - stat.st_mtime > self.max_age:
+            logger.warning(f"Ranking snapshot {path} older than {self.max_age}s: not served")
+            return False
+
+        if key != self._key:
+            # Memory-mapped: no copy, pages shared with every process reading the snapshot
+            self._table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+            self._key = key
+            logger.info(f"Ranking snapshot loaded: {path} ({self._table.num_rows} assets)")
+        return True
+
+    def get_ranking(self) -> Optional[List[Dict]]:
+        """
+        Retrieves the ranked assets from the latest snapshot.
+
+        Returns:
+            Never rescued assets first, then rescued ones, in rank order.
+            None if no snapshot was published yet, or the latest one is older than max_age.
+        """
+        if not self._refresh():
+            return None
+
+        rescued = self._table.column("rescued")
+        assets = self._table.filter(pc.invert(rescued)).slice(0, self.limit)
+        if assets.num_rows < self.limit:
+            assets = pa.concat_tables([
+                assets,
+                self._table.filter(rescued).slice(0, self.limit - assets.num_rows),
+            ])
+
+        return [
+            {
+                "path": "",
+                "name": "",
+                "priority": row["rank"],
+                "size_mb": row["size_mb"],
+                "ds_id": row["dataset_id"],
+                "res_id": row["resource_id"],
+                "asset_id": row["asset_id"],
+                "url": row["url"],
+            }
+            for row in assets.to_pylist()
+        ]
@@ -8,6 +8,7 @@ import os
 from typing import Optional
 from models.logic import Dispatcher
 from models.priorizer_client import PriorizerClient
+from models.ranking_snapshot import SNAPSHOT_SUPPORTED, RankingSnapshotReader
 
 
 class AppState:
@@ -31,8 +32,18 @@ class AppState:
         priorizer_url = os.getenv('PRIORIZER_URL', 'http://priorizer-api:8082')
         priorizer_client = PriorizerClient(base_url=priorizer_url)
         
+        # Ranking snapshots shared by the priorizer, read instead of calling it when available
+        snapshot_dir = os.getenv('PRIORIZER_SNAPSHOT_DIR')
+        snapshot_reader = None
+        if snapshot_dir and SNAPSHOT_SUPPORTED:
+            # Served until the priorizer publishes the next one (every ranking update), at most that long
+            max_age = float(os.getenv('PRIORIZER_SNAPSHOT_MAX_AGE', '1200'))
+            snapshot_reader = RankingSnapshotReader(snapshot_dir, max_age=max_age)
+        elif snapshot_dir:
+            self._logger.warning("PRIORIZER_SNAPSHOT_DIR is set but pyarrow is not installed: calling the priorizer")
+
         # Dispatcher configuration with priorizer client
-        self._dispatcher: Dispatcher = Dispatcher(priorizer_client=priorizer_client)
+        self._dispatcher: Dispatcher = Dispatcher(priorizer_client=priorizer_client, snapshot_reader=snapshot_reader)
 
 
 # Global state instance
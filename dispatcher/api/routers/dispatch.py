@@ -95,6 +95,9 @@ async def upsert_rescues(request: RescuesRequest, db: Session = Depends(get_db))
             },
         )
 
+    # Datasets of the rescued assets may now be complete
+    await app_state._dispatcher.notify_rescues(result["updated_rescues"] + result["inserted_rescues"])
+
     response = RescuesResponse(
         status="success",
         message="Request received and processed",
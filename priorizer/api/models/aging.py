@@ -0,0 +1,145 @@
+# coding: utf-8
+
+import logging
+import numpy as np
+import pathlib
+import threading
+import time
+
+from typing import Iterable, Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_INITIAL_CAPACITY = 1024
+
+
+class AgingTracker:
+    """
+    Per-asset wait state, kept in compact parallel arrays.
+
+    Only assets served by get_rank are tracked: an asset (and its dataset) that has never
+    been offered is considered waiting since the tracker started. Each ranking cycle only
+    increments a counter, waits are derived from the cycle of the last offer, so the
+    catalog never has to be rescanned.
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self.cycle = 0
+        self.size = 0
+        self._slots = {}  # asset id -> array index
+        # get_rank (request threads) and compute_rank (jobs, scheduler) share the tracker
+        self._lock = threading.RLock()
+
+        self.asset_ids = np.zeros(capacity, dtype=np.int64)
+        self.dataset_ids = np.zeros(capacity, dtype=np.int64)
+        self.last_offered = np.zeros(capacity, dtype=np.float64)  # Epoch timestamp
+        self.offered_cycle = np.zeros(capacity, dtype=np.int64)
+        self.rescued = np.zeros(capacity, dtype=bool)
+
+    _ARRAYS = ("asset_ids", "dataset_ids", "last_offered", "offered_cycle", "rescued")
+
+    def _grow(self, needed: int):
+        capacity = len(self.asset_ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+
+    def _slot(self, asset_id: int, dataset_id: int) -> int:
+        slot = self._slots.get(asset_id)
+        if slot is None:
+            self._grow(self.size + 1)
+            slot = self.size
+            self._slots[asset_id] = slot
+            self.asset_ids[slot] = asset_id
+            self.dataset_ids[slot] = dataset_id
+            self.size += 1
+        return slot
+
+    def advance(self):
+        """Starts a new ranking cycle: every waiting asset gets one cycle older."""
+        with self._lock:
+            self.cycle += 1
+
+    def mark_offered(self, assets: Iterable[tuple], now: Optional[float] = None):
+        """Records (asset_id, dataset_id) pairs served to the dispatcher during this cycle."""
+        now = now or time.time()
+        with self._lock:
+            for asset_id, dataset_id in assets:
+                slot = self._slot(int(asset_id), int(dataset_id))
+                self.last_offered[slot] = now
+                self.offered_cycle[slot] = self.cycle
+
+    def mark_rescued(self, assets: Iterable[tuple]):
+        """Rescued assets stop aging."""
+        with self._lock:
+            for asset_id, dataset_id in assets:
+                self.rescued[self._slot(int(asset_id), int(dataset_id))] = True
+
+    def wait_cycles(self) -> np.ndarray:
+        """Cycles elapsed since each tracked asset was last offered, 0 once rescued."""
+        with self._lock:
+            wait = self.cycle - self.offered_cycle[:self.size]
+            wait[self.rescued[:self.size]] = 0
+        return wait
+
+    def dataset_wait(self, dataset_ids: np.ndarray) -> np.ndarray:
+        """
+        Cycles since any never-rescued asset of each dataset was offered, aligned on the
+        sorted dataset_ids. 0 for datasets whose tracked assets are all rescued.
+        """
+        with self._lock:
+            cycle, size = self.cycle, self.size
+            tracked_ids = self.dataset_ids[:size].copy()
+            tracked_cycles = self.offered_cycle[:size].copy()
+            rescued = self.rescued[:size].copy()
+
+        wait = np.full(len(dataset_ids), cycle, dtype=np.float64)
+        if not size or not len(dataset_ids):
+            return wait
+
+        positions = np.clip(np.searchsorted(dataset_ids, tracked_ids), 0, len(dataset_ids) - 1)
+        known = dataset_ids[positions] == tracked_ids
+        waiting = known & ~rescued
+        last_cycle = np.full(len(dataset_ids), -1, dtype=np.int64)
+        np.maximum.at(last_cycle, positions[waiting], tracked_cycles[waiting])
+
+        offered = last_cycle >= 0
+        wait[offered] = cycle - last_cycle[offered]
+        # Tracked, nothing left waiting: no boost, as wait_cycles() gives rescued assets
+        fully_rescued = np.zeros(len(dataset_ids), dtype=bool)
+        fully_rescued[positions[known & rescued]] = True
+        wait[fully_rescued & ~offered] = 0
+        return wait
+
+    def save(self, path: pathlib.Path):
+        with self._lock:
+            state = {name: getattr(self, name)[:self.size].copy() for name in self._ARRAYS}
+            cycle = self.cycle
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as state_file:
+            np.savez(state_file, cycle=cycle, **state)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "AgingTracker":
+        tracker = cls()
+        if not path.exists():
+            return tracker
+
+        with np.load(path) as state:
+            tracker.cycle = int(state["cycle"])
+            tracker.size = len(state["asset_ids"])
+            tracker._grow(tracker.size)
+            for name in cls._ARRAYS:
+                getattr(tracker, name)[:tracker.size] = state[name]
+
+        tracker._slots = {int(asset_id): slot for slot, asset_id in enumerate(tracker.asset_ids[:tracker.size])}
+        logger.info(f"Aging state loaded: {tracker.size} assets, cycle {tracker.cycle}")
+        return tracker
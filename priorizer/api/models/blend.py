@@ -0,0 +1,86 @@
+# coding: utf-8
+
+import json
+import logging
+import numpy as np
+import threading
+
+from rescue_api.models.dataset_rank import DatasetRank
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# MVP source rankings: link requests and download requests exports
+DEFAULT_SOURCES = {8: 1.0, 9: 1.0}
+
+
+class RankingBlend:
+    """
+    Weighted blend of the event counts of several source rankings.
+
+    Per-source event counts are aggregated in a single grouped query
+    (one SUM(CASE ...) column per source). These partial sums are cached per version of
+    the sources (their last rank id), so changing weights or ranking again does not
+    aggregate raw ranks again.
+    """
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None):
+        self.weights = {int(ranking_id): float(weight) for ranking_id, weight in (weights or DEFAULT_SOURCES).items()}
+        self.sources = sorted(self.weights)
+        self._cache = None  # (version, dataset_ids, partial sums)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, weights_json: Optional[str]) -> "RankingBlend":
+        """Builds a blend from a JSON object of ranking id -> weight, e.g. '{"8": 1.0, "9": 0.5}'."""
+        return cls(json.loads(weights_json) if weights_json else None)
+
+    def _version(self, session: Session):
+        return session.query(func.max(DatasetRank.id)).where(DatasetRank.ranking_id.in_(self.sources)).scalar()
+
+    def partial_sums(self, session: Session) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted dataset ids, and their event count per source ranking (one column per source)."""
+        version = self._version(session)
+        with self._lock:
+            if self._cache is not None and self._cache[0] == version:
+                return self._cache[1], self._cache[2]
+
+        rows = (
+                session.query(
+                        DatasetRank.dataset_id,
+                        *[
+                                func.sum(
+                                        case((DatasetRank.ranking_id == ranking_id, DatasetRank.event_count), else_=0)
+                                ).label(f"source_{ranking_id}")
+                                for ranking_id in self.sources
+                        ]
+                )
+                .where(DatasetRank.ranking_id.in_(self.sources))
+                .group_by(DatasetRank.dataset_id)
+                .order_by(DatasetRank.dataset_id)
+                .all()
+        )
+        dataset_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        partials = np.array([[v or 0 for v in r[1:]] for r in rows], dtype=np.float64).reshape(len(rows), len(self.sources))
+        logger.info(f"Blended {len(self.sources)} rankings over {len(rows)} datasets (version {version})")
+
+        with self._lock:
+            self._cache = (version, dataset_ids, partials)
+        return dataset_ids, partials
+
+    def scores(self, session: Session, dataset_ids: np.ndarray) -> np.ndarray:
+        """Blended event count of each of the sorted dataset_ids (0 when absent from every source)."""
+        blend_ids, partials = self.partial_sums(session)
+        blended = partials @ np.array([self.weights[ranking_id] for ranking_id in self.sources])
+
+        scores = np.zeros(len(dataset_ids), dtype=np.float64)
+        if not len(blend_ids) or not len(dataset_ids):
+            return scores
+        positions = np.clip(np.searchsorted(blend_ids, dataset_ids), 0, len(blend_ids) - 1)
+        known = blend_ids[positions] == dataset_ids
+        scores[known] = blended[positions[known]]
+        return scores
@@ -0,0 +1,64 @@
+# coding: utf-8
+
+import logging
+import os
+import threading
+import time
+
+from typing import Any, Callable, Hashable
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Seconds a cached ranking stays valid when no new ranking is written (0: no caching)
+_RANKING_CACHE_TTL = float(os.getenv("PRIORIZER_RANKING_CACHE_TTL", "60"))
+
+
+class RankingCache:
+    """
+    Versioned in-process cache of ranking metadata and snapshots.
+
+    Entries expire after ttl seconds, or as soon as invalidate() bumps the version
+    (a new ranking was written).
+    """
+
+    def __init__(self, ttl: float = _RANKING_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # key -> (version, loaded_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            version = self.version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            # Do not store a value loaded while a new ranking was being written
+            if version == self.version:
+                self._entries[key] = (version, time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+        logger.info(f"Ranking cache invalidated (version {self.version})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_s": self.ttl,
+            }
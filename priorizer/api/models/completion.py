@@ -0,0 +1,122 @@
+# coding: utf-8
+
+import logging
+
+from datetime import datetime, timezone
+from rescue_api.models.asset_resource import asset_resource
+from rescue_api.models.mvp_downloader_library import MvpDownloaderLibrary
+from rescue_api.models.rescues import Rescue
+from rescue_api.models.resource import Resource
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, MetaData, Table, func, insert, delete, select
+from sqlalchemy.orm import Session
+from typing import Iterable, List, Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+metadata = MetaData()
+
+# Per-dataset summary of the downloader library and its rescues, owned by the priorizer
+dataset_completion = Table(
+    "dataset_completion",
+    metadata,
+    Column("dataset_id", Integer, primary_key=True),
+    Column("nb_resources", Integer, nullable=False),
+    Column("nb_magnets", Integer, nullable=False),
+    Column("size_mb", Float, nullable=False),
+    Column("completed", Boolean, nullable=False, index=True),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class CompletionSummary:
+    """
+    Resource and rescued resource counts (nb_magnets) per dataset, kept in the
+    dataset_completion table.
+
+    A library resource counts as rescued once one of its assets has a row in rescues,
+    the table the dispatcher /assets-downloaded writes to (and get_rank reads). Rankings
+    read this indexed summary instead of aggregating the whole downloader library. It is
+    refreshed for the datasets of newly rescued assets, and rebuilt by
+    reconcile_completion.py.
+    """
+
+    def __init__(self, table: Table = dataset_completion):
+        self.table = table
+        self._ready = False
+
+    def _library_counts(self, dataset_ids: Optional[List[int]] = None):
+        rescued_resources = (
+                select(asset_resource.c.resource_id)
+                .join(Rescue, Rescue.asset_id == asset_resource.c.asset_id)
+                .distinct()
+                .subquery()
+        )
+        counts = (
+                select(
+                        MvpDownloaderLibrary.dataset_id,
+                        func.count(MvpDownloaderLibrary.resource_id).label("nb_resources"),
+                        func.count(rescued_resources.c.resource_id).label("nb_magnets"),
+                        func.coalesce(func.sum(MvpDownloaderLibrary.deeplink_file_size), 0).label("size_mb")
+                )
+                .outerjoin(rescued_resources, rescued_resources.c.resource_id == MvpDownloaderLibrary.resource_id)
+                .group_by(MvpDownloaderLibrary.dataset_id)
+        )
+        if dataset_ids is not None:
+            counts = counts.where(MvpDownloaderLibrary.dataset_id.in_(dataset_ids))
+        counts = counts.subquery()
+        return select(
+                counts.c.dataset_id,
+                counts.c.nb_resources,
+                counts.c.nb_magnets,
+                counts.c.size_mb,
+                (counts.c.nb_magnets == counts.c.nb_resources).label("completed"),
+                func.now().label("updated_at")
+        )
+
+    def _replace(self, session: Session, dataset_ids: Optional[List[int]] = None) -> int:
+        columns = ["dataset_id", "nb_resources", "nb_magnets", "size_mb", "completed", "updated_at"]
+        statement = delete(self.table)
+        if dataset_ids is not None:
+            statement = statement.where(self.table.c.dataset_id.in_(dataset_ids))
+        session.execute(statement)
+        result = session.execute(insert(self.table).from_select(columns, self._library_counts(dataset_ids)))
+        session.commit()
+        return result.rowcount
+
+    def ensure(self, session: Session):
+        """Creates the summary table, and builds it when empty."""
+        if self._ready:
+            return
+        self.table.create(session.get_bind(), checkfirst=True)
+        if session.execute(select(self.table.c.dataset_id).limit(1)).first() is None:
+            self.rebuild(session)
+        self._ready = True
+
+    def refresh(self, session: Session, dataset_ids: Iterable[int]) -> int:
+        """Recomputes the summary rows of the given datasets."""
+        dataset_ids = sorted(set(dataset_ids))
+        if not dataset_ids:
+            return 0
+        rows = self._replace(session, dataset_ids)
+        logger.info(f"Completion refreshed for {len(dataset_ids)} datasets")
+        return rows
+
+    def refresh_assets(self, session: Session, asset_ids: Iterable[int]) -> int:
+        """Recomputes the summary rows of the datasets the given assets belong to."""
+        dataset_ids = [
+                r.dataset_id for r in
+                session.query(Resource.dataset_id)
+                .join(asset_resource, asset_resource.c.resource_id == Resource.id)
+                .where(asset_resource.c.asset_id.in_(list(asset_ids)))
+                .distinct()
+        ]
+        return self.refresh(session, dataset_ids)
+
+    def rebuild(self, session: Session) -> int:
+        """Rebuilds the whole summary from the downloader library and rescues (reconciliation)."""
+        start = datetime.now(timezone.utc)
+        rows = self._replace(session)
+        logger.info(f"Completion summary rebuilt: {rows} datasets in {datetime.now(timezone.utc) - start}")
+        return rows
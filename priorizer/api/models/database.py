@@ -0,0 +1,168 @@
+# coding: utf-8
+"""
+Priorizer database engine and session lifecycle.
+
+Sessions are request scoped (get_session FastAPI dependency) or block scoped
+(session_scope, for scheduler jobs), and always closed so connections go back to
+the pool. Checkout wait times are recorded to expose pool starvation.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from models.profiling import instrument
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from typing import Iterator, Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Full SQLAlchemy URL, the rescue_api database by default
+_DATABASE_URL = os.getenv("PRIORIZER_DATABASE_URL")
+_POOL_SIZE = int(os.getenv("PRIORIZER_DB_POOL_SIZE", "5"))
+_MAX_OVERFLOW = int(os.getenv("PRIORIZER_DB_MAX_OVERFLOW", "10"))
+_POOL_TIMEOUT = float(os.getenv("PRIORIZER_DB_POOL_TIMEOUT", "30"))
+_POOL_RECYCLE = int(os.getenv("PRIORIZER_DB_POOL_RECYCLE", "1800"))
+_POOL_PRE_PING = os.getenv("PRIORIZER_DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Checkouts waiting longer than this (seconds) are logged
+_POOL_WAIT_WARNING = float(os.getenv("PRIORIZER_DB_POOL_WAIT_WARNING", "1"))
+
+
+class PoolStats:
+    """Checkout wait times of the connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.last_wait = wait
+
+        if timed_out:
+            logger.error(f"Connection pool exhausted: no connection after {wait:.2f}s")
+        elif wait > _POOL_WAIT_WARNING:
+            logger.warning(f"Connection pool starving: waited {wait:.2f}s for a connection")
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_s": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "wait_max_s": self.wait_max,
+                "wait_last_s": self.last_wait,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool measuring how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+
+def _database_url():
+    if _DATABASE_URL:
+        return _DATABASE_URL
+
+    # The database of rescue_api, with its own settings and defaults: the URL of its engine
+    try:
+        from rescue_api.database import get_db
+    except ImportError as e:
+        raise RuntimeError("PRIORIZER_DATABASE_URL is not set and rescue_api is not installed") from e
+
+    sessions = get_db()
+    try:
+        return next(sessions).get_bind().url
+    finally:
+        sessions.close()
+
+
+def build_engine(url=None, **pool_options) -> Engine:
+    url = url or _database_url()
+    if str(url).startswith("sqlite"):
+        # SQLite (benchmarks, tests) keeps its default pool
+        return create_engine(url)
+
+    options = {
+        "pool_size": _POOL_SIZE,
+        "max_overflow": _MAX_OVERFLOW,
+        "pool_timeout": _POOL_TIMEOUT,
+        "pool_recycle": _POOL_RECYCLE,
+        "pool_pre_ping": _POOL_PRE_PING,
+    }
+    options.update(pool_options)
+    return create_engine(url, poolclass=_TimedQueuePool, **options)
+
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Process wide engine, created on first use."""
+    global _engine, _session_factory
+    with _engine_lock:
+        if _engine is None:
+            _engine = build_engine()
+            instrument(_engine)
+            _session_factory = sessionmaker(bind=_engine, autoflush=False, expire_on_commit=False)
+            logger.info(f"Database engine ready: {_engine.url.render_as_string(hide_password=True)}")
+    return _engine
+
+
+def get_session() -> Iterator[Session]:
+    """FastAPI dependency: one session per request, closed once the response is sent."""
+    get_engine()
+    session = _session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+# Same lifecycle outside requests: `with session_scope() as session: ...`
+session_scope = contextmanager(get_session)
+
+
+def pool_status() -> dict:
+    pool = get_engine().pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    status.update(pool_stats.as_dict())
+    return status
@@ -0,0 +1,71 @@
+# coding: utf-8
+
+import heapq
+import itertools
+import math
+
+from collections import defaultdict, deque
+from typing import Callable, Hashable, Iterable, Iterator, List
+from urllib.parse import urlparse
+
+
+def url_host(url) -> str:
+    return (urlparse(url).hostname or "") if isinstance(url, str) else ""
+
+
+def diversify(rows: Iterable, key: Callable[[object], Hashable], limit: int, max_share: float) -> List:
+    """
+    First `limit` rows of a best-first stream, with at most `max_share` of them per key
+    (organization, origin host...).
+
+    Rows are split into per-key queues, which keep the stream order, then merged back
+    with a heap over the queue heads (k-way merge, k = number of keys). A queue reaching
+    its quota is set aside; when not enough keys remain to fill the window, set aside rows
+    backfill it, best first.
+    """
+    if limit <= 0:
+        return []
+    quota = max(1, math.ceil(limit * max_share))
+
+    queues = defaultdict(deque)
+    for position, row in enumerate(rows):
+        queues[key(row)].append((position, row))
+
+    heads = [(queue[0][0], group) for group, queue in queues.items()]
+    heapq.heapify(heads)
+    taken = defaultdict(int)
+    selected = []
+    while heads and len(selected) < limit:
+        _, group = heapq.heappop(heads)
+        queue = queues[group]
+        selected.append(queue.popleft()[1])
+        taken[group] += 1
+        if queue and taken[group] < quota:
+            heapq.heappush(heads, (queue[0][0], group))
+
+    if len(selected) < limit:
+        set_aside = heapq.merge(*(queue for queue in queues.values() if queue))
+        selected.extend(row for _, row in itertools.islice(set_aside, limit - len(selected)))
+    return selected
+
+
+
+def diversify_windows(rows: Iterable, key: Callable[[object], Hashable], window: int, max_share: float,
+                      candidates: int = 5) -> Iterator:
+    """
+    Every row of a best-first stream, as consecutive windows of `window` rows each picked
+    by diversify() among the next `window * candidates` rows not served yet: the first
+    window is the one diversify() serves, the next ones what it would serve once those
+    are gone.
+    """
+    rows = iter(rows)
+    pool = []
+    while True:
+        pool.extend(itertools.islice(rows, window * candidates - len(pool)))
+        if not pool:
+            return
+
+        selected = diversify(pool, key, window, max_share)
+        yield from selected
+        selected_ids = set(map(id, selected))
+        pool = [row for row in pool if id(row) not in selected_ids]
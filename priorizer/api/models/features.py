@@ -0,0 +1,152 @@
+# coding: utf-8
+
+import numpy as np
+
+from datetime import datetime
+from models.completion import dataset_completion
+from models.scoring import FeatureSet
+from rescue_api.models.dataset_rank import DatasetRank
+from rescue_api.models.dataset_ranking import DatasetRanking
+from rescue_api.models.resource import Resource
+from rescue_api.models.asset import Asset
+from rescue_api.models.asset_resource import asset_resource
+from rescue_api.models.rescues import Rescue
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from typing import Optional
+
+_MEGABYTE = 1024 * 1024
+
+_RANKING_TYPE_FEATURES = {
+    "download": "download_events",
+    "link": "link_events",
+}
+
+
+def _to_datetime64(values) -> np.ndarray:
+    return np.array(
+        [v.replace(tzinfo=None) if v is not None else None for v in values],
+        dtype="datetime64[s]",
+    )
+
+
+def _fill(target: np.ndarray, dataset_ids: np.ndarray, row_ids, row_values, reduce=None) -> np.ndarray:
+    """Scatters (row_ids, row_values) into target, aligned on the sorted dataset_ids."""
+    if not len(row_ids) or not len(dataset_ids):
+        return target
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    positions = np.searchsorted(dataset_ids, row_ids)
+    positions = np.clip(positions, 0, len(dataset_ids) - 1)
+    known = dataset_ids[positions] == row_ids
+    row_values = np.asarray(row_values, dtype=np.float64)[known]
+    if reduce is None:
+        target[positions[known]] = row_values
+    else:
+        # Several rows per dataset
+        reduce.at(target, positions[known], row_values)
+    return target
+
+
+def load_features(session: Session, now: Optional[datetime] = None) -> FeatureSet:
+    """Loads the per-dataset features of every ranked dataset of the downloader library."""
+    now = now or datetime.now()
+
+    latest_updated = (
+            session.query(
+                    DatasetRank.dataset_id,
+                    func.min(DatasetRank.rank).label("rank"),
+                    func.max(DatasetRank.event_count).label("event_count"),
+                    func.max(DatasetRank.updated_at).label("updated_at")
+            )
+            .group_by(DatasetRank.dataset_id)
+            .subquery()
+    )
+    # Resource and magnet counts per dataset, see models.completion
+    ds_library = dataset_completion
+    base = (
+            session.query(
+                    latest_updated.c.dataset_id,
+                    latest_updated.c.rank,
+                    latest_updated.c.event_count,
+                    latest_updated.c.updated_at,
+                    ds_library.c.nb_resources,
+                    ds_library.c.nb_magnets,
+                    ds_library.c.size_mb
+            )
+            .join(ds_library, ds_library.c.dataset_id == latest_updated.c.dataset_id)
+            .order_by(latest_updated.c.dataset_id)
+            .all()
+    )
+
+    dataset_ids = np.array([r.dataset_id for r in base], dtype=np.int64)
+    nb_resources = np.array([r.nb_resources or 0 for r in base], dtype=np.float64)
+    nb_magnets = np.array([r.nb_magnets or 0 for r in base], dtype=np.float64)
+    columns = {
+        "completion": np.divide(nb_magnets, nb_resources, out=np.zeros_like(nb_magnets), where=nb_resources > 0),
+        "size_mb": np.array([r.size_mb or 0 for r in base], dtype=np.float64),
+        "age_days": np.full(len(base), np.inf),
+    }
+
+    # Asset sizes (bytes) stand in for datasets without deeplink file size
+    asset_sizes = (
+            session.query(
+                    Resource.dataset_id,
+                    func.sum(Asset.size).label("size")
+            )
+            .join(asset_resource, asset_resource.c.asset_id == Asset.id)
+            .join(Resource, Resource.id == asset_resource.c.resource_id)
+            .group_by(Resource.dataset_id)
+            .all()
+    )
+    asset_size_mb = _fill(
+        np.zeros(len(base)), dataset_ids, [r.dataset_id for r in asset_sizes], [(r.size or 0) / _MEGABYTE for r in asset_sizes]
+    )
+    columns["size_mb"] = np.where(columns["size_mb"] > 0, columns["size_mb"], asset_size_mb)
+
+    # Event counts and freshness per ranking type
+    typed_events = (
+            session.query(
+                    DatasetRank.dataset_id,
+                    DatasetRanking.type,
+                    func.max(DatasetRank.event_count).label("event_count"),
+                    func.max(DatasetRanking.ranking_date).label("ranking_date")
+            )
+            .join(DatasetRanking, DatasetRanking.id == DatasetRank.ranking_id)
+            .group_by(DatasetRank.dataset_id, DatasetRanking.type)
+            .all()
+    )
+    for ranking_type, feature in _RANKING_TYPE_FEATURES.items():
+        rows = [r for r in typed_events if r.type == ranking_type]
+        columns[feature] = _fill(
+            np.zeros(len(base)), dataset_ids, [r.dataset_id for r in rows], [r.event_count or 0 for r in rows]
+        )
+
+    dated = [r for r in typed_events if r.ranking_date is not None]
+    if dated:
+        ages = (np.datetime64(now.replace(tzinfo=None), "s") - _to_datetime64([r.ranking_date for r in dated])) / np.timedelta64(1, "D")
+        # Keep the most recent ranking of each dataset
+        _fill(columns["age_days"], dataset_ids, [r.dataset_id for r in dated], ages, reduce=np.minimum)
+
+    # Rescue outcomes per dataset
+    rescues = (
+            session.query(
+                    Resource.dataset_id,
+                    func.sum(case((Rescue.status == "success", 1), else_=0)).label("replicas"),
+                    func.sum(case((Rescue.status == "fail", 1), else_=0)).label("failures")
+            )
+            .join(asset_resource, asset_resource.c.asset_id == Rescue.asset_id)
+            .join(Resource, Resource.id == asset_resource.c.resource_id)
+            .group_by(Resource.dataset_id)
+            .all()
+    )
+    rescue_ids = [r.dataset_id for r in rescues]
+    columns["replicas"] = _fill(np.zeros(len(base)), dataset_ids, rescue_ids, [r.replicas or 0 for r in rescues])
+    columns["failures"] = _fill(np.zeros(len(base)), dataset_ids, rescue_ids, [r.failures or 0 for r in rescues])
+
+    return FeatureSet(
+        dataset_ids,
+        columns,
+        event_count=np.array([r.event_count or 0 for r in base], dtype=np.int64),
+        db_rank=np.array([r.rank for r in base], dtype=object),
+        updated_at=np.array([r.updated_at for r in base], dtype=object),
+    )
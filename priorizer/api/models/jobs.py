@@ -0,0 +1,167 @@
+# coding: utf-8
+"""
+Blocking work of the API endpoints, kept off the event loop.
+
+run_blocking() runs short calls (DB reads) on a bounded thread pool, JobManager
+runs long ones (ranking computation) as background jobs polled by id.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Threads serving blocking calls of the endpoints
+_BLOCKING_WORKERS = int(os.getenv("PRIORIZER_BLOCKING_WORKERS", "8"))
+# Background jobs running at the same time
+_JOB_WORKERS = int(os.getenv("PRIORIZER_JOB_WORKERS", "1"))
+# Finished jobs kept for status requests
+_JOB_HISTORY = 100
+# Seconds a finished job keeps its result, only its status and size are kept then
+_JOB_RESULT_TTL = float(os.getenv("PRIORIZER_JOB_RESULT_TTL", "3600"))
+# Result items (ranks) kept across finished jobs, the oldest results are dropped first
+_JOB_RESULT_MAX_ITEMS = int(os.getenv("PRIORIZER_JOB_RESULT_MAX_ITEMS", "200000"))
+
+_blocking_executor = ThreadPoolExecutor(max_workers=_BLOCKING_WORKERS, thread_name_prefix="priorizer-blocking")
+
+
+async def run_blocking(fn: Callable, *args, **kwargs) -> Any:
+    """Awaits fn(*args, **kwargs) run on the blocking thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_executor, functools.partial(fn, *args, **kwargs))
+
+
+class Job:
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = Job.PENDING
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.finished_monotonic: Optional[float] = None
+        self.result: Any = None
+        # Number of items of the result, kept once the result is dropped
+        self.result_size = 0
+        self.result_dropped = False
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (Job.SUCCESS, Job.FAILED)
+
+    def set_result(self, result: Any):
+        self.result = result
+        self.result_size = len(result) if hasattr(result, "__len__") else int(result is not None)
+
+    def drop_result(self):
+        if self.result is not None:
+            self.result = None
+            self.result_dropped = True
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "result_size": self.result_size,
+            "result_dropped": self.result_dropped,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Background jobs on a bounded thread pool. A job already queued or running under the same name is reused.
+
+    Results (a whole catalog of ranks for compute_rank) are dropped after result_ttl seconds, or
+    sooner when the finished jobs hold more than result_max_items items: only their status and
+    result size are kept.
+    """
+
+    def __init__(self, max_workers: int = _JOB_WORKERS, history: int = _JOB_HISTORY,
+                 result_ttl: float = _JOB_RESULT_TTL, result_max_items: int = _JOB_RESULT_MAX_ITEMS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="priorizer-job")
+        self._jobs = OrderedDict()
+        self._history = history
+        self._result_ttl = result_ttl
+        self._result_max_items = result_max_items
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[[], Any]) -> Job:
+        with self._lock:
+            for job in self._jobs.values():
+                if job.name == name and not job.done:
+                    return job
+
+            job = Job(name)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        logger.info(f"Job {job.name} submitted: {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[], Any]):
+        job.status = Job.RUNNING
+        job.started_at = datetime.now(timezone.utc)
+        status = Job.SUCCESS
+        try:
+            job.set_result(fn())
+        except Exception as e:
+            logger.error(f"Job {job.name} {job.id} failed: {str(e)}", exc_info=True)
+            job.error = str(e)
+            status = Job.FAILED
+
+        with self._lock:
+            job.finished_at = datetime.now(timezone.utc)
+            job.finished_monotonic = time.monotonic()
+            # Done once finished_* are set, see _prune()
+            job.status = status
+            self._prune()
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(len(finished) - self._history, 0)]:
+            del self._jobs[job.id]
+
+        now = time.monotonic()
+        kept_items = 0
+        # Newest first: the oldest results go over the item budget, the newest one is always
+        # kept (until it expires) to be fetched
+        for job in reversed(finished[-self._history:]):
+            if job.result is None:
+                continue
+            expired = now - job.finished_monotonic > self._result_ttl
+            if expired or (kept_items and kept_items + job.result_size > self._result_max_items):
+                job.drop_result()
+            else:
+                kept_items += job.result_size
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -6,17 +6,56 @@ from rescue_api.models.dataset_rank import DatasetRank
 from rescue_api.models.dataset_ranking import DatasetRanking
 from rescue_api.models.resource import Resource
 from rescue_api.models.asset import Asset
+from rescue_api.models.dataset import Dataset
 from rescue_api.models.asset_resource import asset_resource
 from rescue_api.models.mvp_downloader_library import MvpDownloaderLibrary
 from rescue_api.models.rescues import Rescue
-from rescue_api.database import get_db
+from models.aging import AgingTracker
+from models.blend import RankingBlend
+from models.cache import RankingCache
+from models.completion import CompletionSummary, dataset_completion
+from models.diversity import diversify, diversify_windows, url_host
+from models.features import load_features
+from models.scoring import ScoringEngine, rank_by_value
+from models.snapshot import SnapshotWriter
 from sqlalchemy import func, case, desc, and_
+from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-from typing import List
+from typing import List, NamedTuple, Optional
+import numpy as np
+import os
+import pathlib
 
-_RANKING_LIMIT = 100
+_RANKING_LIMIT = 100
 _MVP_RANKING_ID = 8 # broija 2025-09-20 : MVP default ranking id
 
+# Ranking mode used by compute_rank: "events" (SQL sort), "score" (vectorized scoring engine),
+# "value_per_byte" (event count per MB) or "blended" (weighted events of several rankings)
+_RANKING_MODE = os.getenv("PRIORIZER_RANKING_MODE", "events")
+# JSON object of scoring weights overriding models.scoring.DEFAULT_WEIGHTS
+_SCORING_WEIGHTS = os.getenv("PRIORIZER_SCORING_WEIGHTS")
+# Only rank the K best datasets in "score" and "value_per_byte" modes (0: whole catalog)
+_SCORING_TOP_K = int(os.getenv("PRIORIZER_SCORING_TOP_K", "0")) or None
+# Dataset size bounds (MB) of the "value_per_byte" mode, see models.scoring.value_per_mb
+_VALUE_MIN_SIZE_MB = float(os.getenv("PRIORIZER_VALUE_MIN_SIZE_MB", "1"))
+_VALUE_MAX_SIZE_MB = float(os.getenv("PRIORIZER_VALUE_MAX_SIZE_MB", "10240"))
+# JSON object of source ranking id -> weight of the "blended" mode, see models.blend.DEFAULT_SOURCES
+_BLEND_SOURCES = os.getenv("PRIORIZER_BLEND_SOURCES")
+# Caps the share of served deeplinks per "organization" or origin "host" (empty: no cap)
+_DIVERSITY_KEY = os.getenv("PRIORIZER_DIVERSITY_KEY", "")
+_DIVERSITY_MAX_SHARE = float(os.getenv("PRIORIZER_DIVERSITY_MAX_SHARE", "0.2"))
+# Candidate deeplinks fetched per served one when the cap applies
+_DIVERSITY_CANDIDATES = int(os.getenv("PRIORIZER_DIVERSITY_CANDIDATES", "5"))
+
+_DIVERSITY_KEYS = {
+    "organization": lambda r: r.organization_id,
+    "host": lambda r: url_host(r.deeplink),
+}
+# Aging state (.npz) of the "score" and "value_per_byte" modes, see models.aging
+_AGING_STATE_PATH = pathlib.Path(
+    os.getenv("PRIORIZER_AGING_STATE", pathlib.Path(__file__).parent.parent / "data" / "aging_state.npz")
+)
+
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -28,13 +67,35 @@ class ComputeRankResult:
         self.new_ranks = new_ranks
         self.is_new_ranking = is_new_ranking
 
+class RankedDataset(NamedTuple):
+    dataset_id: int
+    event_count: int
+    updated_at: datetime
+    rank: int
+
 class RankedRequestManager:
-    def __init__(self):
-        pass
+    def __init__(self, mode: str = _RANKING_MODE, scoring_engine: Optional[ScoringEngine] = None):
+        self._rank_orders = {
+            "events": self._order_by_events,
+            "score": self._order_by_score,
+            "value_per_byte": self._order_by_value,
+            "blended": self._order_by_blend,
+        }
+        if mode not in self._rank_orders:
+            raise ValueError(f"Unknown ranking mode: {mode}")
+        if _DIVERSITY_KEY and _DIVERSITY_KEY not in _DIVERSITY_KEYS:
+            raise ValueError(f"Unknown diversity key: {_DIVERSITY_KEY}")
+
+        self.mode = mode
+        self.scoring_engine = scoring_engine or ScoringEngine.from_json(_SCORING_WEIGHTS)
+        self.blend = RankingBlend.from_json(_BLEND_SOURCES)
+        self.completion = CompletionSummary()
+        self.aging = AgingTracker.load(_AGING_STATE_PATH)
+        # Invalidated whenever a new ranking is written
+        self.cache = RankingCache()
 
     # Retrieve last ranking id : default or auto
-    def _get_last_ranking_id(self) -> int:
-        session = next(get_db())
+    def _get_last_ranking_id(self, session: Session) -> int:
         last_ranking_id = session.query(func.max(DatasetRanking.id)).where(DatasetRanking.type == "auto").scalar()
         if not last_ranking_id:
             last_ranking_id = _MVP_RANKING_ID
@@ -42,22 +103,21 @@ class RankedRequestManager:
         logger.info(f"Last ranking id: {last_ranking_id}")
         return last_ranking_id
 
-    def _write_query(self, query):
-        statement = str(query.statement)
-        print(statement)
-        import pathlib
-        no_magnet_rank_sql_file = pathlib.Path(__file__).parent.parent / "data" / "queries.sql"
-        with open(no_magnet_rank_sql_file, "a") as f:
-            f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S:") + "\n")
-            f.write(statement + "\n")
-
-    def get_rank(self) -> dict:
-        session = next(get_db())
+    def get_rank(self, session: Session) -> dict:
+        # Get max ranking id and its assets, both cached until the next ranking
+        last_ranking_id = self.cache.get("last_ranking_id", lambda: self._get_last_ranking_id(session))
+        results, nb_no_magnet = self.cache.get(
+                ("assets", last_ranking_id),
+                lambda: self._fetch_assets(session, last_ranking_id)
+        )
 
-        # Get max ranking id
-        last_ranking_id = self._get_last_ranking_id()
+        # Served assets stop aging, rescued ones for good
+        self.aging.mark_offered((r["asset_id"], r["ds_id"]) for r in results[:nb_no_magnet])
+        self.aging.mark_rescued((r["asset_id"], r["ds_id"]) for r in results[nb_no_magnet:])
+        return {"assets": results}
 
-        # Fetch deeplinks from mvp_downloader_library that are not rescued yet
+    def _no_magnet_query(self, session: Session, last_ranking_id: int, nb_candidates: int):
+        """Deeplinks of a ranking that are not rescued yet, in rank order"""
         no_magnet_ranks = (
                 session.query(
                         MvpDownloaderLibrary.dataset_id,
@@ -73,11 +133,35 @@ class RankedRequestManager:
                 .join(Resource, Resource.id == MvpDownloaderLibrary.resource_id)
                 .join(asset_resource, asset_resource.c.resource_id == MvpDownloaderLibrary.resource_id)
                 .outerjoin(Rescue, Rescue.asset_id == asset_resource.c.asset_id)
+        )
+        if _DIVERSITY_KEY == "organization":
+                # Joined before the LIMIT: Query.join() refuses a limited query
+                no_magnet_ranks = (
+                        no_magnet_ranks
+                        .add_columns(Dataset.organization_id)
+                        .join(Dataset, Dataset.id == MvpDownloaderLibrary.dataset_id)
+                )
+        return (
+                no_magnet_ranks
                 .where(DatasetRank.ranking_id == last_ranking_id).where(Rescue.asset_id.is_(None))
                 .order_by(DatasetRank.rank, Resource.id)
-                .limit(_RANKING_LIMIT)
+                .limit(nb_candidates)
         )
 
+    def _fetch_assets(self, session: Session, last_ranking_id: int) -> tuple:
+        """Assets of a ranking, never rescued first: (assets, number of never rescued assets)"""
+        # Fetch deeplinks from mvp_downloader_library that are not rescued yet
+        nb_candidates = _RANKING_LIMIT * _DIVERSITY_CANDIDATES if _DIVERSITY_KEY else _RANKING_LIMIT
+        no_magnet_ranks = self._no_magnet_query(session, last_ranking_id, nb_candidates)
+        if _DIVERSITY_KEY:
+                # Spread the window across organizations/hosts, keeping rank order within each
+                no_magnet_ranks = diversify(
+                        no_magnet_ranks,
+                        _DIVERSITY_KEYS[_DIVERSITY_KEY],
+                        _RANKING_LIMIT,
+                        _DIVERSITY_MAX_SHARE
+                )
+
         results = [{
                 "path": "",
                 "name": "",
@@ -89,6 +173,7 @@ class RankedRequestManager:
                 "url": r.deeplink
                 }
                 for r in no_magnet_ranks]
+        nb_no_magnet = len(results)
 
         # If not enough results, complete with results with magnet link
         if len(results) < _RANKING_LIMIT:
@@ -122,66 +207,87 @@ class RankedRequestManager:
                                         "asset_id": r.asset_id,
                                         "url": r.magnet_link
                                 })
-        return {"assets": results}
-        
-    def compute_rank(self) -> List[dict]:
-        session = next(get_db())
+        return results, nb_no_magnet
 
-        # List last rank timestamp by dataset_id
-        latest_updated = (
-                session.query(
-                        DatasetRank.dataset_id,
-                        func.min(DatasetRank.rank).label("rank"),
-                        func.max(DatasetRank.event_count).label("event_count"),                      
-                        func.max(DatasetRank.updated_at).label("updated_at")
-                        )
-                        .group_by(DatasetRank.dataset_id)
-                        .subquery()
-                )
-        # Magnets are at resource_id level, dataset won't be considered as completed until all resource have their magnet. mvp table is at resource level and can have duplicates in datasets.
-        # Could be useful to create a model dataset/completed to ensure all dataset's resources have their magnet.
-        ds_magnets = (
-                session.query(
-                        MvpDownloaderLibrary.dataset_id,
-                        func.count(MvpDownloaderLibrary.resource_id).label("nb_resources"),
-                        func.sum(
-                                case(
-                                        (MvpDownloaderLibrary.magnet_link==None, 0),
-                                        else_=1
-                                        )
-                                ).label("nb_magnets")
-                        )
-                        .group_by(MvpDownloaderLibrary.dataset_id)
+    def _snapshot_query(self, session: Session, last_ranking_id: int, rescued: bool):
+        """Assets of a ranking, rescued or not, once each whatever their number of rescues, in rank order"""
+        rescues = (
+                session.query(Rescue.asset_id, func.min(Rescue.magnet_link).label("magnet_link"))
+                .group_by(Rescue.asset_id)
                 .subquery()
         )
-        
-        ds_completion_status = (
+        assets = (
                 session.query(
-                        ds_magnets.c.dataset_id,
-                        case((ds_magnets.c.nb_magnets==ds_magnets.c.nb_resources, True), else_=False).label("completed")
-                ).subquery()
-        )
-        # First rank never rescued assets (=with no magnet link), the more events there are the higher the rank is
-        # Apply same methodology to assets with magnet_link 
-        ranks = (
-                session.query(
-                        ds_completion_status.c.completed,
-                        latest_updated.c.dataset_id,
-                        latest_updated.c.event_count,
-                        latest_updated.c.updated_at,
-                        latest_updated.c.rank
-                )
-                .join(
-                        latest_updated, 
-                        latest_updated.c.dataset_id == ds_completion_status.c.dataset_id
+                        MvpDownloaderLibrary.dataset_id,
+                        MvpDownloaderLibrary.resource_id,
+                        asset_resource.c.asset_id,
+                        DatasetRank.rank,
+                        MvpDownloaderLibrary.deeplink_file_size,
+                        MvpDownloaderLibrary.deeplink,
+                        rescues.c.magnet_link
                 )
-                .order_by(
-                        case((ds_completion_status.c.completed==False, 0), else_=1), 
-                        desc(latest_updated.c.event_count)
+                .join(DatasetRank, DatasetRank.dataset_id == MvpDownloaderLibrary.dataset_id)
+                .join(Resource, Resource.id == MvpDownloaderLibrary.resource_id)
+                .join(asset_resource, asset_resource.c.resource_id == MvpDownloaderLibrary.resource_id)
+                .outerjoin(rescues, rescues.c.asset_id == asset_resource.c.asset_id)
+        )
+        if not rescued and _DIVERSITY_KEY == "organization":
+                assets = (
+                        assets
+                        .add_columns(Dataset.organization_id)
+                        .join(Dataset, Dataset.id == MvpDownloaderLibrary.dataset_id)
                 )
-                .all()
+        return (
+                assets
+                .where(DatasetRank.ranking_id == last_ranking_id)
+                .where(rescues.c.asset_id.is_not(None) if rescued else rescues.c.asset_id.is_(None))
+                .order_by(DatasetRank.rank, Resource.id)
+                .yield_per(10000)
         )
 
+    def export_snapshot(self, session: Session, writer: SnapshotWriter):
+        """
+        Publishes every asset of the last ranking as an Arrow snapshot: never rescued ones first,
+        in rank order or, with a diversity cap, as consecutive /ranking windows each within the
+        cap. The snapshot is served instead of /ranking until the next one: its first window is
+        marked offered for aging now, and assets rescued meanwhile are served until then.
+        """
+        last_ranking_id = self._get_last_ranking_id(session)
+        no_magnet = self._snapshot_query(session, last_ranking_id, rescued=False)
+        if _DIVERSITY_KEY:
+                no_magnet = diversify_windows(
+                        no_magnet,
+                        _DIVERSITY_KEYS[_DIVERSITY_KEY],
+                        _RANKING_LIMIT,
+                        _DIVERSITY_MAX_SHARE,
+                        _DIVERSITY_CANDIDATES
+                )
+
+        offered, rescued = [], []
+
+        def rows():
+                for position, r in enumerate(no_magnet):
+                        if position < _RANKING_LIMIT:
+                                offered.append((r.asset_id, r.dataset_id))
+                        yield (r.dataset_id, r.resource_id, r.asset_id, r.rank, r.deeplink_file_size, r.deeplink, False)
+                for r in self._snapshot_query(session, last_ranking_id, rescued=True):
+                        rescued.append((r.asset_id, r.dataset_id))
+                        yield (r.dataset_id, r.resource_id, r.asset_id, r.rank, r.deeplink_file_size, r.magnet_link, True)
+
+        path = writer.write(last_ranking_id, rows())
+        self.aging.mark_offered(offered)
+        self.aging.mark_rescued(rescued)
+        return path
+
+    def compute_rank(self, session: Session, mode: Optional[str] = None, advance_aging: bool = True) -> List[dict]:
+        """New ranks. A ranking that is not written (advance_aging=False) leaves the aging cycle as is"""
+        self.completion.ensure(session)
+        if advance_aging:
+                self.aging.advance()
+        ranks = self._rank_orders[mode or self.mode](session)
+        if advance_aging:
+                self.aging.save(_AGING_STATE_PATH)
+
         # Keep same update time for whole new ranks
         update_ts = datetime.now(timezone.utc)
         results = [{
@@ -206,4 +312,88 @@ class RankedRequestManager:
                 "rank": r["rank"]
         } for idx, r in enumerate(results) if r["db_rank"] != r["rank"]]
         return fil_results
+
+    def _order_by_score(self, session) -> List[RankedDataset]:
+        """Datasets ordered by the scoring engine, best first"""
+        features = self._load_features(session)
+        order = self.scoring_engine.rank(features, k=_SCORING_TOP_K)
+        logger.info(f"Scored {len(features)} datasets")
+        return self._ranked_datasets(features, order)
+
+    def _order_by_value(self, session) -> List[RankedDataset]:
+        """Datasets ordered by event count per MB, best first"""
+        features = self._load_features(session)
+        order = rank_by_value(
+                features,
+                k=_SCORING_TOP_K,
+                min_size_mb=_VALUE_MIN_SIZE_MB,
+                max_size_mb=_VALUE_MAX_SIZE_MB
+        )
+        logger.info(f"Valued {len(features)} datasets per MB")
+        return self._ranked_datasets(features, order)
+
+    def _order_by_blend(self, session) -> List[RankedDataset]:
+        """Datasets ordered by completion status then blended event count, best first"""
+        features = self._load_features(session)
+        blended = self.blend.scores(session, features.dataset_ids)
+        order = np.lexsort((-blended, features["completion"] >= 1.0))
+        if _SCORING_TOP_K:
+                order = order[:_SCORING_TOP_K]
+        logger.info(f"Blended rankings {self.blend.sources} for {len(features)} datasets")
+        # The blend only orders the datasets: event_count stays the dataset's own event count,
+        # read back by the "events" mode and the scoring features
+        return self._ranked_datasets(features, order)
+
+    def _load_features(self, session):
+        features = load_features(session)
+        features.columns["wait_cycles"] = self.aging.dataset_wait(features.dataset_ids)
+        return features
+
+    @staticmethod
+    def _ranked_datasets(features, order) -> List[RankedDataset]:
+        event_count = features.extra["event_count"]
+        updated_at = features.extra["updated_at"]
+        db_rank = features.extra["db_rank"]
+        return [
+                RankedDataset(int(features.dataset_ids[i]), int(event_count[i]), updated_at[i], db_rank[i])
+                for i in order
+        ]
+
+    def _order_by_events(self, session) -> list:
+        """Datasets ordered by completion status then event count, best first"""
+        # List last rank timestamp by dataset_id
+        latest_updated = (
+                session.query(
+                        DatasetRank.dataset_id,
+                        func.min(DatasetRank.rank).label("rank"),
+                        func.max(DatasetRank.event_count).label("event_count"),                      
+                        func.max(DatasetRank.updated_at).label("updated_at")
+                        )
+                        .group_by(DatasetRank.dataset_id)
+                        .subquery()
+                )
+        # Magnets are at resource_id level, dataset won't be considered as completed until all resource have their magnet.
+        # Completion status comes from the dataset_completion summary, see models.completion
+        ds_completion_status = dataset_completion
+        # First rank never rescued assets (=with no magnet link), the more events there are the higher the rank is
+        # Apply same methodology to assets with magnet_link 
+        ranks = (
+                session.query(
+                        ds_completion_status.c.completed,
+                        latest_updated.c.dataset_id,
+                        latest_updated.c.event_count,
+                        latest_updated.c.updated_at,
+                        latest_updated.c.rank
+                )
+                .join(
+                        latest_updated, 
+                        latest_updated.c.dataset_id == ds_completion_status.c.dataset_id
+                )
+                .order_by(
+                        case((ds_completion_status.c.completed==False, 0), else_=1), 
+                        desc(latest_updated.c.event_count)
+                )
+                .all()
+        )
+        return ranks
         
@@ -29,4 +29,8 @@ class AssetModel(BaseModel):
 
 # Define a Pydantic model for response serve by priorizer to dispatcher
 class PriorizerResponse(BaseModel):
-    asset: List[AssetModel] = Field(..., description="Ranked dataset list")
\ No newline at end of file
+    asset: List[AssetModel] = Field(..., description="Ranked dataset list")
+
+# Assets rescued by the dispatcher, whose datasets completion must be refreshed
+class CompletionRefreshRequest(BaseModel):
+    asset_ids: List[int] = Field(..., description="Rescued asset ids")
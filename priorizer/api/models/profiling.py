@@ -0,0 +1,169 @@
+# coding: utf-8
+"""
+SQL profiling based on SQLAlchemy cursor events.
+
+Every statement is timed and counted per fingerprint (literals stripped). Statements
+slower than PRIORIZER_SLOW_QUERY_MS are replayed with EXPLAIN (ANALYZE, BUFFERS) on
+PostgreSQL, and their plans written to a rotating log file.
+"""
+
+import logging
+import os
+import pathlib
+import re
+import threading
+import time
+
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_PROFILE_QUERIES = os.getenv("PRIORIZER_PROFILE_QUERIES", "true").lower() in ("1", "true", "yes")
+# EXPLAIN capture threshold in milliseconds (0: disabled)
+_SLOW_QUERY_MS = float(os.getenv("PRIORIZER_SLOW_QUERY_MS", "0"))
+_EXPLAIN_LOG = pathlib.Path(
+    os.getenv("PRIORIZER_EXPLAIN_LOG", pathlib.Path(__file__).parent.parent / "data" / "explain.log")
+)
+_EXPLAIN_LOG_BYTES = 5 * 1024 * 1024
+_EXPLAIN_LOG_BACKUPS = 3
+# Plans kept in memory for /debug/queries
+_RECENT_EXPLAINS = 20
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, float("inf"))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement text with literals replaced by ? and whitespace collapsed."""
+    return _SPACES.sub(" ", _LITERALS.sub("?", statement)).strip()
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS_MS)
+
+    def record(self, elapsed_ms: float, rows: int):
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram_ms": {
+                ("inf" if bound == float("inf") else f"<={bound:g}"): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)
+            },
+        }
+
+
+class QueryProfiler:
+    """Per-statement latency histograms and row counts, with EXPLAIN capture of slow statements."""
+
+    def __init__(self, slow_query_ms: float = _SLOW_QUERY_MS, explain_log: Optional[pathlib.Path] = _EXPLAIN_LOG):
+        self.slow_query_ms = slow_query_ms
+        self.explains = deque(maxlen=_RECENT_EXPLAINS)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._explain_log = explain_log
+        self._explain_logger = None
+
+    def attach(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def detach(self, engine: Engine):
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        rows = max(cursor.rowcount, 0)
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.record(elapsed_ms, rows)
+
+        if self._should_explain(conn, statement, executemany, elapsed_ms):
+            self._explain(conn, statement, parameters, elapsed_ms)
+
+    def _should_explain(self, conn, statement: str, executemany: bool, elapsed_ms: float) -> bool:
+        if not self.slow_query_ms or elapsed_ms < self.slow_query_ms or executemany:
+            return False
+        if conn.dialect.name != "postgresql":
+            return False
+        # ANALYZE executes the statement again: read only statements only
+        return statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH")
+
+    def _explain(self, conn, statement: str, parameters, elapsed_ms: float):
+        # Raw DBAPI cursor: does not go through these hooks again
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"EXPLAIN capture failed: {str(e)}")
+            return
+
+        self.explains.append({"statement": fingerprint(statement), "elapsed_ms": round(elapsed_ms, 3), "plan": plan})
+        explain_logger = self._get_explain_logger()
+        if explain_logger:
+            explain_logger.info(f"{elapsed_ms:.1f} ms\n{statement}\n{plan}\n")
+
+    def _get_explain_logger(self) -> Optional[logging.Logger]:
+        if self._explain_logger is None and self._explain_log:
+            handler = RotatingFileHandler(
+                self._explain_log, maxBytes=_EXPLAIN_LOG_BYTES, backupCount=_EXPLAIN_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            self._explain_logger = logging.getLogger(f"{__name__}.explain")
+            self._explain_logger.setLevel(logging.INFO)
+            self._explain_logger.propagate = False
+            self._explain_logger.addHandler(handler)
+        return self._explain_logger
+
+    def snapshot(self) -> list:
+        """Statements by decreasing total time."""
+        with self._lock:
+            statements = [dict(statement=key, **stats.as_dict()) for key, stats in self._stats.items()]
+        return sorted(statements, key=lambda s: s["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        self.explains.clear()
+
+
+profiler = QueryProfiler()
+
+
+def instrument(engine: Engine):
+    if _PROFILE_QUERIES:
+        profiler.attach(engine)
@@ -0,0 +1,133 @@
+# coding: utf-8
+
+import csv
+import io
+import logging
+import time
+
+from rescue_api.models.dataset_rank import DatasetRank
+from sqlalchemy.orm import Session
+from typing import Iterator, List
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_STAGING_TABLE = "dataset_ranks_staging"
+# Rows encoded per read when COPY pulls data from the stream
+_COPY_BATCH_ROWS = 5000
+
+
+class BulkWriteResult:
+    def __init__(self, rows: int, elapsed: float, method: str):
+        self.rows = rows
+        self.elapsed = elapsed
+        self.method = method
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else float(self.rows)
+
+
+class _CsvRowStream(io.RawIOBase):
+    """File-like object encoding rows to CSV lazily, as COPY reads them."""
+
+    def __init__(self, rows: Iterator[list]):
+        self._rows = rows
+        self._buffer = b""
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text, lineterminator="\n")
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int):
+        while len(self._buffer) < size:
+            batch = 0
+            for row in self._rows:
+                self._writer.writerow(row)
+                batch += 1
+                if batch >= _COPY_BATCH_ROWS:
+                    break
+            if not batch:
+                return
+            self._buffer += self._text.getvalue().encode("utf-8")
+            self._text.seek(0)
+            self._text.truncate()
+
+    def readinto(self, target) -> int:
+        self._fill(len(target))
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class RankWriter:
+    """
+    Writes computed ranks into dataset_ranks in a single transaction.
+
+    On PostgreSQL ranks are streamed with COPY FROM STDIN into a temporary staging
+    table, then merged into dataset_ranks. Other dialects (SQLite) fall back to an
+    executemany insert.
+    """
+
+    def __init__(self, table=DatasetRank.__table__):
+        self.table = table
+
+    def _columns(self, ranks: List[dict]) -> list:
+        # Only keep the keys matching an actual column (compute_rank adds helper keys)
+        return [column for column in self.table.columns if column.key in ranks[0]]
+
+    def write(self, session: Session, ranks: List[dict]) -> BulkWriteResult:
+        if not ranks:
+            return BulkWriteResult(0, 0.0, "none")
+
+        start = time.perf_counter()
+        method = "copy" if session.get_bind().dialect.name == "postgresql" else "executemany"
+        try:
+            if method == "copy":
+                self._copy(session, ranks)
+            else:
+                self._executemany(session, ranks)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        result = BulkWriteResult(len(ranks), time.perf_counter() - start, method)
+        logger.info(
+            f"{result.rows} ranks written with {result.method} in {result.elapsed:.2f}s "
+            f"({result.rows_per_second:.0f} rows/s)"
+        )
+        return result
+
+    def _executemany(self, session: Session, ranks: List[dict]):
+        columns = self._columns(ranks)
+        session.execute(
+            self.table.insert(),
+            [{column.key: rank.get(column.key) for column in columns} for rank in ranks],
+        )
+
+    def _copy(self, session: Session, ranks: List[dict]):
+        columns = self._columns(ranks)
+        preparer = session.get_bind().dialect.identifier_preparer
+        table_name = preparer.format_table(self.table)
+        column_names = ", ".join(preparer.quote(column.name) for column in columns)
+
+        stream = _CsvRowStream(
+            [rank.get(column.key) for column in columns] for rank in ranks
+        )
+        # The staging table lives in the current transaction only
+        connection = session.connection().connection
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {_STAGING_TABLE} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                f"COPY {_STAGING_TABLE} ({column_names}) FROM STDIN WITH (FORMAT csv)",
+                stream,
+            )
+            cursor.execute(
+                f"INSERT INTO {table_name} ({column_names}) SELECT {column_names} FROM {_STAGING_TABLE}"
+            )
@@ -0,0 +1,153 @@
+# coding: utf-8
+
+import json
+import numpy as np
+
+from typing import Dict, Optional
+
+# Per-dataset features, as loaded by models.features.load_features
+FEATURES = (
+    "download_events",  # Events from "download" rankings
+    "link_events",  # Events from "link" rankings
+    "age_days",  # Days since the dataset last appeared in a ranking
+    "completion",  # Ratio of resources having a magnet link (0..1)
+    "size_mb",  # Total deeplink file size
+    "replicas",  # Successful rescues
+    "failures",  # Failed rescue attempts
+    "wait_cycles",  # Ranking cycles since the dataset was last served, see models.aging
+)
+
+# Incomplete datasets first, then the most requested ones
+DEFAULT_WEIGHTS = {
+    "download_events": 1.0,
+    "link_events": 1.0,
+    "age_days": 0.1,
+    "completion": -2.0,
+    "size_mb": 0.0,
+    "replicas": -0.5,
+    "failures": -0.25,
+    "wait_cycles": 0.5,
+}
+
+_RECENCY_HALF_LIFE_DAYS = 30.0
+# Aging is linear and unbounded: after this many cycles a waiting dataset gets its full
+# "wait_cycles" weight, and keeps climbing until it is served
+AGING_HORIZON_CYCLES = 144.0
+
+# Size bounds used by the value per MB ranking
+DEFAULT_MIN_SIZE_MB = 1.0
+DEFAULT_MAX_SIZE_MB = 10240.0
+
+
+def _log_scale(values: np.ndarray) -> np.ndarray:
+    """Maps non negative counts to [0, 1], damping the heavy tail."""
+    scaled = np.log1p(np.clip(values, 0.0, None))
+    peak = scaled.max() if scaled.size else 0.0
+    return scaled / peak if peak > 0 else scaled
+
+
+def _recency(age_days: np.ndarray) -> np.ndarray:
+    """1 for a dataset ranked today, 0.5 after one half life."""
+    return 1.0 / (1.0 + np.clip(age_days, 0.0, None) / _RECENCY_HALF_LIFE_DAYS)
+
+
+def _identity(values: np.ndarray) -> np.ndarray:
+    return values
+
+
+def _aging(wait_cycles: np.ndarray) -> np.ndarray:
+    return np.clip(wait_cycles, 0.0, None) / AGING_HORIZON_CYCLES
+
+
+_TRANSFORMS = {
+    "age_days": _recency,
+    "completion": _identity,
+    "wait_cycles": _aging,
+}
+
+
+class FeatureSet:
+    """Column oriented per-dataset features: one array per feature, aligned on dataset_ids."""
+
+    def __init__(self, dataset_ids: np.ndarray, columns: Dict[str, np.ndarray], **extra):
+        self.dataset_ids = dataset_ids
+        self.columns = {
+            name: np.nan_to_num(np.asarray(columns.get(name, np.zeros(len(dataset_ids))), dtype=np.float64))
+            for name in FEATURES
+        }
+        # Non scored data carried along (raw event count, previous rank...)
+        self.extra = extra
+
+    def __len__(self) -> int:
+        return len(self.dataset_ids)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+class ScoringEngine:
+    """Weighted scoring function applied to a whole FeatureSet at once."""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            unknown = set(weights) - set(FEATURES)
+            if unknown:
+                raise ValueError(f"Unknown scoring features: {sorted(unknown)}")
+            self.weights.update(weights)
+
+    @classmethod
+    def from_json(cls, weights_json: Optional[str]) -> "ScoringEngine":
+        """Builds an engine from a JSON object of weights, e.g. '{"link_events": 0.5}'."""
+        return cls(json.loads(weights_json) if weights_json else None)
+
+    def score(self, features: FeatureSet) -> np.ndarray:
+        scores = np.zeros(len(features), dtype=np.float64)
+        for name, weight in self.weights.items():
+            if not weight:
+                continue
+            transform = _TRANSFORMS.get(name, _log_scale)
+            scores += weight * transform(features[name])
+        return scores
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+        """Indices of the k best scores, best first. Every index when k is None."""
+        if k is None or k >= len(scores):
+            return np.argsort(-scores, kind="stable")
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def rank(self, features: FeatureSet, k: Optional[int] = None) -> np.ndarray:
+        return self.top_k(self.score(features), k)
+
+
+def value_per_mb(features: FeatureSet, min_size_mb: float = DEFAULT_MIN_SIZE_MB,
+                 max_size_mb: float = DEFAULT_MAX_SIZE_MB) -> np.ndarray:
+    """
+    Event count per MB of each dataset.
+
+    Sizes are clipped to [min_size_mb, max_size_mb]: tiny files do not get an unbounded
+    value, and huge archives are never worth less than if they weighed max_size_mb, so
+    popular ones still get rescued. Unknown sizes (0) count as the median known size.
+    """
+    events = features["download_events"] + features["link_events"]
+    sizes = features["size_mb"].copy()
+    known = sizes > 0
+    sizes[~known] = np.median(sizes[known]) if known.any() else min_size_mb
+    return events / np.clip(sizes, min_size_mb, max_size_mb)
+
+
+def rank_by_value(features: FeatureSet, k: Optional[int] = None, **size_bounds) -> np.ndarray:
+    """Indices of incomplete datasets first, then by decreasing aged value per MB."""
+    value = value_per_mb(features, **size_bounds)
+    # Waiting datasets see their value grow without bound, so none starves. The floor
+    # (one event on a capped archive) lets datasets without events age too.
+    floor = 1.0 / size_bounds.get("max_size_mb", DEFAULT_MAX_SIZE_MB)
+    value = (value + floor) * (1.0 + _aging(features["wait_cycles"]))
+    completed = features["completion"] >= 1.0
+    order = np.lexsort((-value, completed))
+    return order if k is None else order[:max(k, 0)]
@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Ranking snapshots published as Arrow IPC files.
+
+Each publication of a ranking version is written to its own
+<directory>/ranking_<version>_<publication>.arrow (rankings are recomputed without a new
+version), then the LATEST file is switched to it. Both steps are atomic renames, so readers never see a
+partial file. Readers memory-map the snapshot: no copy, and every process reading it
+shares the same page cache.
+"""
+
+import logging
+import os
+import pathlib
+import time
+
+try:
+    import pyarrow as pa
+except ImportError:
+    # Optional: the "snapshot" extra, see pyproject.toml
+    pa = None
+
+from typing import Iterable, Optional
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Shared directory of the snapshots (unset: no snapshot)
+_SNAPSHOT_DIR = os.getenv("PRIORIZER_SNAPSHOT_DIR")
+# Snapshots kept, the latest included
+_SNAPSHOT_KEEP = int(os.getenv("PRIORIZER_SNAPSHOT_KEEP", "3"))
+_BATCH_ROWS = 50000
+
+LATEST = "LATEST"
+
+SCHEMA = pa.schema([
+    ("dataset_id", pa.int64()),
+    ("resource_id", pa.int64()),
+    ("asset_id", pa.int64()),
+    ("rank", pa.int64()),
+    ("size_mb", pa.float64()),
+    ("url", pa.string()),
+    ("rescued", pa.bool_()),
+]) if pa else None
+
+
+class SnapshotWriter:
+    def __init__(self, directory: pathlib.Path, keep: int = _SNAPSHOT_KEEP):
+        self.directory = pathlib.Path(directory)
+        self.keep = keep
+
+    @classmethod
+    def from_env(cls) -> Optional["SnapshotWriter"]:
+        if not _SNAPSHOT_DIR:
+            return None
+        if not pa:
+            logger.warning("PRIORIZER_SNAPSHOT_DIR is set but pyarrow is not installed: no snapshot")
+            return None
+        return cls(pathlib.Path(_SNAPSHOT_DIR))
+
+    def write(self, version, rows: Iterable[tuple]) -> pathlib.Path:
+        """Writes rows (tuples in SCHEMA order) as snapshot `version` and makes it the latest."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Never the name of the previous publication: readers spot the new file
+        path = self.directory / f"ranking_{version}_{time.time_ns()}.arrow"
+        tmp_path = self.directory / f".{path.name}.tmp"
+
+        nb_rows = 0
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= _BATCH_ROWS:
+                    writer.write_batch(_record_batch(batch))
+                    nb_rows += len(batch)
+                    batch = []
+            if batch or not nb_rows:
+                writer.write_batch(_record_batch(batch))
+                nb_rows += len(batch)
+        os.replace(tmp_path, path)
+
+        latest_tmp = self.directory / f".{LATEST}.tmp"
+        latest_tmp.write_text(path.name)
+        os.replace(latest_tmp, self.directory / LATEST)
+
+        self._prune(path)
+        logger.info(f"Ranking snapshot {path} published: {nb_rows} assets")
+        return path
+
+    def _prune(self, latest: pathlib.Path):
+        snapshots = sorted(self.directory.glob("ranking_*.arrow"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for snapshot in [s for s in snapshots if s != latest][max(self.keep - 1, 0):]:
+            # Readers still mapping it keep their view until they close it
+            snapshot.unlink(missing_ok=True)
+
+
+def _record_batch(rows: list) -> pa.RecordBatch:
+    columns = list(zip(*rows)) if rows else [[] for _ in SCHEMA]
+    return pa.record_batch(
+        [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)],
+        schema=SCHEMA,
+    )
+
+
+def latest_path(directory: pathlib.Path) -> Optional[pathlib.Path]:
+    pointer = pathlib.Path(directory) / LATEST
+    if not pointer.exists():
+        return None
+    return pointer.parent / pointer.read_text().strip()
+
+
+def read_snapshot(path: pathlib.Path) -> pa.Table:
+    """Memory-mapped (zero copy) snapshot table."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
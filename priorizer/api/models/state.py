@@ -5,7 +5,10 @@ Global state manager for the priorizer service application.
 import logging
 
 from typing import Optional
+from models.jobs import JobManager
 from models.logic import RankedRequestManager
+from models.rank_writer import RankWriter
+from models.snapshot import SnapshotWriter
 
 
 class AppState:
@@ -26,6 +29,12 @@ class AppState:
         self._logger.setLevel(logging.INFO)
         # Priorizer configuration
         self._priorizer: RankedRequestManager = RankedRequestManager()
+        # Bulk writer for new ranks
+        self._rank_writer: RankWriter = RankWriter()
+        # Arrow snapshots of each ranking, None unless PRIORIZER_SNAPSHOT_DIR is set
+        self._snapshot_writer: Optional[SnapshotWriter] = SnapshotWriter.from_env()
+        # Background jobs (ranking computation requested through the API)
+        self._jobs: JobManager = JobManager()
 
 
 # Global state instance
@@ -5,14 +5,14 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 from fastapi import FastAPI
 from models.state import app_state
-from routers import priorizer
-from rescue_api.models.dataset_rank import DatasetRank
-from rescue_api.database import get_db
+from routers import debug, priorizer
+from models.database import session_scope
 import csv
 
 # App configuration
 app = FastAPI()
 app.include_router(priorizer.router)
+app.include_router(debug.router)
 
 # Configuration du logging
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,23 +23,27 @@ logger.setLevel(logging.INFO)
 scheduler = BackgroundScheduler(daemon=True)
 # broija 2025-09-04 : temporary disabling scheduler
 #scheduler.start()
-atexit.register(lambda: scheduler.shutdown())
+atexit.register(lambda: scheduler.shutdown() if scheduler.running else None)
+atexit.register(lambda: app_state._jobs.shutdown())
 
 #TODO Create end point to force manual ranking ?
 def priority_update():
     """Chroned asset priority ranking"""
     try:
-        app_state._logger.info("START: Priority ranking update...")        
-        updated_ranks = app_state._priorizer.compute_rank()
-        app_state._logger.info("SUCCESS: Priority ranking update success")
-
-        app_state._logger.info("Insert new ranking in dataset_ranks table...")
-        session = next(get_db())
-
-        session.bulk_insert_mappings(DatasetRank, updated_ranks)
-        session.commit()
-        session.close()
-        app_state._logger.info(f"SUCCESS: {len(updated_ranks)} ranks inserted")
+        with session_scope() as session:
+            app_state._logger.info("START: Priority ranking update...")        
+            updated_ranks = app_state._priorizer.compute_rank(session)
+            app_state._logger.info("SUCCESS: Priority ranking update success")
+
+            app_state._logger.info("Insert new ranking in dataset_ranks table...")
+            result = app_state._rank_writer.write(session, updated_ranks)
+        # /ranking serves the new ranking from now on
+        app_state._priorizer.cache.invalidate()
+
+        if app_state._snapshot_writer:
+            with session_scope() as session:
+                app_state._priorizer.export_snapshot(session, app_state._snapshot_writer)
+        app_state._logger.info(f"SUCCESS: {result.rows} ranks inserted")
         
     except Exception as e:
         logger.error(f"FAIL: priority ranking update: {str(e)}", exc_info=True)
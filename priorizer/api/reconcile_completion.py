@@ -0,0 +1,32 @@
+# coding: utf-8
+"""
+Rebuilds the dataset_completion summary from the downloader library and rescues.
+
+Run from priorizer/api, e.g. daily, to catch rescues the dispatcher could not notify:
+    uv run python reconcile_completion.py
+"""
+
+import argparse
+
+from models.completion import CompletionSummary
+from models.database import session_scope
+
+argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+argparser.add_argument(
+    "--dataset-ids",
+    type=int,
+    nargs="+",
+    help="Only refresh these datasets (default: rebuild the whole summary).",
+)
+
+args = argparser.parse_args()
+
+summary = CompletionSummary()
+with session_scope() as session:
+    summary.table.create(session.get_bind(), checkfirst=True)
+    if args.dataset_ids:
+        rows = summary.refresh(session, args.dataset_ids)
+    else:
+        rows = summary.rebuild(session)
+
+print(f"{rows} datasets reconciled")
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from models.database import pool_status
+from models.profiling import profiler
+from models.state import app_state
+
+router = APIRouter(prefix="/debug")
+
+@router.get('/pool')
+async def pool():
+    """ Connection pool usage: checked out connections, overflow and checkout wait times """
+    return JSONResponse(content=pool_status())
+
+@router.get('/queries')
+async def queries():
+    """ Per-statement latency histograms and row counts, with the last captured EXPLAIN plans """
+    return JSONResponse(content={
+        "statements": profiler.snapshot(),
+        "explains": list(profiler.explains),
+    })
+
+@router.delete('/queries')
+async def reset_queries():
+    """ Reset query statistics """
+    profiler.reset()
+    return JSONResponse(content={"status": "success"})
+
+@router.get('/cache')
+async def cache():
+    """ Ranking cache version and hit rate """
+    return JSONResponse(content=app_state._priorizer.cache.stats())
@@ -1,9 +1,12 @@
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Depends
 from fastapi.responses import JSONResponse
-from models.priorizer import PriorizerResponse
+from models.priorizer import CompletionRefreshRequest, PriorizerResponse
 import json
 from os.path import join, dirname
+from models.database import get_session, session_scope
+from models.jobs import run_blocking
 from models.state import app_state
+from sqlalchemy.orm import Session
 from typing import List
 
 router = APIRouter()
@@ -28,11 +31,11 @@ async def mock_ranking():
     return priorizer_response
 
 @router.post('/ranking', response_model=PriorizerResponse)
-async def ranking():
+async def ranking(session: Session = Depends(get_session)):
     """ Request dataset_ranks latest rank"""
     app_state._logger.info("________In priorizer")
     # Call last priorizer ranking available
-    result = app_state._priorizer.get_rank()
+    result = await run_blocking(app_state._priorizer.get_rank, session)
     
     app_state._logger.info(f"Rank size: {len(result['assets'])}")
     # TODO May need refactoring for network optimization purpose
@@ -44,14 +47,33 @@ async def ranking():
 
     return priorizer_response
 
-@router.post('/test_ranking', response_model=List)
-async def test_ranking():
-    """ Compute new ranks """
-    app_state._logger.info("________In priorizer rank")
-    # Compute updated ranks
-    ranks = app_state._priorizer.compute_rank()
- 
+def _compute_rank() -> List:
+    with session_scope() as session:
+        # Not written to dataset_ranks: not a new aging cycle
+        ranks = app_state._priorizer.compute_rank(session, advance_aging=False)
     app_state._logger.info(f"Ranked assets: {len(ranks)}")
     app_state._logger.info("New ranking available")
-
     return ranks
+
+@router.post('/test_ranking', status_code=202)
+async def test_ranking():
+    """ Compute new ranks in background, poll /jobs/{job_id} for the result """
+    app_state._logger.info("________In priorizer rank")
+    job = app_state._jobs.submit("compute_rank", _compute_rank)
+    return {"job_id": job.id, "status": job.status}
+
+@router.get('/jobs/{job_id}')
+async def job_status(job_id: str):
+    """ Background job status, with its result once done """
+    job = app_state._jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.as_dict()
+
+@router.post('/completion/refresh')
+async def refresh_completion(request: CompletionRefreshRequest, session: Session = Depends(get_session)):
+    """ Refresh the completion status of the datasets of rescued assets """
+    refreshed = await run_blocking(app_state._priorizer.completion.refresh_assets, session, request.asset_ids)
+    # Rescued assets are no longer served as deeplinks
+    app_state._priorizer.cache.invalidate()
+    return {"refreshed_datasets": refreshed}
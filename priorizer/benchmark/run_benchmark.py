@@ -0,0 +1,148 @@
+# coding: utf-8
+"""
+Times the priorizer ranking code end to end on a synthetic SQLite catalog.
+
+    cd priorizer
+    uv run python benchmark/run_benchmark.py --datasets 100000
+
+The catalog is built once per size (--rebuild to force it), results are written as
+JSON to --output-dir.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+_BENCHMARK_DIR = pathlib.Path(__file__).resolve().parent
+_MODES = ("events", "score", "value_per_byte", "blended")
+
+argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+argparser.add_argument("--datasets", type=int, default=10000, help="Number of datasets (10k to 5M).")
+argparser.add_argument("--resources-per-dataset", type=int, default=3)
+argparser.add_argument("--assets-per-resource", type=int, default=1)
+argparser.add_argument("--rescue-ratio", type=float, default=0.2, help="Share of rescued assets.")
+argparser.add_argument("--seed", type=int, default=0)
+argparser.add_argument("--repeat", type=int, default=3, help="Runs per timed operation.")
+argparser.add_argument("--modes", nargs="+", choices=_MODES, default=list(_MODES), help="compute_rank modes to time.")
+argparser.add_argument("--db", type=pathlib.Path, help="SQLite catalog path (default: data/catalog_<datasets>.db).")
+argparser.add_argument("--rebuild", action="store_true", help="Rebuild the catalog even if it exists.")
+argparser.add_argument("--output-dir", type=pathlib.Path, default=_BENCHMARK_DIR / "results")
+
+args = argparser.parse_args()
+
+args.db = args.db or _BENCHMARK_DIR / "data" / f"catalog_{args.datasets}.db"
+args.db.parent.mkdir(parents=True, exist_ok=True)
+args.output_dir.mkdir(parents=True, exist_ok=True)
+if args.rebuild and args.db.exists():
+    args.db.unlink()
+is_new_catalog = not args.db.exists()
+
+# The priorizer reads its configuration when its modules are imported
+os.environ["PRIORIZER_DATABASE_URL"] = f"sqlite:///{args.db}"
+os.environ["PRIORIZER_AGING_STATE"] = str(pathlib.Path(tempfile.mkdtemp()) / "aging_state.npz")
+os.environ.pop("PRIORIZER_SNAPSHOT_DIR", None)
+sys.path.insert(0, str(_BENCHMARK_DIR.parent / "api"))
+sys.path.insert(0, str(_BENCHMARK_DIR))
+
+from models.database import get_engine, session_scope  # noqa: E402
+from rescue_api.models.dataset_rank import DatasetRank  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+from models.state import app_state  # noqa: E402
+from synthetic import build_catalog  # noqa: E402
+
+catalog = None
+if is_new_catalog:
+    start = time.perf_counter()
+    catalog = build_catalog(
+        get_engine(),
+        datasets=args.datasets,
+        resources_per_dataset=args.resources_per_dataset,
+        assets_per_resource=args.assets_per_resource,
+        rescue_ratio=args.rescue_ratio,
+        seed=args.seed,
+    )
+    catalog["build_seconds"] = time.perf_counter() - start
+
+
+def timed(fn, setup=None, check=None) -> dict:
+    runs = []
+    for _ in range(args.repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+        if check:
+            check(result)
+    return {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "max": max(runs),
+    }
+
+
+def get_rank():
+    with session_scope() as session:
+        app_state._priorizer.get_rank(session)
+
+
+def compute_rank(mode: str):
+    with session_scope() as session:
+        app_state._priorizer.compute_rank(session, mode=mode)
+
+
+def count_ranks() -> int:
+    with session_scope() as session:
+        return session.query(func.count(DatasetRank.id)).scalar()
+
+
+_rank_rows = {}
+
+
+def ranking_update() -> int:
+    # The steps of priority_update(), which logs its errors instead of raising them: a
+    # failed update would be timed as a fast one
+    with session_scope() as session:
+        ranks = app_state._priorizer.compute_rank(session)
+        app_state._rank_writer.write(session, ranks)
+    app_state._priorizer.cache.invalidate()
+    return len(ranks)
+
+
+def check_ranking_update(nb_ranks: int):
+    rows_written = count_ranks() - _rank_rows["before"]
+    if rows_written != nb_ranks:
+        raise RuntimeError(f"{rows_written} ranks written out of {nb_ranks}")
+
+
+results = {
+    "get_rank_cold": timed(get_rank, setup=app_state._priorizer.cache.invalidate),
+    "get_rank_cached": timed(get_rank),
+}
+for mode in args.modes:
+    results[f"compute_rank_{mode}"] = timed(lambda: compute_rank(mode))
+results["ranking_update"] = timed(
+    ranking_update,
+    setup=lambda: _rank_rows.update(before=count_ranks()),
+    check=check_ranking_update,
+)
+
+for name, result in results.items():
+    print(f"{name:32} median {result['median']:.3f}s (min {result['min']:.3f}s, max {result['max']:.3f}s)")
+
+report = {
+    "date": datetime.datetime.now().isoformat(),
+    "parameters": {key: str(value) if isinstance(value, pathlib.Path) else value for key, value in vars(args).items()},
+    "catalog": catalog,
+    "results": results,
+}
+output_path = args.output_dir / f"benchmark_{args.datasets}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+output_path.write_text(json.dumps(report, indent=2))
+print(f"Results written to {output_path}")
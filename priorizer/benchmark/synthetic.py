@@ -0,0 +1,156 @@
+# coding: utf-8
+"""
+Synthetic rescue catalog, written straight into the rescue_api tables.
+"""
+
+import datetime
+import numpy as np
+
+from rescue_api.models.asset import Asset
+from rescue_api.models.asset_resource import asset_resource
+from rescue_api.models.dataset import Dataset
+from rescue_api.models.dataset_rank import DatasetRank
+from rescue_api.models.dataset_ranking import DatasetRanking
+from rescue_api.models.mvp_downloader_library import MvpDownloaderLibrary
+from rescue_api.models.rescues import Rescue
+from rescue_api.models.resource import Resource
+from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric, String, Text
+from sqlalchemy.engine import Engine
+
+_BATCH_ROWS = 50000
+_MVP_RANKING_ID = 8
+_AUTO_RANKING_ID = 10
+_ORGANIZATIONS = 200
+_HOSTS = 50
+
+# Filler of the NOT NULL columns the generator does not know about
+_TYPE_DEFAULTS = (
+    (Boolean, False),
+    (DateTime, datetime.datetime(2025, 1, 1)),
+    ((Integer, Float, Numeric), 0),
+    ((String, Text), ""),
+)
+
+
+def _required_defaults(table) -> dict:
+    defaults = {}
+    for column in table.columns:
+        if column.nullable or column.default is not None or column.server_default is not None:
+            continue
+        if column.primary_key and column.autoincrement in (True, "auto"):
+            continue
+        for types, value in _TYPE_DEFAULTS:
+            if isinstance(column.type, types):
+                defaults[column.key] = value
+                break
+    return defaults
+
+
+def _insert(engine: Engine, table, rows, total: int, desc: str):
+    """Inserts generated rows (dicts) in batches"""
+    defaults = _required_defaults(table)
+    batch = []
+    with engine.begin() as connection:
+        for row in rows:
+            batch.append({**defaults, **row})
+            if len(batch) >= _BATCH_ROWS:
+                connection.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(table.insert(), batch)
+    print(f"{total} {desc} inserted")
+
+
+def build_catalog(
+    engine: Engine,
+    datasets: int = 10000,
+    resources_per_dataset: int = 3,
+    assets_per_resource: int = 1,
+    rescue_ratio: float = 0.2,
+    seed: int = 0,
+) -> dict:
+    """Creates the tables and fills them. Returns the number of rows per table."""
+    rng = np.random.default_rng(seed)
+    for table in (Dataset, Resource, Asset, Rescue, DatasetRanking, DatasetRank, MvpDownloaderLibrary):
+        table.__table__.create(engine, checkfirst=True)
+    asset_resource.create(engine, checkfirst=True)
+
+    nb_resources = datasets * resources_per_dataset
+    nb_assets = nb_resources * assets_per_resource
+    dataset_ids = np.arange(1, datasets + 1)
+    resource_datasets = np.repeat(dataset_ids, resources_per_dataset)
+    asset_resources = np.repeat(np.arange(1, nb_resources + 1), assets_per_resource)
+    # Heavy tailed popularity and sizes, as in the real exports
+    event_counts = rng.zipf(1.5, size=datasets).clip(max=10 ** 6)
+    sizes_mb = rng.lognormal(mean=3.0, sigma=2.0, size=nb_resources)
+    organizations = rng.integers(1, _ORGANIZATIONS + 1, size=datasets)
+    rescued = rng.random(nb_assets) < rescue_ratio
+
+    _insert(engine, Dataset.__table__, (
+        {"id": int(i), "organization_id": int(organizations[i - 1])} for i in dataset_ids
+    ), datasets, "datasets")
+    _insert(engine, Resource.__table__, (
+        {"id": i + 1, "dataset_id": int(d)} for i, d in enumerate(resource_datasets)
+    ), nb_resources, "resources")
+    _insert(engine, Asset.__table__, (
+        {"id": i + 1, "size": int(sizes_mb[r - 1] * 1024 * 1024), "url": _deeplink(r)} for i, r in enumerate(asset_resources)
+    ), nb_assets, "assets")
+    _insert(engine, asset_resource, (
+        {"asset_id": i + 1, "resource_id": int(r)} for i, r in enumerate(asset_resources)
+    ), nb_assets, "asset_resource")
+    _insert(engine, Rescue.__table__, (
+        {"asset_id": int(i) + 1, "rescuer_id": 1, "magnet_link": _magnet(i), "status": "success"}
+        for i in np.flatnonzero(rescued)
+    ), int(rescued.sum()), "rescues")
+
+    resource_rescued = rescued.reshape(nb_resources, assets_per_resource).all(axis=1)
+    _insert(engine, MvpDownloaderLibrary.__table__, (
+        {
+            "dataset_id": int(d),
+            "resource_id": i + 1,
+            "deeplink": _deeplink(i + 1),
+            "deeplink_file_size": float(sizes_mb[i]),
+            "magnet_link": _magnet(i) if resource_rescued[i] else None,
+        }
+        for i, d in enumerate(resource_datasets)
+    ), nb_resources, "mvp_downloader_library")
+
+    now = datetime.datetime.now()
+    _insert(engine, DatasetRanking.__table__, [
+        {"id": _MVP_RANKING_ID, "type": "link", "ranking_date": now - datetime.timedelta(days=30)},
+        {"id": _MVP_RANKING_ID + 1, "type": "download", "ranking_date": now - datetime.timedelta(days=30)},
+        {"id": _AUTO_RANKING_ID, "type": "auto", "ranking_date": now},
+    ], 3, "dataset_rankings")
+
+    order = np.argsort(-event_counts, kind="stable")
+    ranks = np.empty(datasets, dtype=np.int64)
+    ranks[order] = np.arange(1, datasets + 1)
+    sources = (_MVP_RANKING_ID, _MVP_RANKING_ID + 1, _AUTO_RANKING_ID)
+    _insert(engine, DatasetRank.__table__, (
+        {
+            "id": n * datasets + i + 1,
+            "dataset_id": int(dataset_ids[i]),
+            "ranking_id": ranking_id,
+            "rank": int(ranks[i]),
+            "event_count": int(event_counts[i]),
+            "updated_at": now,
+        }
+        for n, ranking_id in enumerate(sources)
+        for i in range(datasets)
+    ), datasets * len(sources), "dataset_ranks")
+
+    return {
+        "datasets": datasets,
+        "resources": nb_resources,
+        "assets": nb_assets,
+        "rescues": int(rescued.sum()),
+        "ranks": datasets * len(sources),
+    }
+
+
+def _deeplink(resource_id: int) -> str:
+    return f"https://data{resource_id % _HOSTS}.example.gov/files/{resource_id}.zip"
+
+
+def _magnet(index: int) -> str:
+    return f"magnet:?xt=urn:btih:{index:040x}"
@@ -0,0 +1,116 @@
+# coding: utf-8
+
+import json
+import sqlite3
+
+import pytest
+
+from datagov.ckan.catalog_index import CatalogIndex
+from datagov.ckan.stream import iter_page_files, open_page, write_jsonl
+
+
+def write_page(path, datasets):
+    with open_page(path, "w") as output_file:
+        if path.suffix == ".json":
+            json.dump({"count": len(datasets), "results": datasets}, output_file, indent=4)
+        else:
+            write_jsonl({"count": len(datasets), "results": datasets}, output_file)
+
+
+def dataset(dg_id, metadata_modified="2025-01-01T00:00:00"):
+    return {
+        "id": dg_id,
+        "name": f"name-{dg_id}",
+        "metadata_modified": metadata_modified,
+        "organization": {"name": "epa-gov"},
+    }
+
+
+@pytest.fixture
+def harvest_dir(tmp_path):
+    directory = tmp_path / "data_gov_epa-gov_20250101_000000"
+    directory.mkdir()
+    write_page(directory / "package_search_S0_R2.jsonl", [dataset("a"), dataset("b")])
+    write_page(directory / "package_search_S2_R2.jsonl.gz", [dataset("c"), dataset("a", "2025-02-01T00:00:00")])
+    write_page(directory / "package_search_S4_R2.json", [dataset("d")])
+    return directory
+
+
+def test_catalog_index_lookups(harvest_dir):
+    catalog_index = CatalogIndex(harvest_dir)
+    assert catalog_index.build() == 3
+    assert catalog_index.dataset_count() == 4
+
+    # Plain jsonl: byte offset
+    page_path, position, offset = catalog_index.locate("b")
+    assert (page_path.name, position) == ("package_search_S0_R2.jsonl", 1)
+    assert offset is not None
+    assert catalog_index.get("b")["name"] == "name-b"
+
+    # Latest version, from a compressed page
+    assert catalog_index.get("a")["metadata_modified"] == "2025-02-01T00:00:00"
+    assert catalog_index.get("d")["name"] == "name-d"
+    assert catalog_index.get("z") is None
+
+
+def test_catalog_index_get_outdated_page(harvest_dir):
+    catalog_index = CatalogIndex(harvest_dir)
+    catalog_index.build()
+
+    # Rewritten since build(): the indexed offset of "b" points elsewhere
+    page_path = harvest_dir / "package_search_S0_R2.jsonl"
+    write_page(page_path, [dict(dataset("c"), name="a longer name"), dict(dataset("b"), name="renamed")])
+    assert catalog_index.get("b")["name"] == "renamed"
+
+    page_path.unlink()
+    assert catalog_index.get("b") is None
+
+
+def test_catalog_index_refresh(harvest_dir):
+    catalog_index = CatalogIndex(harvest_dir)
+    catalog_index.build()
+
+    (harvest_dir / "package_search_S4_R2.json").unlink()
+    write_page(harvest_dir / "package_search_S6_R2.jsonl", [dataset("e")])
+
+    assert catalog_index.build() == 1
+    assert catalog_index.get("d") is None
+    assert catalog_index.get("e")["name"] == "name-e"
+
+
+def test_iter_page_files_uses_catalog_index(harvest_dir):
+    CatalogIndex(harvest_dir).build()
+    # Not listed until the index is refreshed.
+    write_page(harvest_dir / "package_search_S6_R2.jsonl", [dataset("e")])
+
+    assert [path.name for path in iter_page_files(harvest_dir.parent)] == [
+        "package_search_S0_R2.jsonl",
+        "package_search_S2_R2.jsonl.gz",
+        "package_search_S4_R2.json",
+    ]
+
+
+def test_read_only_catalog_index(harvest_dir):
+    with pytest.raises(FileNotFoundError):
+        CatalogIndex(harvest_dir, read_only=True)
+    assert not CatalogIndex.exists(harvest_dir)
+
+    CatalogIndex(harvest_dir).build()
+    catalog_index = CatalogIndex(harvest_dir, read_only=True)
+    assert catalog_index.get("d")["name"] == "name-d"
+    assert catalog_index.compare(catalog_index)["unchanged"] == 4
+    with pytest.raises(sqlite3.OperationalError):
+        catalog_index.build(rebuild=True)
+    catalog_index.close()
+
+
+def test_iter_page_files_walks_outdated_catalog_index(harvest_dir):
+    CatalogIndex(harvest_dir).build()
+    (harvest_dir / "package_search_S4_R2.json").unlink()
+    write_page(harvest_dir / "package_search_S6_R2.jsonl", [dataset("e")])
+
+    assert [path.name for path in iter_page_files(harvest_dir.parent)] == [
+        "package_search_S0_R2.jsonl",
+        "package_search_S2_R2.jsonl.gz",
+        "package_search_S6_R2.jsonl",
+    ]
@@ -0,0 +1,27 @@
+# coding: utf-8
+
+import pytest
+
+from datagov.ckan.checkpoint import SearchCheckpoint, find_resumable
+
+
+def test_checkpoint_round_trip(tmp_path):
+    query = {"fq": "+organization:epa-gov", "rows": 10}
+    output_dir = tmp_path / "data_gov_epa-gov_20250101_000000"
+
+    checkpoint = SearchCheckpoint.open(output_dir, query)
+    checkpoint.mark(0, 10, 25)
+    checkpoint.mark(20, 5, 25)
+
+    assert find_resumable(tmp_path, "data_gov_epa-gov_*") == output_dir
+
+    checkpoint = SearchCheckpoint.open(output_dir, query)
+    assert checkpoint.pages == {0: 10, 20: 5}
+    assert checkpoint.total_count == 25
+    assert checkpoint.page_size == 10
+
+    checkpoint.finish()
+    assert find_resumable(tmp_path, "data_gov_epa-gov_*") is None
+
+    with pytest.raises(ValueError):
+        SearchCheckpoint.open(output_dir, {"fq": "+organization:nasa-gov", "rows": 10})
@@ -0,0 +1,103 @@
+# coding: utf-8
+
+import copy
+import json
+import sqlite3
+
+from datagov.ckan.catalog_index import CATALOG_INDEX_NAME, CatalogIndex
+from datagov.ckan.content_hash import HashStore, dataset_hash, resource_hash
+
+
+def dataset(dg_id, title="Title", metadata_modified="2025-01-01T00:00:00"):
+    return {
+        "id": dg_id,
+        "title": title,
+        "metadata_modified": metadata_modified,
+        "organization": {"name": "epa-gov"},
+        "extras": [
+            {"key": "harvest_source_id", "value": "source"},
+            {"key": "harvest_object_id", "value": f"object-{metadata_modified}"},
+        ],
+        "resources": [
+            {"id": f"{dg_id}-r", "url": "https://epa.gov/a.csv", "metadata_modified": metadata_modified},
+        ],
+    }
+
+
+def write_page(path, datasets):
+    path.write_text(json.dumps({"count": len(datasets), "results": datasets}))
+
+
+def test_dataset_hash_ignores_volatile_fields():
+    obj = dataset("a")
+    reharvested = dataset("a", metadata_modified="2025-02-01T00:00:00")
+    reharvested["extras"].reverse()
+
+    assert dataset_hash(obj) == dataset_hash(reharvested)
+    assert dataset_hash(obj) != dataset_hash(dataset("a", title="New title"))
+
+    moved = copy.deepcopy(obj)
+    moved["resources"][0]["url"] = "https://epa.gov/b.csv"
+    assert dataset_hash(obj) != dataset_hash(moved)
+    assert resource_hash(obj["resources"][0]) != resource_hash(moved["resources"][0])
+    assert resource_hash(obj["resources"][0]) == resource_hash(reharvested["resources"][0])
+
+
+def test_hash_store(tmp_path):
+    hash_store = HashStore(tmp_path / "hashes.sqlite")
+    assert not hash_store.unchanged("db", "a", "h1")
+
+    assert hash_store.record("db", [("a", "h1"), ("b", "h2")]) == 2
+    hash_store.record("db", [("a", "h3")])
+    hash_store.close()
+
+    hash_store = HashStore(tmp_path / "hashes.sqlite")
+    assert hash_store.unchanged("db", "a", "h3")
+    assert not hash_store.unchanged("db", "a", "h1")
+    # Scopes are independent.
+    assert not hash_store.unchanged("assets", "b", "h2")
+    assert not hash_store.unchanged("db", "b", None)
+    hash_store.close()
+
+
+def test_catalog_compare(tmp_path):
+    previous_dir = tmp_path / "previous"
+    previous_dir.mkdir()
+    write_page(previous_dir / "package_search_S0_R3.json", [dataset("a"), dataset("b"), dataset("c")])
+
+    current_dir = tmp_path / "current"
+    current_dir.mkdir()
+    write_page(current_dir / "package_search_S0_R3.json", [
+        dataset("a", metadata_modified="2025-02-01T00:00:00"),
+        dataset("b", title="New title"),
+        dataset("d"),
+    ])
+
+    previous_index = CatalogIndex(previous_dir)
+    previous_index.build()
+    current_index = CatalogIndex(current_dir)
+    current_index.build()
+
+    assert current_index.content_hash("a") == previous_index.content_hash("a")
+    assert current_index.compare(previous_index) == {
+        "new": 1, "changed": 1, "unchanged": 1, "removed": 1,
+    }
+
+    current_index.close()
+    previous_index.close()
+
+
+def test_catalog_index_without_hashes_is_migrated(tmp_path):
+    write_page(tmp_path / "package_search_S0_R1.json", [dataset("a")])
+
+    connection = sqlite3.connect(tmp_path / CATALOG_INDEX_NAME)
+    connection.execute(
+        "CREATE TABLE datasets (dg_id TEXT NOT NULL, file_id INTEGER NOT NULL,"
+        " position INTEGER NOT NULL, offset INTEGER, organization TEXT, metadata_modified TEXT)"
+    )
+    connection.close()
+
+    catalog_index = CatalogIndex(tmp_path)
+    catalog_index.build(rebuild=True)
+    assert catalog_index.content_hash("a") == dataset_hash(dataset("a"))
+    catalog_index.close()
@@ -0,0 +1,95 @@
+# coding: utf-8
+
+import json
+
+import pytest
+
+pytest.importorskip("rescue_db")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.orm import Session
+
+from datagov.ckan.content_hash import HashStore
+from datagov.ckan.model_manager import ModelManager
+from datagov.ckan.package_search import DatasetLoader
+from rescue_db.rescue_api.models.dataset import Dataset
+
+
+def _dataset(metadata_modified: str, title: str) -> dict:
+    return {
+        "id": "dataset-1",
+        "name": "dataset-1",
+        "title": title,
+        "notes": "",
+        "metadata_created": "2025-01-01T00:00:00",
+        "metadata_modified": metadata_modified,
+        "organization": {
+            "id": "organization-1",
+            "name": "organization-1",
+            "title": "Organization 1",
+            "created": "2025-01-01T00:00:00",
+        },
+    }
+
+
+@pytest.fixture
+def session():
+    engine = sqlalchemy.create_engine("sqlite://")
+    Dataset.metadata.create_all(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+def _write(manager: ModelManager, session: Session):
+    session.add_all(manager.get_datasets())
+    session.commit()
+    manager.release()
+
+
+def test_released_dataset_is_updated(session):
+    manager = ModelManager(exists_ok=True, session=session)
+    manager.create_dataset(_dataset("2025-01-01T00:00:00", "First"))
+    _write(manager, session)
+
+    newer = manager.create_dataset(_dataset("2025-02-01T00:00:00", "Second"))
+    _write(manager, session)
+    older = manager.create_dataset(_dataset("2024-12-01T00:00:00", "Zeroth"))
+
+    assert session.query(Dataset).count() == 1
+    assert older is newer
+    assert newer.dg_title == "Second"
+    assert json.loads(newer.json_data.content)["title"] == "Second"
+
+
+def test_released_dataset_needs_a_session(session):
+    manager = ModelManager(exists_ok=True)
+    manager.create_dataset(_dataset("2025-01-01T00:00:00", "First"))
+    _write(manager, session)
+
+    with pytest.raises(Exception, match="session"):
+        manager.create_dataset(_dataset("2025-02-01T00:00:00", "Second"))
+
+
+def _run(page, session: Session, hash_store: HashStore):
+    # As json_to_db.py does.
+    loader = DatasetLoader(exists_ok=True, session=session)
+    loader.skip_unchanged(hash_store, "json_to_db.datasets")
+    loader.index(page)
+    loader.load(page)
+    session.add_all(loader.model_manager.get_datasets())
+    session.commit()
+    hash_store.record("json_to_db.datasets", loader.pop_loaded_hashes())
+    loader.model_manager.release()
+
+
+def test_changed_dataset_is_updated(session, tmp_path):
+    hash_store = HashStore(tmp_path / "hashes.sqlite")
+    page = tmp_path / "package_search_S0.json"
+
+    page.write_text(json.dumps({"count": 1, "results": [_dataset("2025-01-01T00:00:00", "First")]}))
+    _run(page, session, hash_store)
+    page.write_text(json.dumps({"count": 1, "results": [_dataset("2025-02-01T00:00:00", "Second")]}))
+    _run(page, session, hash_store)
+    hash_store.close()
+
+    assert [dataset.dg_title for dataset in session.query(Dataset)] == ["Second"]
@@ -0,0 +1,50 @@
+# coding: utf-8
+
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+pytest.importorskip("rescue_db")
+uvicorn = pytest.importorskip("uvicorn")
+
+from datagov.ckan.package_search import Searcher
+from datagov.ckan.retry import RetryPolicy
+from datagov.ckan.standin import CkanStandIn
+
+
+@pytest.fixture
+def stalled_ckan():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    app = CkanStandIn.synthetic(10, latency=5)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    yield app, f"http://127.0.0.1:{port}"
+
+    server.should_exit = server.force_exit = True
+    thread.join()
+
+
+def test_stalled_request_times_out(stalled_ckan):
+    app, url = stalled_ckan
+    searcher = Searcher(url, retry_policy=RetryPolicy(retries=1, base=0), timeout=0.2)
+
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        searcher.count()
+
+    # Retried once, both attempts timed out long before the stand-in answered.
+    assert time.monotonic() - start < 2
+    assert app.request_count == 2
+
+    app.latency = 0
+    assert searcher.count() == 10
@@ -0,0 +1,84 @@
+# coding: utf-8
+
+import json
+from operator import itemgetter
+
+from datagov.ckan import parallel
+from datagov.ckan.catalog_index import CatalogIndex
+from datagov.ckan.parallel import index_pages, iter_latest_objects
+from datagov.ckan.record_index import RecordIndex
+
+
+def test_index_pages_does_not_depend_on_workers(tmp_path):
+    paths = []
+    for page in range(12):
+        path = tmp_path / f"package_search_S{page:02}.json"
+        # Datasets in several pages, some with the same metadata_modified.
+        results = [
+            {"id": f"ds{(page * 3 + i) % 20}", "metadata_modified": f"2025-01-{page % 4 + 1:02}"}
+            for i in range(5)
+        ]
+        path.write_text(json.dumps({"count": 60, "results": results}))
+        paths.append(path)
+
+    indexes = []
+    for workers in (1, 3):
+        index = RecordIndex()
+        assert list(index_pages(index, paths, workers=workers)) == paths
+        indexes.append(
+            {dg_id: (r.metadata_modified, r.source) for dg_id, r in index.records.items()}
+        )
+
+    assert indexes[0] == indexes[1]
+    assert len(indexes[0]) == 20
+
+
+def test_index_pages_reads_the_catalog_index(tmp_path, monkeypatch):
+    paths = []
+    for page in range(3):
+        path = tmp_path / f"package_search_S{page}.json"
+        results = [{"id": f"ds{page + i}", "metadata_modified": f"2025-01-0{page + 1}"} for i in range(2)]
+        path.write_text(json.dumps({"count": 6, "results": results}))
+        paths.append(path)
+    CatalogIndex(tmp_path).build()
+
+    expected = RecordIndex()
+    list(index_pages(expected, paths))
+
+    # Only the page written after the index was built is decoded.
+    decoded = []
+    monkeypatch.setattr(parallel, "_page_records", lambda path: decoded.append(path) or [])
+    paths[2].write_text(json.dumps({"count": 0, "results": []}))
+    index = RecordIndex()
+    list(index_pages(index, paths))
+
+    assert decoded == [paths[2]]
+    assert index.get("ds1").source == expected.get("ds1").source == str(paths[1])
+    assert index.get("ds1").content_hash == expected.get("ds1").content_hash
+
+
+def test_iter_latest_objects_only_sends_back_the_latest_versions(tmp_path):
+    paths = []
+    for page in range(6):
+        path = tmp_path / f"package_search_S{page}.json"
+        results = [
+            {"id": f"ds{(page + i) % 4}", "name": f"name-{page}-{i}", "metadata_modified": f"2025-01-0{page % 3 + 1}"}
+            for i in range(3)
+        ]
+        path.write_text(json.dumps({"count": 18, "results": results}))
+        paths.append(path)
+
+    index = RecordIndex()
+    list(index_pages(index, paths))
+
+    results = []
+    for workers in (1, 3):
+        results.append(list(iter_latest_objects(index, paths, workers=workers, transform=itemgetter("name"))))
+
+    assert results[0] == results[1]
+    latest = {dg_id: name for _, objects in results[0] for dg_id, _, name in objects}
+    assert sorted(latest) == ["ds0", "ds1", "ds2", "ds3"]
+    assert sum(len(objects) for _, objects in results[0]) == 4
+    assert [str(path) for path, objects in results[0] if objects] == sorted(
+        {index.get(dg_id).source for dg_id in latest}
+    )
@@ -0,0 +1,30 @@
+# coding: utf-8
+
+import pathlib
+
+from datagov.ckan.record_index import Record, RecordIndex
+
+
+def test_record_index_keeps_latest_version():
+    index = RecordIndex()
+    page_0 = pathlib.Path("data_gov_epa-gov/package_search_S0.json")
+    page_1 = pathlib.Path("data_gov_epa-gov/package_search_S1.json")
+
+    assert index.offer("a", "2025-01-02T00:00:00", source=page_0)
+    assert not index.offer("a", "2025-01-01T00:00:00", source=page_1)
+    assert not index.offer("a", "2025-01-02T00:00:00", source=page_1)
+    assert index.offer("b", "2025-01-01T00:00:00", source=page_1)
+
+    assert len(index) == 2
+    assert "a" in index
+    assert index.is_latest("a", "2025-01-02T00:00:00", source=page_0)
+    assert not index.is_latest("a", "2025-01-02T00:00:00", source=page_1)
+    assert not index.is_latest("c", "2025-01-02T00:00:00", source=page_0)
+
+    # Records of a page share its source string.
+    index.offer("c", "2025-01-01T00:00:00", source=pathlib.Path(str(page_1)))
+    assert index.get("c").source is index.get("b").source
+
+
+def test_record_has_no_dict():
+    assert not hasattr(Record("2025-01-01T00:00:00"), "__dict__")
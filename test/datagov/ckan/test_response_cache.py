@@ -0,0 +1,27 @@
+# coding: utf-8
+
+import os
+
+from datagov.ckan.response_cache import ResponseCache
+
+
+def test_response_cache(tmp_path):
+    cache = ResponseCache(tmp_path)
+    query = {"fq": "+organization:epa-gov", "start": 0, "rows": 10}
+
+    assert cache.get("https://catalog.data.gov", query) is None
+    cache.put("https://catalog.data.gov", query, {"count": 1, "results": [{"id": "a"}]})
+
+    assert cache.get("https://catalog.data.gov/", dict(reversed(query.items())))["count"] == 1
+    assert cache.get("https://catalog.data.gov", {**query, "start": 10}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_response_cache_ttl(tmp_path):
+    query = {"start": 0}
+    ResponseCache(tmp_path).put("https://catalog.data.gov", query, {"count": 0})
+    for path in tmp_path.rglob("*.json.gz"):
+        os.utime(path, (0, 0))
+
+    assert ResponseCache(tmp_path, ttl=3600).get("https://catalog.data.gov", query) is None
+    assert ResponseCache(tmp_path).get("https://catalog.data.gov", query) == {"count": 0}
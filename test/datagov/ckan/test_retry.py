@@ -0,0 +1,61 @@
+# coding: utf-8
+
+import pytest
+
+from ckanapi.errors import CKANAPIError, NotFound
+
+from datagov.ckan.retry import RetryPolicy, error_status
+
+
+def api_error(status):
+    return CKANAPIError(repr(["https://catalog.data.gov/api/action/package_search", status, "error"]))
+
+
+def test_error_status():
+    assert error_status(api_error(502)) == 502
+    assert error_status(CKANAPIError("Unexpected response")) is None
+
+
+def test_retry_policy_retries_transient_errors():
+    policy = RetryPolicy(retries=3, base=0)
+    errors = [api_error(429), api_error(503)]
+
+    def request():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert policy.call(request) == "ok"
+    assert not errors
+
+
+def test_retry_policy_gives_up():
+    policy = RetryPolicy(retries=2, base=0)
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise api_error(502)
+
+    with pytest.raises(CKANAPIError):
+        policy.call(request)
+    assert len(calls) == 3
+
+
+
+def test_retry_policy_raises_other_errors():
+    policy = RetryPolicy(retries=2, base=0)
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise NotFound("Dataset not found")
+
+    with pytest.raises(NotFound):
+        policy.call(request)
+    assert len(calls) == 1
+
+
+def test_retry_policy_delay_is_capped():
+    policy = RetryPolicy(base=1, cap=8)
+    assert all(0 <= policy.delay(attempt) <= 8 for attempt in range(10))
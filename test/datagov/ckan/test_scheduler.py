@@ -0,0 +1,62 @@
+# coding: utf-8
+
+from datagov.ckan.scheduler import HarvestJob, HarvestScheduler
+
+
+class FakeSearcher:
+    def __init__(self, count):
+        self._count = count
+        self.progress = None
+        self.request_slots = None
+
+    def count(self):
+        return self._count
+
+
+def test_scheduler_runs_largest_organizations_first():
+    started = []
+
+    def harvest(searcher):
+        started.append(searcher.count())
+        searcher.progress.update(searcher.count())
+        if searcher.count() == 0:
+            raise RuntimeError("empty organization")
+        return True
+
+    jobs = [
+        HarvestJob(f"organization-{count}", FakeSearcher(count), harvest)
+        for count in (10, 0, 300, 40)
+    ]
+    scheduler = HarvestScheduler(max_organizations=1, max_requests=2)
+    results = scheduler.run(jobs)
+
+    assert started == [300, 40, 10, 0]
+    assert results["organization-300"] is True
+    assert isinstance(results["organization-0"], RuntimeError)
+    assert all(job.searcher.request_slots is scheduler.request_slots for job in jobs)
+
+
+def test_harvest_job_expected_count():
+    job = HarvestJob("epa-gov", FakeSearcher(1000), None, start=100, limit=500)
+    job.count = 1000
+    assert job.expected() == 500
+
+    job.limit = None
+    assert job.expected() == 900
+
+
+def test_scheduler_skips_organizations_whose_count_fails():
+    class FailingSearcher(FakeSearcher):
+        def count(self):
+            raise ConnectionError("catalog unreachable")
+
+    harvested = []
+    jobs = [
+        HarvestJob("epa-gov", FakeSearcher(10), lambda searcher: harvested.append("epa-gov") or True),
+        HarvestJob("noaa-gov", FailingSearcher(0), lambda searcher: harvested.append("noaa-gov") or True),
+    ]
+    results = HarvestScheduler(max_organizations=2).run(jobs)
+
+    assert harvested == ["epa-gov"]
+    assert results["epa-gov"] is True
+    assert isinstance(results["noaa-gov"], ConnectionError)
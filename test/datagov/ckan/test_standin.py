@@ -0,0 +1,56 @@
+# coding: utf-8
+
+import asyncio
+import json
+
+from datagov.ckan.standin import CkanStandIn
+
+
+def call(app, path, body=None, query_string=b""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(body).encode() if body else b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": query_string}
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"], messages[1]["body"]
+
+
+def test_standin_package_search_pages():
+    app = CkanStandIn.synthetic(95, organizations=2)
+
+    status, body = call(
+        app,
+        "/api/action/package_search",
+        {"fq": "+organization:organization-1", "start": 40, "rows": 20, "sort": "metadata_modified asc"},
+    )
+    result = json.loads(body)["result"]
+
+    assert status == 200
+    assert result["count"] == 47
+    assert len(result["results"]) == 7
+    assert all(obj["organization"]["name"] == "organization-1" for obj in result["results"])
+    modified = [obj["metadata_modified"] for obj in result["results"]]
+    assert modified == sorted(modified)
+
+
+def test_standin_modified_since_and_errors():
+    app = CkanStandIn.synthetic(50)
+    since = sorted(obj["metadata_modified"] for obj in app.datasets)[40]
+
+    status, body = call(
+        app, "/api/3/action/package_search", query_string=f"fq=metadata_modified:[{since[:19]}Z TO *]".encode()
+    )
+    assert json.loads(body)["result"]["count"] == 10
+
+    app.error_rate = 1
+    status, body = call(app, "/api/action/package_search")
+    assert status == 502
+    assert app.error_count == 1
+
+    status, _ = call(app, "/api/action/organization_list")
+    assert status == 404
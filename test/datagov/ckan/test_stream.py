@@ -0,0 +1,65 @@
+# coding: utf-8
+
+import json
+import pathlib
+
+import pytest
+
+from datagov.ckan import stream
+from datagov.ckan.stream import PageReader, iter_page_files, open_page, page_format, write_jsonl
+
+PACKAGES = {
+    "count": 3,
+    "results": [{"id": "a", "extras": [{"key": "size", "value": 1.5}]}, {"id": "b"}, {"id": "c"}],
+    "sort": "score desc",
+}
+
+
+@pytest.fixture(params=["ijson", "json"])
+def json_backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(stream, "ijson", None)
+    elif stream.ijson is None:
+        pytest.skip("ijson is not installed")
+
+
+def test_page_reader_json(tmp_path, json_backend):
+    path = tmp_path / "package_search_S0_R3.json"
+    path.write_text(json.dumps(PACKAGES, indent=4))
+
+    reader = PageReader(path)
+    assert list(reader) == PACKAGES["results"]
+    assert reader.total_count == 3
+
+
+@pytest.mark.parametrize("extension", ["jsonl", "jsonl.gz", "jsonl.zst"])
+def test_page_reader_jsonl(tmp_path, extension):
+    if extension == "jsonl.zst" and stream.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    path = tmp_path / f"package_search_S0_R3.{extension}"
+    with open_page(path, "w") as output_file:
+        write_jsonl(PACKAGES, output_file, query={"fq": "+organization:epa-gov", "start": 0, "rows": 3})
+
+    reader = PageReader(path)
+    assert reader.header == {"count": 3, "sort": "score desc", "start": 0, "rows": 3}
+    assert reader.total_count == 3
+    assert list(reader) == PACKAGES["results"]
+
+
+def test_page_format():
+    assert page_format(pathlib.Path("package_search_S0.json")) == "json"
+    assert page_format(pathlib.Path("package_search_S0.jsonl.gz")) == "jsonl.gz"
+    assert page_format(pathlib.Path("package_search_S0.json.tmp")) is None
+
+
+def test_iter_page_files_skips_hidden_files(tmp_path):
+    (tmp_path / "package_search_S0.json").write_text("{}")
+    (tmp_path / "package_search_S1.jsonl.gz").write_text("{}")
+    (tmp_path / ".checkpoint.json").write_text("{}")
+    (tmp_path / "notes.txt").write_text("")
+
+    assert [path.name for path in iter_page_files(tmp_path)] == [
+        "package_search_S0.json",
+        "package_search_S1.jsonl.gz",
+    ]
@@ -0,0 +1,20 @@
+# coding: utf-8
+
+import time
+
+from datagov.ckan.throttle import RateLimiter, host_rate_limiter
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # First token is available right away, the next five come every 20ms
+    assert time.monotonic() - start >= 0.09
+
+
+def test_host_rate_limiter_is_shared_per_host():
+    limiter = host_rate_limiter("https://catalog.data.gov/api", rate=2)
+    assert host_rate_limiter("https://catalog.data.gov", rate=5) is limiter
+    assert host_rate_limiter("https://demo.ckan.org", rate=2) is not limiter
@@ -0,0 +1,19 @@
+# coding: utf-8
+
+from datagov.ckan.watermark import WatermarkStore, solr_date
+
+
+def test_solr_date():
+    assert solr_date("2025-01-28T19:47:52.123456") == "2025-01-28T19:47:52Z"
+
+
+def test_watermark_store(tmp_path):
+    path = tmp_path / "watermarks.json"
+    store = WatermarkStore(path)
+    assert store.get("epa-gov") is None
+
+    store.update("epa-gov", "2025-01-28T19:47:52.123456")
+    store.update("epa-gov", "2024-12-01T00:00:00.000000")
+    store.update("epa-gov", None)
+
+    assert WatermarkStore(path).get("epa-gov") == "2025-01-28T19:47:52.123456"
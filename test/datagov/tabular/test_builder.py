@@ -0,0 +1,94 @@
+# coding: utf-8
+
+import csv
+
+import pytest
+
+from datagov.tabular.builder import Builder, UnknownFormatError
+
+
+def dataset(index, organization):
+    return {
+        "id": f"ds{index}",
+        "name": f"dataset-{index}",
+        "title": f"Dataset {index}",
+        "metadata_created": "2025-01-01T00:00:00",
+        "metadata_modified": "2025-01-02T00:00:00",
+        "num_resources": 2,
+        "tags": [{"name": "climate"}],
+        "organization": {"id": f"org-{organization}", "name": organization, "title": organization.upper()},
+        "resources": [
+            {"id": f"ds{index}-r{number}", "package_id": f"ds{index}", "url": f"https://a.gov/{index}/{number}"}
+            for number in range(2)
+        ],
+    }
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(UnknownFormatError):
+        Builder(tmp_path, output_format="xlsx")
+
+
+def test_csv_rows_are_appended_per_organization(tmp_path):
+    # Row groups of 2 and a single open file: writers are closed and reopened.
+    builder = Builder(tmp_path, dataset_fields=["id", "tags"], row_group_size=2, max_open_files=1)
+    for index in range(7):
+        builder.add_dataset(dataset(index, ["epa", "noaa"][index % 2]))
+    builder.close()
+
+    with (tmp_path / "datagov_epa_dataset.csv").open(encoding="utf-8") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [row["id"] for row in rows] == ["ds0", "ds2", "ds4", "ds6"]
+    assert rows[0]["tags"] == '[{"name": "climate"}]'
+
+    with (tmp_path / "datagov_noaa_resource.csv").open(encoding="utf-8") as csv_file:
+        assert len(list(csv.DictReader(csv_file))) == 6
+
+    assert (tmp_path / "datagov_noaa_organization.csv").exists()
+    assert (builder.dataset_count, builder.resource_count) == (7, 14)
+
+
+def test_parquet_is_partitioned_by_organization(tmp_path):
+    pyarrow_dataset = pytest.importorskip("pyarrow.dataset")
+
+    builder = Builder(tmp_path, output_format="parquet", prefix="weekly", row_group_size=3, max_open_files=2)
+    for index in range(10):
+        builder.add_dataset(dataset(index, ["epa", "noaa", "usda"][index % 3]))
+    builder.close()
+
+    assert (tmp_path / "weekly_datagov_dataset" / "organization=epa").is_dir()
+
+    datasets = pyarrow_dataset.dataset(tmp_path / "weekly_datagov_dataset", partitioning="hive").to_table()
+    assert datasets.num_rows == 10
+    assert datasets.schema.field("num_resources").type == "int64"
+
+    epa = datasets.filter(pyarrow_dataset.field("organization") == "epa")
+    assert sorted(epa.column("id").to_pylist()) == ["ds0", "ds3", "ds6", "ds9"]
+
+    resources = pyarrow_dataset.dataset(tmp_path / "weekly_datagov_resource", partitioning="hive").to_table()
+    assert resources.num_rows == 20
+
+    organizations = pyarrow_dataset.dataset(tmp_path / "weekly_datagov_organization.parquet").to_table()
+    assert sorted(organizations.column("name").to_pylist()) == ["epa", "noaa", "usda"]
+
+
+def test_largest_buffers_are_written_beyond_max_buffered_rows(tmp_path):
+    builder = Builder(tmp_path, resource_fields=["id"], row_group_size=100, max_buffered_rows=10)
+    builder.add_dataset(dataset(0, "epa"))
+    builder.add_dataset(dataset(1, "epa"))
+    for index in range(2, 4):
+        builder.add_dataset(dataset(index, f"organization-{index}"))
+    assert builder.buffered_rows == 12 - 6
+
+    # epa resources (4 rows) then epa datasets (2 rows) were the largest buffers.
+    assert set(builder.buffers) == {
+        ("dataset", "organization-2"), ("resource", "organization-2"),
+        ("dataset", "organization-3"), ("resource", "organization-3"),
+    }
+    assert ("resource", "epa") in builder.writers
+
+    builder.close()
+    assert builder.buffered_rows == 0
+    with (tmp_path / "datagov_epa_resource.csv").open(encoding="utf-8") as csv_file:
+        assert len(list(csv.DictReader(csv_file))) == 4
+    assert (builder.dataset_count, builder.resource_count) == (4, 8)
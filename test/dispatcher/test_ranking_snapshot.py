@@ -0,0 +1,48 @@
+# coding: utf-8
+
+import os
+import time
+
+from dispatcher.api.models.ranking_snapshot import RankingSnapshotReader
+from priorizer.api.models.snapshot import SnapshotWriter, latest_path
+
+
+def row(asset_id, rank, rescued=False):
+    return (asset_id, asset_id * 10, asset_id * 100, rank, 1.5, f"https://data.gov/{asset_id}", rescued)
+
+
+def test_reader_follows_each_publication(tmp_path):
+    writer = SnapshotWriter(tmp_path)
+    reader = RankingSnapshotReader(str(tmp_path), limit=10)
+    assert reader.get_ranking() is None
+
+    # priority_update publishes the same ranking version every cycle
+    writer.write(8, iter([row(1, 1), row(2, 2)]))
+    assert [asset["asset_id"] for asset in reader.get_ranking()] == [100, 200]
+
+    writer.write(8, iter([row(2, 1), row(3, 2, rescued=True)]))
+    assert [asset["asset_id"] for asset in reader.get_ranking()] == [200, 300]
+
+
+def test_reader_follows_a_replaced_snapshot(tmp_path):
+    writer = SnapshotWriter(tmp_path)
+    reader = RankingSnapshotReader(str(tmp_path), limit=10)
+    path = writer.write(8, iter([row(1, 1)]))
+    assert len(reader.get_ranking()) == 1
+
+    # Same name written again: the file itself changed
+    replaced = writer.write(8, iter([row(1, 1), row(2, 2)]))
+    os.replace(replaced, path)
+    (tmp_path / "LATEST").write_text(path.name)
+    assert latest_path(tmp_path) == path
+    assert len(reader.get_ranking()) == 2
+
+
+def test_stale_snapshot_is_not_served(tmp_path):
+    path = SnapshotWriter(tmp_path).write(8, iter([row(1, 1)]))
+    reader = RankingSnapshotReader(str(tmp_path), limit=10, max_age=60)
+    assert len(reader.get_ranking()) == 1
+
+    published = time.time() - 120
+    os.utime(path, (published, published))
+    assert reader.get_ranking() is None
@@ -0,0 +1,7 @@
+# coding: utf-8
+
+import pathlib
+import sys
+
+# Priorizer modules import each other as run from priorizer/api (from models.x import ...)
+sys.path.insert(0, str(pathlib.Path(__file__).parents[2] / "priorizer" / "api"))
@@ -0,0 +1,63 @@
+# coding: utf-8
+
+import numpy as np
+
+from priorizer.api.models.aging import AgingTracker
+from priorizer.api.models.scoring import FeatureSet, rank_by_value
+
+
+def test_dataset_wait_since_last_offer():
+    tracker = AgingTracker(capacity=1)
+    tracker.mark_offered([(10, 1), (11, 1), (20, 2)])
+    tracker.advance()
+    tracker.advance()
+    tracker.mark_offered([(20, 2)])
+    tracker.advance()
+
+    # Dataset 3 was never offered: it waits since the tracker started
+    assert tracker.dataset_wait(np.array([1, 2, 3])).tolist() == [3, 1, 3]
+
+
+def test_rescued_assets_stop_aging():
+    tracker = AgingTracker()
+    tracker.mark_offered([(10, 1)])
+    tracker.mark_rescued([(10, 1)])
+    tracker.advance()
+    assert tracker.wait_cycles().tolist() == [0]
+
+
+def test_fully_rescued_dataset_does_not_wait():
+    tracker = AgingTracker()
+    for _ in range(10):
+        tracker.advance()
+    tracker.mark_offered([(10, 1), (20, 2), (21, 2)])
+    tracker.mark_rescued([(20, 2)])
+    tracker.mark_rescued([(30, 3)])
+    for _ in range(5):
+        tracker.advance()
+
+    # Dataset 2 still has an asset waiting, dataset 3 has none, dataset 4 is unknown
+    assert tracker.dataset_wait(np.array([1, 2, 3, 4])).tolist() == [5, 5, 0, 15]
+
+
+def test_save_and_load(tmp_path):
+    tracker = AgingTracker()
+    tracker.mark_offered([(10, 1), (20, 2)])
+    tracker.advance()
+    tracker.save(tmp_path / "state" / "aging.npz")
+
+    loaded = AgingTracker.load(tmp_path / "state" / "aging.npz")
+    assert loaded.cycle == 1
+    assert loaded.dataset_wait(np.array([1, 2])).tolist() == [1, 1]
+    assert AgingTracker.load(tmp_path / "missing.npz").size == 0
+
+
+def test_starving_dataset_eventually_outranks_popular_ones():
+    features = FeatureSet(np.arange(2), {
+        "download_events": np.array([100.0, 0.0]),
+        "size_mb": np.array([10.0, 10.0]),
+    })
+    assert rank_by_value(features).tolist() == [0, 1]
+
+    features.columns["wait_cycles"] = np.array([0.0, 10 ** 8])
+    assert rank_by_value(features).tolist() == [1, 0]
@@ -0,0 +1,57 @@
+# coding: utf-8
+
+import numpy as np
+import pytest
+
+pytest.importorskip("rescue_api")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from priorizer.api.models.blend import RankingBlend
+from rescue_api.models.dataset_rank import DatasetRank
+from rescue_api.models.dataset_ranking import DatasetRanking
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blend.db'}")
+    DatasetRank.metadata.create_all(engine, tables=[DatasetRanking.__table__, DatasetRank.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+def add_ranks(session, ranking_id, event_counts):
+    for dataset_id, event_count in event_counts.items():
+        session.add(DatasetRank(dataset_id=dataset_id, ranking_id=ranking_id, event_count=event_count, rank=1))
+    session.commit()
+
+
+def test_weighted_blend(session):
+    add_ranks(session, 8, {1: 10, 2: 4})
+    add_ranks(session, 9, {2: 6, 3: 2})
+    add_ranks(session, 5, {1: 1000})  # Not a source
+    blend = RankingBlend({8: 1.0, 9: 0.5})
+
+    dataset_ids, partials = blend.partial_sums(session)
+    assert dataset_ids.tolist() == [1, 2, 3]
+    assert partials.tolist() == [[10, 0], [4, 6], [0, 2]]
+
+    # Aligned on the requested ids, 0 when absent from every source
+    assert blend.scores(session, np.array([1, 2, 3, 4])).tolist() == [10.0, 7.0, 1.0, 0.0]
+
+
+def test_partial_sums_are_cached_per_version(session):
+    add_ranks(session, 8, {1: 10})
+    blend = RankingBlend({8: 1.0})
+    first = blend.partial_sums(session)
+    assert blend.partial_sums(session)[1] is first[1]
+
+    # A new rank in a source is a new version
+    add_ranks(session, 8, {2: 3})
+    assert blend.partial_sums(session)[0].tolist() == [1, 2]
+
+
+def test_from_json():
+    assert RankingBlend.from_json('{"8": 2, "9": 0.5}').weights == {8: 2.0, 9: 0.5}
+    assert RankingBlend.from_json(None).sources == [8, 9]
@@ -0,0 +1,35 @@
+# coding: utf-8
+
+from priorizer.api.models.cache import RankingCache
+
+
+def test_cached_until_invalidated():
+    cache = RankingCache(ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get("last_ranking_id", loader) == 1
+    assert cache.get("last_ranking_id", loader) == 1
+    cache.invalidate()
+    assert cache.get("last_ranking_id", loader) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entries_are_reloaded():
+    cache = RankingCache(ttl=0)
+    assert cache.get("key", lambda: 1) == 1
+    assert cache.get("key", lambda: 2) == 2
+
+
+def test_value_loaded_during_invalidation_is_not_stored():
+    cache = RankingCache(ttl=60)
+
+    def loader():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get("key", loader) == "stale"
+    assert cache.get("key", lambda: "fresh") == "fresh"
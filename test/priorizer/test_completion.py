@@ -0,0 +1,72 @@
+# coding: utf-8
+
+import pytest
+
+pytest.importorskip("rescue_api")
+
+import rescue_api.models  # noqa: F401 Every table, for the foreign keys
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from priorizer.api.models.completion import CompletionSummary
+from rescue_api.models.asset_resource import asset_resource
+from rescue_api.models.mvp_downloader_library import MvpDownloaderLibrary
+from rescue_api.models.rescues import Rescue
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'completion.db'}")
+    Rescue.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Dataset 1: resources 10 and 11, dataset 2: resource 20. One asset per resource.
+        for dataset_id, resource_id in ((1, 10), (1, 11), (2, 20)):
+            session.add(MvpDownloaderLibrary(
+                dataset_id=dataset_id, resource_id=resource_id,
+                deeplink=f"https://data.gov/{resource_id}", deeplink_file_size=1.5,
+            ))
+            session.execute(insert(asset_resource).values(asset_id=resource_id * 10, resource_id=resource_id))
+        session.commit()
+        yield session
+
+
+def rescue(session, asset_id):
+    # As the dispatcher /assets-downloaded does
+    session.add(Rescue(asset_id=asset_id, rescuer_id=1, magnet_link=f"magnet:?xt=urn:btih:{asset_id}", status="SUCCESS"))
+    session.commit()
+
+
+def completion(session, summary):
+    rows = session.execute(
+        select(summary.table.c.dataset_id, summary.table.c.nb_resources, summary.table.c.nb_magnets,
+               summary.table.c.size_mb, summary.table.c.completed)
+        .order_by(summary.table.c.dataset_id)
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_ensure_builds_the_summary_once(session):
+    rescue(session, 200)
+    summary = CompletionSummary()
+    summary.ensure(session)
+    assert completion(session, summary) == [(1, 2, 0, 3.0, False), (2, 1, 1, 1.5, True)]
+
+    # Already built: new rescues wait for a refresh
+    rescue(session, 100)
+    summary.ensure(session)
+    assert completion(session, summary)[0] == (1, 2, 0, 3.0, False)
+
+
+def test_refresh_follows_rescues(session):
+    summary = CompletionSummary()
+    summary.ensure(session)
+
+    rescue(session, 100)
+    rescue(session, 110)
+    # Several rescuers of the same asset count once
+    session.add(Rescue(asset_id=110, rescuer_id=2, magnet_link="magnet:?xt=urn:btih:110", status="SUCCESS"))
+    session.commit()
+    assert summary.refresh(session, [1]) == 1
+
+    assert completion(session, summary) == [(1, 2, 2, 3.0, True), (2, 1, 0, 1.5, False)]
+    assert summary.refresh(session, []) == 0
@@ -0,0 +1,53 @@
+# coding: utf-8
+
+import sys
+import types
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from priorizer.api.models import database
+from priorizer.api.models.database import _TimedQueuePool, pool_stats
+
+
+def test_pool_records_checkout_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=_TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    checkouts, timeouts = pool_stats.checkouts, pool_stats.timeouts
+
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        assert engine.pool.checkedout() == 1
+
+    assert engine.pool.checkedout() == 0
+    assert pool_stats.checkouts == checkouts + 2
+    assert pool_stats.timeouts == timeouts + 1
+    assert pool_stats.as_dict()["wait_max_s"] >= 0.05
+
+
+def test_database_url_is_the_rescue_api_one(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rescue.db'}")
+    closed = []
+
+    def get_db():
+        session = Session(engine)
+        try:
+            yield session
+        finally:
+            closed.append(session)
+            session.close()
+
+    monkeypatch.setattr(database, "_DATABASE_URL", None)
+    monkeypatch.setitem(sys.modules, "rescue_api.database", types.SimpleNamespace(get_db=get_db))
+    assert database._database_url() == engine.url
+    assert closed
+
+    monkeypatch.setitem(sys.modules, "rescue_api.database", None)
+    with pytest.raises(RuntimeError, match="PRIORIZER_DATABASE_URL"):
+        database._database_url()
@@ -0,0 +1,29 @@
+# coding: utf-8
+
+from priorizer.api.models.diversity import diversify, diversify_windows, url_host
+
+
+def test_share_is_capped_per_key():
+    rows = [("a", 1), ("a", 2), ("a", 3), ("a", 4), ("b", 5), ("c", 6)]
+    selected = diversify(rows, key=lambda r: r[0], limit=4, max_share=0.5)
+    assert selected == [("a", 1), ("a", 2), ("b", 5), ("c", 6)]
+
+
+def test_backfill_when_too_few_keys():
+    rows = [("a", 1), ("a", 2), ("a", 3), ("b", 4)]
+    selected = diversify(rows, key=lambda r: r[0], limit=4, max_share=0.25)
+    assert selected == [("a", 1), ("b", 4), ("a", 2), ("a", 3)]
+
+
+def test_url_host():
+    assert url_host("https://www.ncei.noaa.gov/data/file.nc") == "www.ncei.noaa.gov"
+    assert url_host(None) == ""
+
+
+def test_windows_keep_the_cap_and_every_row():
+    rows = [("a", 1), ("a", 2), ("a", 3), ("a", 4), ("b", 5), ("c", 6), ("b", 7), ("c", 8)]
+    selected = list(diversify_windows(rows, key=lambda r: r[0], window=4, max_share=0.5, candidates=2))
+
+    # First window as diversify() serves it, then the next one among the rows left
+    assert selected[:4] == diversify(rows, key=lambda r: r[0], limit=4, max_share=0.5)
+    assert selected[4:] == [("a", 3), ("a", 4), ("b", 7), ("c", 8)]
@@ -0,0 +1,57 @@
+# coding: utf-8
+
+import threading
+
+from priorizer.api.models.jobs import Job, JobManager
+
+
+def _wait(manager, job):
+    while not manager.get(job.id).done:
+        threading.Event().wait(0.01)
+    return manager.get(job.id)
+
+
+def test_job_result_and_failure():
+    manager = JobManager(max_workers=1)
+
+    job = _wait(manager, manager.submit("ok", lambda: [1, 2]))
+    assert job.status == Job.SUCCESS and job.result == [1, 2]
+
+    job = _wait(manager, manager.submit("ko", lambda: 1 / 0))
+    assert job.status == Job.FAILED and "division" in job.error
+
+
+def test_running_job_is_reused():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+
+    first = manager.submit("compute_rank", release.wait)
+    assert manager.submit("compute_rank", release.wait) is first
+    release.set()
+    _wait(manager, first)
+    assert manager.submit("compute_rank", lambda: None) is not first
+
+
+def test_results_are_dropped_over_the_item_budget():
+    manager = JobManager(max_workers=1, result_max_items=5)
+
+    first = _wait(manager, manager.submit("first", lambda: [1, 2, 3]))
+    second = _wait(manager, manager.submit("second", lambda: [4, 5, 6]))
+
+    # The newest result is kept, the oldest one is summarized
+    assert second.result == [4, 5, 6]
+    assert first.result is None
+    assert first.as_dict()["result_size"] == 3 and first.as_dict()["result_dropped"]
+
+    # Larger than the budget: kept while it is the newest
+    large = _wait(manager, manager.submit("large", lambda: list(range(10))))
+    assert large.result == list(range(10))
+    assert manager.get(second.id).result is None
+
+
+def test_results_expire():
+    manager = JobManager(max_workers=1, result_ttl=0.0)
+    job = _wait(manager, manager.submit("ok", lambda: [1, 2]))
+
+    assert job.status == Job.SUCCESS
+    assert job.result is None and job.result_size == 2
@@ -0,0 +1,78 @@
+# coding: utf-8
+
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+
+pytest.importorskip("rescue_api")
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from priorizer.api.models import logic
+
+
+def test_organization_quota_query(monkeypatch):
+    monkeypatch.setattr(logic, "_DIVERSITY_KEY", "organization")
+    query = logic.RankedRequestManager()._no_magnet_query(Session(), 42, 500)
+
+    assert "organization_id" in [column["name"] for column in query.column_descriptions]
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert sql.index(f"JOIN {logic.Dataset.__tablename__} ") < sql.index("LIMIT")
+
+
+def test_snapshot_query_counts_each_asset_once():
+    query = logic.RankedRequestManager()._snapshot_query(Session(), 42, rescued=True)
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+
+    # Rescues are grouped per asset before the join
+    assert f"GROUP BY {logic.Rescue.__tablename__}.asset_id" in sql
+
+
+class _Asset(NamedTuple):
+    dataset_id: int
+    resource_id: int
+    asset_id: int
+    rank: int
+    deeplink_file_size: float
+    deeplink: str
+    magnet_link: str
+    organization_id: int
+
+
+class _Writer:
+    def write(self, version, rows):
+        self.version, self.rows = version, list(rows)
+        return "snapshot.arrow"
+
+
+def test_export_snapshot_applies_the_quota_and_aging(monkeypatch):
+    monkeypatch.setattr(logic, "_DIVERSITY_KEY", "organization")
+    monkeypatch.setattr(logic, "_DIVERSITY_MAX_SHARE", 0.5)
+    monkeypatch.setattr(logic, "_RANKING_LIMIT", 2)
+    manager = logic.RankedRequestManager()
+    manager.aging = logic.AgingTracker()
+    monkeypatch.setattr(manager, "_get_last_ranking_id", lambda session: 42)
+
+    organizations = [1, 1, 1, 2]
+    no_magnet = [
+        _Asset(rank, rank * 10, rank * 100, rank, 1.5, f"https://data.gov/{rank}", None, organization)
+        for rank, organization in enumerate(organizations, start=1)
+    ]
+    magnet = [_Asset(5, 50, 500, 5, 2.5, "https://data.gov/5", "magnet:?xt=urn:btih:5", 3)]
+    monkeypatch.setattr(
+        manager, "_snapshot_query", lambda session, ranking_id, rescued: magnet if rescued else no_magnet
+    )
+
+    writer = _Writer()
+    assert manager.export_snapshot(None, writer) == "snapshot.arrow"
+
+    assert writer.version == 42
+    # Windows of 2 assets, at most 1 per organization when possible
+    assert [row[2] for row in writer.rows] == [100, 400, 200, 300, 500]
+    assert writer.rows[-1] == (5, 50, 500, 5, 2.5, "magnet:?xt=urn:btih:5", True)
+    assert not any(row[6] for row in writer.rows[:-1])
+    # The first window is offered, the rescued asset stops aging
+    manager.aging.advance()
+    assert manager.aging.dataset_wait(np.array([1, 4, 2, 5])).tolist() == [1, 1, 1, 0]
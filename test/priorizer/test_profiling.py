@@ -0,0 +1,26 @@
+# coding: utf-8
+
+from sqlalchemy import create_engine, text
+
+from priorizer.api.models.profiling import QueryProfiler, fingerprint
+
+
+def test_fingerprint_strips_literals():
+    assert fingerprint("SELECT *\n  FROM t WHERE id = 12 AND name = 'it''s'") == "SELECT * FROM t WHERE id = ? AND name = ?"
+
+
+def test_statements_are_timed_per_fingerprint():
+    engine = create_engine("sqlite://")
+    profiler = QueryProfiler(slow_query_ms=0, explain_log=None)
+    profiler.attach(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+
+    stats = {s["statement"]: s for s in profiler.snapshot()}
+    assert stats["SELECT ?"]["calls"] == 2
+    assert sum(stats["SELECT ?"]["histogram_ms"].values()) == 2
+
+    profiler.reset()
+    assert profiler.snapshot() == []
@@ -0,0 +1,129 @@
+# coding: utf-8
+
+import datetime
+
+import pytest
+
+pytest.importorskip("rescue_api")
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from priorizer.api.models.rank_writer import RankWriter, _STAGING_TABLE
+
+_UPDATED = datetime.datetime(2025, 9, 20)
+
+
+def ranks_table():
+    return Table(
+        "dataset_ranks", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("dataset_id", Integer),
+        Column("ranking_id", String),
+        Column("event_count", Integer),
+        Column("rank", Integer),
+        Column("updated_at", DateTime),
+    )
+
+
+def ranks(count):
+    # compute_rank output, with keys that are not columns
+    return [
+        {"id": idx + 1, "dataset_id": 100 + idx, "ranking_id": "20250920", "event_count": 10 - idx,
+         "db_rank": None, "updated": _UPDATED, "rank": idx + 1}
+        for idx in range(count)
+    ]
+
+
+def test_executemany_fallback(tmp_path):
+    table = ranks_table()
+    engine = create_engine(f"sqlite:///{tmp_path / 'ranks.db'}")
+    table.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        result = RankWriter(table).write(session, ranks(3))
+
+    assert (result.rows, result.method) == (3, "executemany")
+    with engine.connect() as connection:
+        rows = connection.execute(select(table).order_by(table.c.rank)).all()
+    assert [(row.id, row.dataset_id, row.rank, row.event_count) for row in rows] == [
+        (1, 100, 1, 10), (2, 101, 2, 9), (3, 102, 3, 8),
+    ]
+    # Not a column: left to its default
+    assert rows[0].updated_at is None
+
+    with Session(engine) as session:
+        assert RankWriter(table).write(session, []).method == "none"
+
+
+class _Cursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+    def copy_expert(self, statement, stream):
+        self.statements.append(statement)
+        self.copied = stream.read()
+
+
+class _DBAPIConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+class _Connection:
+    def __init__(self, cursor):
+        self.connection = _DBAPIConnection(cursor)
+
+
+class _PostgresSession:
+    """What RankWriter uses of a session bound to PostgreSQL (psycopg2)."""
+
+    def __init__(self):
+        self.cursor = _Cursor()
+        self.dialect = postgresql.dialect()
+        self.committed = False
+
+    def get_bind(self):
+        return self
+
+    def connection(self):
+        return _Connection(self.cursor)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def test_copy_statements():
+    session = _PostgresSession()
+    result = RankWriter(ranks_table()).write(session, ranks(2))
+
+    assert (result.rows, result.method, session.committed) == (2, "copy", True)
+    create, copy, insert = session.cursor.statements
+    assert create == (
+        f"CREATE TEMP TABLE {_STAGING_TABLE} (LIKE dataset_ranks INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    assert copy == (
+        f"COPY {_STAGING_TABLE} (id, dataset_id, ranking_id, event_count, rank) FROM STDIN WITH (FORMAT csv)"
+    )
+    assert insert == (
+        "INSERT INTO dataset_ranks (id, dataset_id, ranking_id, event_count, rank)"
+        f" SELECT id, dataset_id, ranking_id, event_count, rank FROM {_STAGING_TABLE}"
+    )
+    assert session.cursor.copied == b"1,100,20250920,10,1\n2,101,20250920,9,2\n"
@@ -0,0 +1,66 @@
+# coding: utf-8
+
+import numpy as np
+import pytest
+
+from priorizer.api.models.scoring import FEATURES, FeatureSet, ScoringEngine, rank_by_value, value_per_mb
+
+
+def _features(**columns):
+    size = len(next(iter(columns.values())))
+    return FeatureSet(np.arange(size), {name: np.asarray(values, dtype=float) for name, values in columns.items()})
+
+
+def test_unknown_feature_rejected():
+    with pytest.raises(ValueError):
+        ScoringEngine({"popularity": 1.0})
+
+
+def test_missing_features_default_to_zero():
+    features = _features(download_events=[1, 2, 3])
+    assert set(features.columns) == set(FEATURES)
+    assert not features["failures"].any()
+
+
+def test_incomplete_datasets_rank_first():
+    features = _features(
+        download_events=[1000, 10, 5],
+        completion=[1.0, 0.0, 0.5],
+    )
+    order = ScoringEngine({"age_days": 0.0}).rank(features)
+    assert list(order) == [1, 2, 0]
+
+
+def test_weights_from_json():
+    engine = ScoringEngine.from_json('{"link_events": 0.25}')
+    assert engine.weights["link_events"] == 0.25
+    assert engine.weights["download_events"] == 1.0
+
+
+@pytest.mark.parametrize("k", [None, 0, 1, 7, 50, 200])
+def test_top_k_matches_full_sort(k):
+    scores = np.random.default_rng(42).random(100)
+    expected = np.argsort(-scores, kind="stable")
+    if k is not None:
+        expected = expected[:k]
+    assert list(ScoringEngine.top_k(scores, k)) == list(expected)
+
+
+def test_value_per_mb_prefers_small_popular_files():
+    # 2 TB archive with 10 events vs 10 MB file with 9 events
+    features = _features(download_events=[10, 9], size_mb=[2 * 1024 * 1024, 10])
+    assert list(rank_by_value(features)) == [1, 0]
+
+
+def test_value_per_mb_size_bounds():
+    features = _features(download_events=[10, 10, 10], size_mb=[0.001, 1e9, 0])
+    value = value_per_mb(features, min_size_mb=1, max_size_mb=1000)
+    # Tiny file capped at min size, huge archive capped at max size, unknown size uses the median
+    assert value[0] == 10
+    assert value[1] == pytest.approx(0.01)
+    assert value[2] == pytest.approx(10 / 1000)
+
+
+def test_value_ranking_keeps_completed_datasets_last():
+    features = _features(download_events=[100, 1], size_mb=[1, 100], completion=[1.0, 0.0])
+    assert list(rank_by_value(features, k=1)) == [1]
@@ -0,0 +1,47 @@
+# coding: utf-8
+
+from priorizer.api.models import snapshot
+from priorizer.api.models.snapshot import LATEST, SnapshotWriter, latest_path, read_snapshot
+
+_ROWS = [
+    (1, 10, 100, 1, 12.5, "https://data.gov/a.csv", False),
+    (2, 20, 200, 2, None, "magnet:?xt=urn:btih:d1", True),
+]
+
+
+def test_snapshot_roundtrip(tmp_path):
+    writer = SnapshotWriter(tmp_path, keep=2)
+    first_path = writer.write(1, iter(_ROWS))
+    path = writer.write(2, iter(_ROWS[:1]))
+
+    assert latest_path(tmp_path) == path
+    assert first_path.name.startswith("ranking_1_")
+    assert read_snapshot(path).to_pylist()[0]["url"] == "https://data.gov/a.csv"
+    assert read_snapshot(first_path).column("size_mb").to_pylist() == [12.5, None]
+
+
+def test_same_version_is_published_to_a_new_file(tmp_path):
+    writer = SnapshotWriter(tmp_path, keep=2)
+    first_path = writer.write(1, iter(_ROWS))
+    path = writer.write(1, iter(_ROWS[:1]))
+
+    assert path != first_path
+    assert latest_path(tmp_path) == path
+    assert read_snapshot(path).num_rows == 1
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    writer = SnapshotWriter(tmp_path, keep=1)
+    for version in range(3):
+        path = writer.write(version, iter([]))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [LATEST, path.name]
+    assert read_snapshot(latest_path(tmp_path)).num_rows == 0
+
+
+def test_no_snapshot_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "_SNAPSHOT_DIR", str(tmp_path))
+    assert SnapshotWriter.from_env().directory == tmp_path
+
+    monkeypatch.setattr(snapshot, "pa", None)
+    assert SnapshotWriter.from_env() is None